@@ -0,0 +1,221 @@
+"""Admission control and per-request deadlines for /ask.
+
+At most ASK_MAX_CONCURRENCY requests run answer_question at once (default:
+DB_POOL_MAX_SIZE, halved in hybrid mode where each request holds two
+connections). Further requests wait in a FIFO queue of at most ASK_MAX_QUEUE
+(default 2x the limit) for up to ASK_QUEUE_TIMEOUT_MS (default 2000).
+
+A request is rejected up front, with 503 and Retry-After, when the queue is
+full or when its estimated wait (queue position x recent service time / limit)
+already exceeds the queue timeout, so overload costs the client milliseconds
+instead of a timeout. Admitted requests get a deadline of ASK_TIMEOUT_MS
+(default 10000) from arrival; the embedding, pool-acquire and statement
+timeouts are capped by what is left of it (see stage_timeout).
+
+Decisions are counted in ask_admission_decisions_total{decision}.
+"""
+
+import asyncio
+import contextvars
+import math
+import os
+import time
+from collections import deque
+from collections.abc import AsyncIterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from functools import lru_cache
+
+from psycopg.errors import QueryCanceled
+from psycopg_pool import PoolTimeout
+
+from api import metrics
+from api.singleflight import SingleFlightTimeoutError
+
+ADMITTED = "admitted"
+QUEUE_FULL = "queue_full"
+DEADLINE = "deadline"
+QUEUE_TIMEOUT = "queue_timeout"
+
+# Weight of the newest sample in the service-time moving average
+SERVICE_TIME_ALPHA = 0.2
+
+# Monotonic deadline of the current request, if it went through admission
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar("ask_deadline", default=None)
+
+
+class OverloadedError(Exception):
+    """Request rejected by admission control; retry_after is in whole seconds."""
+
+    def __init__(self, reason: str, retry_after: int):
+        super().__init__(f"Server overloaded ({reason}), retry after {retry_after}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class EmbeddingTimeoutError(TimeoutError):
+    """The question embedding ran out of its time budget (raised by api.rag)."""
+
+
+def stage_timeout(default_s: float) -> float:
+    """Timeout for a stage: default_s, capped by the time left before the request deadline."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return default_s
+    # Never 0: statement_timeout=0 and socket timeout 0 mean something else
+    return max(0.001, min(default_s, deadline - time.monotonic()))
+
+
+def timeout_stage(error: BaseException) -> str | None:
+    """
+    The stage a timeout error came from ('embedding', 'db_acquire',
+    'db_statement', 'single_flight'), else None.
+    """
+    if isinstance(error, PoolTimeout):
+        return "db_acquire"
+    if isinstance(error, QueryCanceled):
+        return "db_statement"
+    if isinstance(error, EmbeddingTimeoutError):
+        return "embedding"
+    if isinstance(error, SingleFlightTimeoutError):
+        return "single_flight"
+    return None
+
+
+class AdmissionController:
+    """Concurrency limit with a bounded, deadline-aware FIFO queue (one event loop)."""
+
+    def __init__(self, limit: int, max_queue: int, queue_timeout: float):
+        self.limit = max(1, limit)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._waiters: deque[asyncio.Future] = deque()
+        self._service_s: float | None = None
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    def estimated_wait(self, position: int) -> float:
+        """Seconds until the request at queue position (0-based) gets a slot."""
+        if self._service_s is None:
+            return 0.0
+        return (position + 1) * self._service_s / self.limit
+
+    def retry_after(self) -> int:
+        """Whole seconds until the current queue is expected to drain (at least 1)."""
+        return max(1, math.ceil(self.estimated_wait(len(self._waiters))))
+
+    def _reject(self, reason: str) -> OverloadedError:
+        metrics.ADMISSION_DECISIONS.labels(reason).inc()
+        return OverloadedError(reason, self.retry_after())
+
+    async def acquire(self) -> None:
+        """Take a slot, waiting in the queue if needed; raises OverloadedError when shed."""
+        if self.active < self.limit and not self._waiters:
+            self.active += 1
+            metrics.ADMISSION_DECISIONS.labels(ADMITTED).inc()
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject(QUEUE_FULL)
+        if self.estimated_wait(len(self._waiters)) > self.queue_timeout:
+            raise self._reject(DEADLINE)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except (TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as we gave up
+                if isinstance(e, TimeoutError):
+                    metrics.ADMISSION_DECISIONS.labels(ADMITTED).inc()
+                    return
+                self.release()
+                raise
+            waiter.cancel()
+            self._waiters.remove(waiter)
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            raise self._reject(QUEUE_TIMEOUT) from None
+        finally:
+            metrics.ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - start)
+        metrics.ADMISSION_DECISIONS.labels(ADMITTED).inc()
+
+    def release(self, service_s: float | None = None) -> None:
+        """Free a slot (handing it to the oldest waiter) and record the service time."""
+        if service_s is not None:
+            if self._service_s is None:
+                self._service_s = service_s
+            else:
+                self._service_s += SERVICE_TIME_ALPHA * (service_s - self._service_s)
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.active -= 1
+
+    @asynccontextmanager
+    async def admit(self, timeout: float | None = None) -> AsyncIterator[float]:
+        """
+        Hold a slot for the block and set the request deadline (timeout seconds
+        from arrival, queue wait included). Yields the deadline (monotonic).
+        """
+        arrival = time.monotonic()
+        await self.acquire()
+        deadline = arrival + (timeout if timeout is not None else get_ask_timeout())
+        token = _deadline.set(deadline)
+        start = time.perf_counter()
+        try:
+            yield deadline
+        finally:
+            _deadline.reset(token)
+            self.release(time.perf_counter() - start)
+
+
+def get_ask_timeout() -> float:
+    """Total /ask budget in seconds from ASK_TIMEOUT_MS (default 10000)."""
+    return int(os.getenv("ASK_TIMEOUT_MS", "10000")) / 1000
+
+
+def get_concurrency_limit() -> int:
+    """ASK_MAX_CONCURRENCY, defaulting to the DB pool size (halved for hybrid retrieval)."""
+    configured = int(os.getenv("ASK_MAX_CONCURRENCY", "0"))
+    if configured > 0:
+        return configured
+    pool_max = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+    if os.getenv("RETRIEVAL_MODE", "vector").lower() == "hybrid":
+        pool_max //= 2
+    return max(1, pool_max)
+
+
+@lru_cache(maxsize=1)
+def get_admission_controller() -> AdmissionController:
+    """Process-wide controller, configured from the environment on first use."""
+    limit = get_concurrency_limit()
+    controller = AdmissionController(
+        limit=limit,
+        max_queue=int(os.getenv("ASK_MAX_QUEUE", str(limit * 2))),
+        queue_timeout=int(os.getenv("ASK_QUEUE_TIMEOUT_MS", "2000")) / 1000,
+    )
+    metrics.ADMISSION_LIMIT.set(controller.limit)
+    metrics.ADMISSION_IN_FLIGHT.set_function(lambda: controller.active)
+    metrics.ADMISSION_QUEUED.set_function(lambda: controller.queued)
+    return controller
+
+
+@lru_cache(maxsize=1)
+def get_ask_executor() -> ThreadPoolExecutor:
+    """Threads that run answer_question off the event loop, one per admission slot."""
+    return ThreadPoolExecutor(max_workers=get_concurrency_limit(), thread_name_prefix="ask")
+
+
+async def run_in_ask_executor(fn, *args, **kwargs):
+    """Run a blocking call in the ask executor, keeping the caller's context (deadline, spans)."""
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        get_ask_executor(), lambda: context.run(fn, *args, **kwargs)
+    )
@@ -0,0 +1,129 @@
+"""Micro-batching of concurrent question embeddings.
+
+Each /ask embeds its question with one provider round trip. Under load many
+of those round trips start within a few milliseconds of each other, so the
+coalescer collects questions for EMBEDDING_BATCH_WINDOW_MS (default 2) after
+the first one arrives, or until EMBEDDING_BATCH_MAX (default 32) are pending,
+and sends them as one batched request (get_embeddings). Each caller waits on
+its own future; identical texts in a batch are embedded once.
+
+A request that arrives alone waits at most the window before its batch is
+sent. Up to EMBEDDING_BATCH_MAX_INFLIGHT (default 4) batches run concurrently;
+when all of them are busy, questions keep accumulating and go out together
+as soon as one finishes, so batches grow with load instead of queueing. The
+added latency is at most the window plus one provider round trip, and at
+high QPS provider requests are capped near max_inflight / round-trip time
+(with a 40 ms provider: ~0.09 requests per question at 1000 QPS; see
+benchmarks/bench_coalescer.py). More in-flight slots trade fewer batched
+questions for lower latency.
+
+Coalescing applies to EMBEDDING_MODE=openai only (in-process providers gain
+nothing from batching); EMBEDDING_BATCH_WINDOW_MS=0 disables it.
+"""
+
+import os
+import queue
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import Future, ThreadPoolExecutor
+from functools import lru_cache
+
+from api import metrics
+from worker.embeddings import get_embeddings
+
+# (texts, timeout) -> embeddings in the same order
+BatchEmbedder = Callable[[list[str], float | None], list[list[float]]]
+
+
+class EmbeddingCoalescer:
+    """Collects embed() calls from many threads into batched provider calls."""
+
+    def __init__(
+        self,
+        embed_batch: BatchEmbedder,
+        window_s: float,
+        max_batch: int,
+        max_inflight: int = 4,
+    ):
+        self.window_s = window_s
+        self.max_batch = max(1, max_batch)
+        self._embed_batch = embed_batch
+        # (text, monotonic deadline or None, future)
+        self._queue: queue.SimpleQueue[tuple[str, float | None, Future]] = queue.SimpleQueue()
+        self._slots = threading.Semaphore(max(1, max_inflight))
+        self._executor = ThreadPoolExecutor(max_workers=max(1, max_inflight), thread_name_prefix="embed-batch")
+        self._thread = threading.Thread(target=self._collect, name="embed-coalescer", daemon=True)
+        self._thread.start()
+
+    def embed(self, text: str, timeout: float | None = None) -> list[float]:
+        """Embed text as part of the next batch; raises TimeoutError after timeout seconds."""
+        future: Future = Future()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        self._queue.put((text, deadline, future))
+        return future.result(timeout)
+
+    def _collect(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            window_end = time.monotonic() + self.window_s
+            while len(batch) < self.max_batch:
+                remaining = window_end - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            # Wait for a free in-flight slot, then take whatever queued meanwhile
+            self._slots.acquire()
+            while len(batch) < self.max_batch:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            self._executor.submit(self._dispatch, batch)
+
+    def _dispatch(self, batch: list[tuple[str, float | None, Future]]) -> None:
+        texts = list(dict.fromkeys(text for text, _, _ in batch))
+        # The batch may run as long as its most patient caller waits; callers
+        # with shorter deadlines time out on their own futures
+        deadlines = [deadline for _, deadline, _ in batch]
+        timeout = None if None in deadlines else max(0.001, max(deadlines) - time.monotonic())
+
+        metrics.EMBEDDING_BATCH_SIZE.observe(len(batch))
+        try:
+            embeddings = self._embed_batch(texts, timeout)
+        except Exception as e:
+            for _, _, future in batch:
+                future.set_exception(e)
+            return
+        finally:
+            self._slots.release()
+
+        by_text = dict(zip(texts, embeddings))
+        for text, _, future in batch:
+            future.set_result(by_text[text])
+
+
+def _provider_batch(texts: list[str], timeout: float | None) -> list[list[float]]:
+    return get_embeddings(texts, timeout=timeout)
+
+
+def coalescing_enabled() -> bool:
+    """Whether question embeddings go through the coalescer (openai mode, window > 0)."""
+    return (
+        os.getenv("EMBEDDING_MODE", "fake").lower() == "openai"
+        and float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "2")) > 0
+    )
+
+
+@lru_cache(maxsize=1)
+def get_embedding_coalescer() -> EmbeddingCoalescer:
+    """Process-wide coalescer, configured from the environment on first use."""
+    return EmbeddingCoalescer(
+        _provider_batch,
+        window_s=float(os.getenv("EMBEDDING_BATCH_WINDOW_MS", "2")) / 1000,
+        max_batch=int(os.getenv("EMBEDDING_BATCH_MAX", "32")),
+        max_inflight=int(os.getenv("EMBEDDING_BATCH_MAX_INFLIGHT", "4")),
+    )
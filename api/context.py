@@ -0,0 +1,198 @@
+"""Context assembly for answers.
+
+Retrieved chunks are merged into passages: chunks of the same document with
+consecutive chunk_index values are joined, and the overlap chunk_text()
+repeats at the start of each chunk (200 characters by default) is removed.
+Passages are added in retrieval rank order until the byte or token budget
+is reached; the passage that crosses the budget is cut at a word boundary.
+
+Configuration:
+- CONTEXT_MAX_BYTES: UTF-8 byte budget for the assembled context (default 16000, 0 = unlimited)
+- CONTEXT_MAX_TOKENS: token budget, estimated as bytes / 4 (default 0 = unlimited)
+- CONTEXT_EXCERPT_CHARS: citation excerpt length (default 200)
+"""
+
+import math
+import os
+from typing import Any
+
+# Shortest prefix accepted as chunk overlap, so short coincidental matches
+# ("the ") between unrelated neighbours are not stripped
+MIN_OVERLAP_MATCH = 20
+
+# chunk_text strips whitespace at chunk edges, so the repeated text can be
+# slightly longer than the nominal overlap
+OVERLAP_SLACK = 16
+
+PASSAGE_SEPARATOR = "\n\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (about 4 bytes per token for English text)."""
+    return math.ceil(len(text.encode("utf-8")) / 4)
+
+
+def strip_overlap(previous: str, current: str, max_overlap: int = 200) -> str:
+    """
+    Remove the start of `current` that repeats the end of `previous`.
+
+    Returns `current` unchanged if no overlap of at least MIN_OVERLAP_MATCH
+    characters is found.
+    """
+    tail = previous[-(max_overlap + OVERLAP_SLACK):]
+    probe = current[:MIN_OVERLAP_MATCH]
+    if len(probe) < MIN_OVERLAP_MATCH:
+        return current
+    # The earliest occurrence of the probe in the tail gives the longest overlap
+    position = tail.find(probe)
+    while position != -1:
+        size = len(tail) - position
+        if current.startswith(tail[position:]):
+            return current[size:]
+        position = tail.find(probe, position + 1)
+    return current
+
+
+def _truncate_to_bytes(text: str, max_bytes: int) -> str:
+    """Cut text to at most max_bytes UTF-8 bytes, at a word boundary when one is near."""
+    encoded = text.encode("utf-8")
+    if len(encoded) <= max_bytes:
+        return text
+    cut = encoded[:max_bytes].decode("utf-8", errors="ignore")
+    space = cut.rfind(" ")
+    if space > len(cut) * 0.8:
+        cut = cut[:space]
+    return cut.rstrip()
+
+
+def _excerpt(text: str, start: int, end: int, length: int) -> str:
+    """Excerpt of text[start:end], slicing only the excerpt itself."""
+    while start < end and text[start].isspace():
+        start += 1
+    if end - start > length:
+        return text[start:start + length] + "..."
+    return text[start:end].rstrip()
+
+
+def build_passages(chunks: list[dict[str, Any]], max_overlap: int = 200) -> list[dict[str, Any]]:
+    """
+    Merge ranked chunks into passages of adjacent chunks, in rank order.
+
+    Each passage has doc_id, score (best chunk similarity), text and segments:
+    one (chunk, offset, length) per chunk, locating its de-duplicated text.
+    """
+    seen: set[str] = set()
+    by_doc: dict[str, list[tuple[int, int, dict]]] = {}
+    for rank, chunk in enumerate(chunks):
+        if chunk["chunk_id"] in seen:
+            continue
+        seen.add(chunk["chunk_id"])
+        by_doc.setdefault(chunk["doc_id"], []).append((chunk.get("chunk_index", -1), rank, chunk))
+
+    passages = []
+    for doc_id, members in by_doc.items():
+        members.sort(key=lambda m: m[0])
+        run: list[tuple[int, int, dict]] = []
+        for member in members:
+            if run and (member[0] < 0 or member[0] != run[-1][0] + 1):
+                passages.append(_merge_run(doc_id, run, max_overlap))
+                run = []
+            run.append(member)
+        if run:
+            passages.append(_merge_run(doc_id, run, max_overlap))
+
+    passages.sort(key=lambda p: p["rank"])
+    return passages
+
+
+def _merge_run(doc_id: str, run: list[tuple[int, int, dict]], max_overlap: int) -> dict[str, Any]:
+    parts: list[str] = []
+    segments = []
+    offset = 0
+    previous = ""
+    for _, _, chunk in run:
+        content = chunk["content"]
+        text = strip_overlap(previous, content, max_overlap) if previous else content
+        segments.append((chunk, offset, len(text)))
+        parts.append(text)
+        offset += len(text)
+        previous = content
+    return {
+        "doc_id": doc_id,
+        "rank": min(rank for _, rank, _ in run),
+        "score": max(chunk["similarity"] for _, _, chunk in run),
+        "text": "".join(parts),
+        "segments": segments,
+    }
+
+
+def get_context_budget() -> tuple[int, int]:
+    """(max_bytes, max_tokens) from CONTEXT_MAX_BYTES / CONTEXT_MAX_TOKENS; 0 means unlimited."""
+    return int(os.getenv("CONTEXT_MAX_BYTES", "16000")), int(os.getenv("CONTEXT_MAX_TOKENS", "0"))
+
+
+def assemble_context(
+    chunks: list[dict[str, Any]],
+    max_bytes: int | None = None,
+    max_tokens: int | None = None,
+    excerpt_chars: int | None = None,
+) -> dict[str, Any]:
+    """
+    Build answer text and citations from ranked chunks within a budget.
+
+    Returns a dict with text, citations (one per chunk that contributed
+    text), bytes, passages, truncated (budget cut something) and
+    dropped_chunks (chunks left out entirely).
+    """
+    default_bytes, default_tokens = get_context_budget()
+    max_bytes = default_bytes if max_bytes is None else max_bytes
+    max_tokens = default_tokens if max_tokens is None else max_tokens
+    if excerpt_chars is None:
+        excerpt_chars = int(os.getenv("CONTEXT_EXCERPT_CHARS", "200"))
+
+    # Token budget is enforced through the same byte estimate
+    budgets = [b for b in (max_bytes, max_tokens * 4) if b > 0]
+    budget = min(budgets) if budgets else None
+
+    passages = build_passages(chunks)
+    parts: list[str] = []
+    citations = []
+    used = 0
+    truncated = False
+    included_chunks = 0
+
+    for passage in passages:
+        text = passage["text"]
+        separator = len(PASSAGE_SEPARATOR) if parts else 0
+        size = len(text.encode("utf-8"))
+        if budget is not None and used + separator + size > budget:
+            remaining = budget - used - separator
+            truncated = True
+            if remaining < MIN_OVERLAP_MATCH:
+                break
+            text = _truncate_to_bytes(text, remaining)
+            size = len(text.encode("utf-8"))
+
+        for chunk, offset, length in passage["segments"]:
+            if offset >= len(text):
+                break
+            included_chunks += 1
+            citations.append({
+                "doc_id": chunk["doc_id"],
+                "chunk_id": chunk["chunk_id"],
+                "score": chunk["similarity"],
+                "excerpt": _excerpt(text, offset, min(offset + length, len(text)), excerpt_chars),
+            })
+        parts.append(text)
+        used += separator + size
+        if truncated:
+            break
+
+    return {
+        "text": PASSAGE_SEPARATOR.join(parts),
+        "citations": citations,
+        "bytes": used,
+        "passages": len(parts),
+        "truncated": truncated,
+        "dropped_chunks": sum(len(p["segments"]) for p in passages) - included_chunks,
+    }
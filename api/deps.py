@@ -3,11 +3,16 @@
 import os
 from functools import lru_cache
 
-import boto3
-from botocore.exceptions import NoCredentialsError, ClientError
-from dotenv import load_dotenv
 
-load_dotenv()
+@lru_cache()
+def load_env() -> bool:
+    """Load .env into the process environment once (variables already set win).
+    
+    Called from the app lifespan and from CLI entry points, not at import time.
+    """
+    from dotenv import load_dotenv
+    
+    return load_dotenv()
 
 
 def _validate_aws_credentials():
@@ -16,6 +21,9 @@ def _validate_aws_credentials():
     Checks both environment variables and boto3's credential chain.
     Fails fast with clear error if credentials are missing or contain placeholders.
     """
+    import boto3
+    from botocore.exceptions import NoCredentialsError
+    
     placeholder_values = [
         "your_access_key_here",
         "your_secret_key_here",
@@ -82,7 +90,12 @@ def get_s3_client():
     Validates credentials are present and not placeholders.
     Fails fast with clear error message if credentials are missing or invalid.
     Creates client with explicit region to ensure SigV4 presigning.
+    
+    boto3 is imported here so importing the app does not pay for it.
     """
+    import boto3
+    from botocore.exceptions import ClientError, NoCredentialsError
+    
     # Validate credentials before creating client
     _validate_aws_credentials()
     
@@ -115,6 +128,26 @@ def get_s3_client():
         raise
 
 
+@lru_cache()
+def get_aws_credentials():
+    """Get credentials from boto3's default chain, for local presigning.
+
+    Validated like get_s3_client. Returns boto3 credentials; call
+    get_frozen_credentials() for a consistent, refreshed snapshot.
+    """
+    import boto3
+
+    _validate_aws_credentials()
+    credentials = boto3.Session().get_credentials()
+    if credentials is None:
+        raise ValueError(
+            "AWS credentials not found. "
+            "Please set AWS_ACCESS_KEY_ID and AWS_SECRET_ACCESS_KEY environment variables, "
+            "or configure ~/.aws/credentials file"
+        )
+    return credentials
+
+
 @lru_cache()
 def get_s3_bucket():
     """Get S3 bucket name from env."""
@@ -1,19 +1,38 @@
 """FastAPI main application."""
 
+import asyncio
 import json
 import logging
 import os
+from contextlib import asynccontextmanager
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
+from fastapi.responses import JSONResponse, PlainTextResponse
 
-from api.deps import get_s3_bucket, get_s3_client, validate_region_consistency
-from api.models import AskRequest, AskResponse, PresignRequest, PresignResponse
+from api import metrics, startup
+from api.admission import OverloadedError, get_admission_controller, run_in_ask_executor, timeout_stage
+from api.deps import get_s3_bucket, get_s3_client
+from api.models import (
+    AskRequest,
+    AskResponse,
+    MultipartAbortRequest,
+    MultipartCompleteRequest,
+    MultipartCompleteResponse,
+    MultipartPresignRequest,
+    MultipartPresignResponse,
+    PresignBatchRequest,
+    PresignBatchResponse,
+    PresignedPart,
+    PresignRequest,
+    PresignResponse,
+)
+from api.presign import get_presigner, plan_parts, trace_id_from_upload_key
 from api.rag import answer_question
+from api.responses import ask_payload, json_response
+from api.supabase_db import close_pool
 from api.utils import build_s3_key, generate_trace_id
-
-load_dotenv()
+from worker.tracing import span
 
 # Configure logging
 logging.basicConfig(
@@ -22,22 +41,32 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-# Validate region consistency and log configuration on startup
-try:
-    validate_region_consistency()
-    bucket = get_s3_bucket()
-    # Get region from env for logging (same logic as deps)
-    import os
-    region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
-    logger.info(f"S3 configuration: region={region}, bucket={bucket}")
-except Exception as e:
-    logger.error(f"Startup validation failed: {e}")
-    raise
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Validate configuration and warm dependencies (see api.startup)."""
+    try:
+        warmup_task = await startup.start()
+    except Exception as e:
+        logger.error(f"Startup validation failed: {e}")
+        raise
+    try:
+        yield
+    finally:
+        if warmup_task is not None and not warmup_task.done():
+            warmup_task.cancel()
+            try:
+                await warmup_task
+            except asyncio.CancelledError:
+                pass
+        await asyncio.to_thread(close_pool)
+
 
 app = FastAPI(
     title="AWS Proof Layer API",
     description="RAG pipeline API with S3, SQS, Lambda, and Supabase",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 # CORS middleware
@@ -52,69 +81,229 @@ app.add_middleware(
 
 @app.get("/health")
 async def health():
-    """Health check endpoint."""
+    """Liveness check endpoint."""
     return {"ok": True}
 
 
+@app.get("/ready")
+async def ready():
+    """Readiness probe: 200 once startup dependencies are warm, else 503 with per-component status."""
+    startup.retry_failed()
+    report = startup.readiness()
+    return JSONResponse(report, status_code=200 if report["ready"] else 503)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Prometheus metrics endpoint."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+def _presign_upload(presigner, bucket: str, file: PresignRequest) -> dict:
+    """Mint a trace_id, key and presigned PUT URL for one file (a PresignResponse dict)."""
+    trace_id = generate_trace_id()
+    key = build_s3_key(trace_id, file.filename)
+    
+    # Start of the upload-to-searchable timeline for this trace_id
+    with span("presign", trace_id=trace_id, bucket=bucket, key=key):
+        url = presigner.put_url(bucket, key, file.content_type, file.expires_in)
+    
+    return {"trace_id": trace_id, "bucket": bucket, "key": key, "url": url}
+
+
 @app.post("/presign", response_model=PresignResponse)
 async def presign(request: PresignRequest):
     """Generate presigned S3 URL for file upload."""
     try:
-        trace_id = generate_trace_id()
         bucket = get_s3_bucket()
-        key = build_s3_key(trace_id, request.filename)
+        result = _presign_upload(get_presigner(), bucket, request)
+        
+        logger.info(
+            json.dumps({
+                "event": "presign_created",
+                "trace_id": result["trace_id"],
+                "bucket": bucket,
+                "key": result["key"],
+            })
+        )
         
-        s3_client = get_s3_client()
+        return result
+    except Exception as e:
+        logger.error(f"Error generating presigned URL: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/presign/batch", response_model=PresignBatchResponse)
+def presign_batch(request: PresignBatchRequest, http_request: Request):
+    """Generate presigned S3 URLs for up to 1000 files, each with its own trace_id."""
+    try:
+        bucket = get_s3_bucket()
+        presigner = get_presigner()
+        items = [_presign_upload(presigner, bucket, file) for file in request.files]
         
-        # Generate presigned URL (valid for 1 hour)
-        url = s3_client.generate_presigned_url(
-            "put_object",
-            Params={
-                "Bucket": bucket,
-                "Key": key,
-                "ContentType": "text/plain",
-            },
-            ExpiresIn=3600,
+        logger.info(
+            json.dumps({
+                "event": "presign_batch_created",
+                "bucket": bucket,
+                "count": len(items),
+                "trace_ids": [item["trace_id"] for item in items],
+            })
         )
         
+        # Up to 1000 URLs: serialize directly and compress (see api.responses)
+        return json_response({"items": items}, http_request)
+    except Exception as e:
+        logger.error(f"Error generating presigned URLs: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/presign/multipart", response_model=MultipartPresignResponse)
+def presign_multipart(request: MultipartPresignRequest):
+    """
+    Start a multipart upload and presign a PUT URL per part.
+    
+    The client uploads parts in parallel, keeps each response's ETag header
+    and then calls /presign/multipart/complete.
+    """
+    try:
+        part_size, part_count = plan_parts(request.size_bytes, request.part_size_bytes)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        trace_id = generate_trace_id()
+        bucket = get_s3_bucket()
+        key = build_s3_key(trace_id, request.filename)
+        
+        with span("presign", trace_id=trace_id, bucket=bucket, key=key, multipart=True, parts=part_count):
+            upload = get_s3_client().create_multipart_upload(
+                Bucket=bucket,
+                Key=key,
+                ContentType=request.content_type,
+            )
+            upload_id = upload["UploadId"]
+            presigner = get_presigner()
+            parts = [
+                PresignedPart(
+                    part_number=n,
+                    url=presigner.upload_part_url(bucket, key, upload_id, n, request.expires_in),
+                )
+                for n in range(1, part_count + 1)
+            ]
+        
         logger.info(
             json.dumps({
-                "event": "presign_created",
+                "event": "multipart_created",
                 "trace_id": trace_id,
                 "bucket": bucket,
                 "key": key,
+                "parts": part_count,
+                "part_size_bytes": part_size,
             })
         )
         
-        return PresignResponse(
+        return MultipartPresignResponse(
             trace_id=trace_id,
             bucket=bucket,
             key=key,
-            url=url,
+            upload_id=upload_id,
+            part_size_bytes=part_size,
+            parts=parts,
         )
     except Exception as e:
-        logger.error(f"Error generating presigned URL: {e}", exc_info=True)
+        logger.error(f"Error starting multipart upload: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/presign/multipart/complete", response_model=MultipartCompleteResponse)
+def complete_multipart(request: MultipartCompleteRequest):
+    """Complete a multipart upload; S3 then emits the event that triggers ingestion."""
+    try:
+        trace_id = trace_id_from_upload_key(request.key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        bucket = get_s3_bucket()
+        parts = sorted(request.parts, key=lambda p: p.part_number)
+        result = get_s3_client().complete_multipart_upload(
+            Bucket=bucket,
+            Key=request.key,
+            UploadId=request.upload_id,
+            MultipartUpload={"Parts": [{"PartNumber": p.part_number, "ETag": p.etag} for p in parts]},
+        )
+        
+        logger.info(
+            json.dumps({
+                "event": "multipart_completed",
+                "trace_id": trace_id,
+                "bucket": bucket,
+                "key": request.key,
+                "parts": len(parts),
+            })
+        )
+        
+        return MultipartCompleteResponse(trace_id=trace_id, bucket=bucket, key=request.key, etag=result.get("ETag"))
+    except Exception as e:
+        logger.error(f"Error completing multipart upload: {e}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+
+@app.post("/presign/multipart/abort")
+def abort_multipart(request: MultipartAbortRequest):
+    """Abort a multipart upload so S3 discards the uploaded parts."""
+    try:
+        trace_id = trace_id_from_upload_key(request.key)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        get_s3_client().abort_multipart_upload(Bucket=get_s3_bucket(), Key=request.key, UploadId=request.upload_id)
+        logger.info(json.dumps({"event": "multipart_aborted", "trace_id": trace_id, "key": request.key}))
+        return {"trace_id": trace_id, "aborted": True}
+    except Exception as e:
+        logger.error(f"Error aborting multipart upload: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 
 @app.post("/ask", response_model=AskResponse)
-async def ask(request: AskRequest):
-    """Answer a question using RAG."""
+async def ask(request: AskRequest, http_request: Request):
+    """Answer a question using RAG.
+    
+    Runs under admission control (see api.admission): when overloaded, or when
+    a stage runs out of time, the response is 503 with Retry-After.
+    """
     try:
-        result = answer_question(request.question, request.top_k)
+        filters = request.filters.model_dump(exclude_none=True) if request.filters else None
+        async with get_admission_controller().admit():
+            result = await run_in_ask_executor(answer_question, request.question, request.top_k, filters=filters)
         
         logger.info(
             json.dumps({
                 "event": "ask_query",
                 "trace_id": result["trace_id"],
                 "question": request.question,
+                "filtered": bool(filters),
                 "refused": result["refused"],
                 "citations_count": len(result["citations"]),
             })
         )
         
-        return AskResponse(**result)
+        # Serialize here (instead of via response_model) so the stage is measured
+        # and the response is not validated a second time; compression is
+        # negotiated from Accept-Encoding
+        with metrics.stage_timer("serialization"):
+            response = json_response(ask_payload(result), http_request)
+        return response
+    except OverloadedError as e:
+        logger.warning(f"Shedding /ask request: {e.reason}")
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": str(e.retry_after)})
     except Exception as e:
+        stage = timeout_stage(e)
+        if stage is not None:
+            metrics.ASK_TIMEOUTS.labels(stage).inc()
+            logger.warning(f"/ask timed out in {stage}: {e}")
+            raise HTTPException(status_code=503, detail=f"Timed out in {stage}", headers={"Retry-After": "1"})
         logger.error(f"Error answering question: {e}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -0,0 +1,312 @@
+"""Prometheus metrics for the API.
+
+A small in-process registry rendering the Prometheus text exposition format,
+so the API needs no extra dependency for /metrics. Label values must come from
+fixed sets in code (stage names, refusal reasons, ...), never from request
+data, which keeps series cardinality bounded.
+"""
+
+import threading
+import time
+from collections.abc import Callable, Iterator
+from contextlib import contextmanager
+
+from worker.tracing import span
+
+# Seconds; covers sub-millisecond stages up to slow embedding/DB calls
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+_registry: list["_Metric"] = []
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    """Base class: a named metric with a fixed set of label names."""
+
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: dict[tuple[str, ...], object] = {}
+        self._lock = threading.Lock()
+        _registry.append(self)
+
+    def _new_child(self):
+        raise NotImplementedError
+
+    def labels(self, *values: str):
+        """Return the child series for these label values."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(key, self._new_child())
+        return child
+
+    def _samples(self) -> Iterator[str]:
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.type_name}"]
+        lines.extend(self._samples())
+        return "\n".join(lines)
+
+
+class _CounterChild:
+    def __init__(self):
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    type_name = "counter"
+
+    def _new_child(self):
+        return _CounterChild()
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def _samples(self) -> Iterator[str]:
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+
+
+class _GaugeChild:
+    def __init__(self):
+        self.value = 0.0
+        self.function: Callable[[], float] | None = None
+        self._lock = threading.Lock()
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1.0) -> None:
+        with self._lock:
+            self.value += amount
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.inc(-amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        """Compute the value at scrape time instead of storing it."""
+        self.function = function
+
+    def get(self) -> float:
+        if self.function is not None:
+            try:
+                return float(self.function())
+            except Exception:
+                return float("nan")
+        return self.value
+
+
+class Gauge(_Metric):
+    """Value that can go up and down, or be computed at scrape time."""
+
+    type_name = "gauge"
+
+    def _new_child(self):
+        return _GaugeChild()
+
+    def set(self, value: float) -> None:
+        self.labels().set(value)
+
+    def inc(self, amount: float = 1.0) -> None:
+        self.labels().inc(amount)
+
+    def dec(self, amount: float = 1.0) -> None:
+        self.labels().dec(amount)
+
+    def set_function(self, function: Callable[[], float]) -> None:
+        self.labels().set_function(function)
+
+    def _samples(self) -> Iterator[str]:
+        for values, child in list(self._children.items()):
+            yield f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.get())}"
+
+
+class _HistogramChild:
+    def __init__(self, buckets: tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0.0
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        with self._lock:
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    self.counts[i] += 1
+                    break
+            self.sum += value
+            self.count += 1
+
+
+class Histogram(_Metric):
+    """Distribution of observed values in fixed buckets."""
+
+    type_name = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: tuple[str, ...] = (),
+        buckets: tuple[float, ...] = DEFAULT_BUCKETS,
+    ):
+        self.buckets = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramChild(self.buckets)
+
+    def observe(self, value: float) -> None:
+        self.labels().observe(value)
+
+    def _samples(self) -> Iterator[str]:
+        for values, child in list(self._children.items()):
+            with child._lock:
+                counts, total, count = list(child.counts), child.sum, child.count
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = _format_labels(self.labelnames, values, f'le="{_format_value(bound)}"')
+                yield f"{self.name}_bucket{le} {cumulative}"
+            le = _format_labels(self.labelnames, values, 'le="+Inf"')
+            yield f"{self.name}_bucket{le} {count}"
+            labels = _format_labels(self.labelnames, values)
+            yield f"{self.name}_sum{labels} {_format_value(total)}"
+            yield f"{self.name}_count{labels} {count}"
+
+
+def render() -> str:
+    """Render all registered metrics in Prometheus text format."""
+    return "\n".join(metric.render() for metric in _registry) + "\n"
+
+
+# Per-stage latency of /ask. Stages: embed_question, db_acquire, vector_query,
+# lexical_query, answer_assembly, serialization
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds",
+    "Duration of each /ask processing stage",
+    ("stage",),
+)
+
+CONTEXT_BYTES = Histogram(
+    "rag_context_bytes",
+    "Size of the assembled answer context in bytes",
+    buckets=(500, 1000, 2000, 4000, 8000, 16000, 32000, 64000),
+)
+
+REFUSALS = Counter(
+    "rag_refusals_total",
+    "Refused /ask answers by reason",
+    ("reason",),
+)
+
+LOW_CONFIDENCE = Counter(
+    "rag_low_confidence_answers_total",
+    "Answers returned below the similarity threshold but above the fallback floor",
+)
+
+CACHE_HITS = Counter(
+    "rag_cache_hits_total",
+    "Cache hits by cache name",
+    ("cache",),
+)
+
+CACHE_MISSES = Counter(
+    "rag_cache_misses_total",
+    "Cache misses by cache name",
+    ("cache",),
+)
+
+DB_POOL_SIZE = Gauge("db_pool_connections", "Connections currently open in the DB pool")
+DB_POOL_AVAILABLE = Gauge("db_pool_connections_available", "Idle connections in the DB pool")
+DB_POOL_WAITING = Gauge("db_pool_requests_waiting", "Requests waiting for a DB pool connection")
+DB_POOL_MAX = Gauge("db_pool_max_connections", "Configured maximum DB pool size")
+
+STARTUP_SECONDS = Gauge("app_startup_seconds", "Time from lifespan start until the app began serving")
+WARMUP_SECONDS = Gauge("app_warmup_seconds", "Warm-up duration of each startup component", ("component",))
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """Time a block, record it in the stage latency histogram and as a child span."""
+    start = time.perf_counter()
+    try:
+        with span(stage):
+            yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+# Admission control for /ask (see api.admission). Decisions: admitted,
+# queue_full, deadline (estimated wait too long), queue_timeout
+ADMISSION_DECISIONS = Counter(
+    "ask_admission_decisions_total",
+    "Admission control decisions for /ask",
+    ("decision",),
+)
+ADMISSION_WAIT_SECONDS = Histogram(
+    "ask_admission_wait_seconds",
+    "Time /ask requests spent queued for admission",
+)
+ADMISSION_LIMIT = Gauge("ask_concurrency_limit", "Maximum concurrent /ask requests")
+ADMISSION_IN_FLIGHT = Gauge("ask_in_flight", "/ask requests currently admitted")
+ADMISSION_QUEUED = Gauge("ask_queued", "/ask requests waiting for admission")
+ASK_TIMEOUTS = Counter(
+    "ask_timeouts_total",
+    "/ask requests that ran out of time, by stage (embedding, db_acquire, db_statement, single_flight)",
+    ("stage",),
+)
+
+EMBEDDING_BATCH_SIZE = Histogram(
+    "rag_embedding_batch_size",
+    "Questions per coalesced embedding provider request (count = provider requests)",
+    buckets=(1, 2, 4, 8, 16, 32, 64),
+)
+
+SINGLE_FLIGHT_SHARED = Counter(
+    "rag_single_flight_shared_total",
+    "/ask requests answered from an identical request already in flight",
+)
+
+# Semantic retrieval cache (see api.semantic_cache); hits and misses are
+# counted in rag_cache_hits_total / rag_cache_misses_total{cache="semantic"}
+SEMANTIC_CACHE_SIMILARITY = Histogram(
+    "rag_semantic_cache_similarity",
+    "Cosine similarity of the closest cached question found on lookup",
+    buckets=(0.5, 0.8, 0.85, 0.9, 0.93, 0.95, 0.97, 0.99, 1.0),
+)
+SEMANTIC_CACHE_ENTRIES = Gauge("rag_semantic_cache_entries", "Entries in the semantic retrieval cache")
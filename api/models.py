@@ -1,5 +1,8 @@
 """Pydantic models for API requests and responses."""
 
+from datetime import datetime
+from uuid import UUID
+
 from pydantic import BaseModel, Field
 
 
@@ -7,6 +10,10 @@ class PresignRequest(BaseModel):
     """Request for presigned S3 URL."""
 
     filename: str = Field(..., description="Filename to upload")
+    content_type: str = Field(
+        default="text/plain", max_length=255, description="Content-Type the upload must be sent with"
+    )
+    expires_in: int = Field(default=3600, ge=60, le=604800, description="URL lifetime in seconds")
 
 
 class PresignResponse(BaseModel):
@@ -18,11 +25,102 @@ class PresignResponse(BaseModel):
     url: str
 
 
+class PresignBatchRequest(BaseModel):
+    """Request for presigned S3 URLs for many files."""
+
+    files: list[PresignRequest] = Field(..., min_length=1, max_length=1000, description="Files to upload")
+
+
+class PresignBatchResponse(BaseModel):
+    """Presigned S3 URLs, in request order, one trace_id per file."""
+
+    items: list[PresignResponse]
+
+
+class MultipartPresignRequest(BaseModel):
+    """Request to start a multipart upload with presigned part URLs."""
+
+    filename: str = Field(..., description="Filename to upload")
+    size_bytes: int = Field(..., gt=0, le=5 * 1024**4, description="Total file size")
+    part_size_bytes: int | None = Field(
+        default=None, ge=5 * 1024**2, le=5 * 1024**3, description="Part size (default MULTIPART_PART_SIZE_MB)"
+    )
+    content_type: str = Field(default="text/plain", max_length=255, description="Content-Type of the object")
+    expires_in: int = Field(default=3600, ge=60, le=604800, description="Part URL lifetime in seconds")
+
+
+class PresignedPart(BaseModel):
+    """Presigned URL for one part of a multipart upload."""
+
+    part_number: int
+    url: str
+
+
+class MultipartPresignResponse(BaseModel):
+    """Multipart upload with one presigned PUT URL per part."""
+
+    trace_id: str
+    bucket: str
+    key: str
+    upload_id: str
+    part_size_bytes: int
+    parts: list[PresignedPart]
+
+
+class CompletedPart(BaseModel):
+    """An uploaded part: its number and the ETag header S3 returned for it."""
+
+    part_number: int = Field(..., ge=1, le=10000)
+    etag: str = Field(..., min_length=1)
+
+
+class MultipartCompleteRequest(BaseModel):
+    """Request to complete a multipart upload."""
+
+    key: str
+    upload_id: str = Field(..., min_length=1)
+    parts: list[CompletedPart] = Field(..., min_length=1, max_length=10000)
+
+
+class MultipartCompleteResponse(BaseModel):
+    """Completed multipart upload; the object is now queued for ingestion."""
+
+    trace_id: str
+    bucket: str
+    key: str
+    etag: str | None = None
+
+
+class MultipartAbortRequest(BaseModel):
+    """Request to abort a multipart upload and discard its parts."""
+
+    key: str
+    upload_id: str = Field(..., min_length=1)
+
+
+class SearchFilters(BaseModel):
+    """Metadata filters that scope retrieval to a subset of chunks."""
+
+    document_ids: list[UUID] | None = Field(
+        default=None, min_length=1, max_length=1000, description="Only search these documents"
+    )
+    trace_ids: list[str] | None = Field(
+        default=None, min_length=1, max_length=1000, description="Only search chunks with these trace IDs"
+    )
+    created_after: datetime | None = Field(
+        default=None, description="Only search chunks created at or after this time"
+    )
+    created_before: datetime | None = Field(
+        default=None, description="Only search chunks created before this time"
+    )
+
+
 class AskRequest(BaseModel):
     """Request for RAG query."""
 
     question: str = Field(..., description="Question to answer")
     top_k: int = Field(default=10, ge=1, le=20, description="Number of chunks to retrieve")
+    filters: SearchFilters | None = Field(default=None, description="Optional retrieval filters")
 
 
 class Citation(BaseModel):
@@ -0,0 +1,176 @@
+"""S3 presigning for single, batch and multipart uploads.
+
+Presigning is pure local computation, so URLs are signed here with SigV4
+query-string auth (stdlib hmac/hashlib) instead of going through
+boto3's generate_presigned_url, which builds and serializes a full request
+per URL. The signing key is derived once per presigner (4 HMACs); each URL
+then costs one SHA-256 and one HMAC, so a batch of 1000 signs in milliseconds.
+
+PRESIGN_SIGNER selects the implementation: 'local' (default) or 'boto3'.
+"""
+
+import hashlib
+import hmac
+import math
+import os
+import re
+from datetime import UTC, datetime
+from urllib.parse import quote
+
+from api.deps import _get_aws_region, get_aws_credentials, get_s3_client
+
+MIB = 1024 * 1024
+MIN_PART_SIZE = 5 * MIB  # S3 minimum for all but the last part
+MAX_PART_SIZE = 5 * 1024 * MIB
+MAX_PARTS = 10_000
+
+# Keys minted by build_s3_key: uploads/YYYY/MM/DD/{trace_id}/filename
+UPLOAD_KEY_PATTERN = re.compile(r"^uploads/\d{4}/\d{2}/\d{2}/([a-f0-9-]{36})/[A-Za-z0-9._-]+$")
+
+
+def _encode(value: str, safe: str = "-_.~") -> str:
+    """SigV4 URI encoding (RFC 3986 unreserved characters kept)."""
+    return quote(value, safe=safe)
+
+
+def _hmac(key: bytes, message: str) -> bytes:
+    return hmac.new(key, message.encode("utf-8"), hashlib.sha256).digest()
+
+
+class S3Presigner:
+    """SigV4 query-string presigner for one set of credentials and one signing time."""
+
+    def __init__(
+        self,
+        access_key: str,
+        secret_key: str,
+        region: str,
+        token: str | None = None,
+        now: datetime | None = None,
+    ):
+        now = now or datetime.now(UTC)
+        date_stamp = now.strftime("%Y%m%d")
+        self.access_key = access_key
+        self.region = region
+        self.token = token
+        self.amz_date = now.strftime("%Y%m%dT%H%M%SZ")
+        self.scope = f"{date_stamp}/{region}/s3/aws4_request"
+        key = _hmac(f"AWS4{secret_key}".encode(), date_stamp)
+        key = _hmac(key, region)
+        key = _hmac(key, "s3")
+        self.signing_key = _hmac(key, "aws4_request")
+
+    def _host_and_path(self, bucket: str, key: str) -> tuple[str, str]:
+        endpoint = "s3.amazonaws.com" if self.region == "us-east-1" else f"s3.{self.region}.amazonaws.com"
+        path = "/" + _encode(key, safe="/-_.~")
+        if "." in bucket:
+            # Dotted bucket names break virtual-hosted TLS; use path style
+            return endpoint, f"/{bucket}{path}"
+        return f"{bucket}.{endpoint}", path
+
+    def url(
+        self,
+        method: str,
+        bucket: str,
+        key: str,
+        expires_in: int,
+        headers: dict[str, str] | None = None,
+        params: dict[str, str] | None = None,
+    ) -> str:
+        """Presign one request; headers given here must be sent unchanged by the uploader."""
+        host, path = self._host_and_path(bucket, key)
+        signed = {"host": host, **{k.lower(): v.strip() for k, v in (headers or {}).items()}}
+        signed_names = ";".join(sorted(signed))
+
+        query = {
+            **(params or {}),
+            "X-Amz-Algorithm": "AWS4-HMAC-SHA256",
+            "X-Amz-Credential": f"{self.access_key}/{self.scope}",
+            "X-Amz-Date": self.amz_date,
+            "X-Amz-Expires": str(expires_in),
+            "X-Amz-SignedHeaders": signed_names,
+        }
+        if self.token:
+            query["X-Amz-Security-Token"] = self.token
+        canonical_query = "&".join(
+            f"{k}={v}" for k, v in sorted((_encode(k), _encode(str(v))) for k, v in query.items())
+        )
+
+        canonical_request = "\n".join([
+            method,
+            path,
+            canonical_query,
+            "".join(f"{name}:{signed[name]}\n" for name in sorted(signed)),
+            signed_names,
+            "UNSIGNED-PAYLOAD",
+        ])
+        string_to_sign = "\n".join([
+            "AWS4-HMAC-SHA256",
+            self.amz_date,
+            self.scope,
+            hashlib.sha256(canonical_request.encode("utf-8")).hexdigest(),
+        ])
+        signature = hmac.new(self.signing_key, string_to_sign.encode("utf-8"), hashlib.sha256).hexdigest()
+        return f"https://{host}{path}?{canonical_query}&X-Amz-Signature={signature}"
+
+    def put_url(self, bucket: str, key: str, content_type: str, expires_in: int) -> str:
+        return self.url("PUT", bucket, key, expires_in, headers={"Content-Type": content_type})
+
+    def upload_part_url(self, bucket: str, key: str, upload_id: str, part_number: int, expires_in: int) -> str:
+        params = {"partNumber": str(part_number), "uploadId": upload_id}
+        return self.url("PUT", bucket, key, expires_in, params=params)
+
+
+class Boto3Presigner:
+    """Presigner backed by the boto3 client (PRESIGN_SIGNER=boto3)."""
+
+    def __init__(self, client):
+        self.client = client
+
+    def put_url(self, bucket: str, key: str, content_type: str, expires_in: int) -> str:
+        return self.client.generate_presigned_url(
+            "put_object",
+            Params={"Bucket": bucket, "Key": key, "ContentType": content_type},
+            ExpiresIn=expires_in,
+        )
+
+    def upload_part_url(self, bucket: str, key: str, upload_id: str, part_number: int, expires_in: int) -> str:
+        return self.client.generate_presigned_url(
+            "upload_part",
+            Params={"Bucket": bucket, "Key": key, "UploadId": upload_id, "PartNumber": part_number},
+            ExpiresIn=expires_in,
+        )
+
+
+def get_presigner() -> S3Presigner | Boto3Presigner:
+    """Presigner for one request (or batch), using current (refreshed) credentials."""
+    if os.getenv("PRESIGN_SIGNER", "local").lower() == "boto3":
+        return Boto3Presigner(get_s3_client())
+    credentials = get_aws_credentials().get_frozen_credentials()
+    return S3Presigner(credentials.access_key, credentials.secret_key, _get_aws_region(), credentials.token)
+
+
+def get_default_part_size() -> int:
+    """Default multipart part size in bytes (MULTIPART_PART_SIZE_MB, default 16)."""
+    return int(float(os.getenv("MULTIPART_PART_SIZE_MB", "16")) * MIB)
+
+
+def plan_parts(size_bytes: int, part_size: int | None = None) -> tuple[int, int]:
+    """
+    Choose (part_size, part_count) for a multipart upload of size_bytes.
+
+    The part size is grown if needed to stay within S3's 10,000-part limit.
+    """
+    part_size = max(part_size or get_default_part_size(), MIN_PART_SIZE)
+    part_size = max(part_size, math.ceil(size_bytes / MAX_PARTS))
+    if part_size > MAX_PART_SIZE:
+        raise ValueError(f"File of {size_bytes} bytes exceeds the multipart upload limit")
+    return part_size, max(1, math.ceil(size_bytes / part_size))
+
+
+def trace_id_from_upload_key(key: str) -> str:
+    """Return the trace_id of a key minted by /presign, or raise ValueError for any other key."""
+    match = UPLOAD_KEY_PATTERN.match(key)
+    if not match:
+        raise ValueError("key is not an upload key issued by this API")
+    return match.group(1)
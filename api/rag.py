@@ -1,33 +1,233 @@
 """RAG (Retrieval Augmented Generation) logic."""
 
+import contextvars
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from typing import Any
 
-from dotenv import load_dotenv
-
-from api.supabase_db import get_table_counts, search_similar_chunks
+from api import metrics
+from api.admission import EmbeddingTimeoutError, get_ask_timeout, stage_timeout
+from api.coalescer import coalescing_enabled, get_embedding_coalescer
+from api.context import assemble_context, estimate_tokens
+from api.semantic_cache import get_corpus_version_poller, get_semantic_cache, semantic_cache_enabled
+from api.singleflight import SingleFlight, ask_key, filters_key
+from api.supabase_db import (
+    get_table_counts,
+    search_hierarchical_chunks,
+    search_lexical_chunks,
+    search_similar_chunks,
+)
 from api.utils import generate_trace_id
 from worker.embeddings import get_embedding
-
-load_dotenv()
+from worker.tracing import span
 
 logger = logging.getLogger(__name__)
 
+# Identical questions being answered at the same time share one computation
+_in_flight = SingleFlight()
+
+
+@lru_cache(maxsize=1)
+def get_retrieval_executor() -> ThreadPoolExecutor:
+    """Executor for the lexical leg of hybrid retrieval (HYBRID_MAX_WORKERS threads).
+    
+    Created on first use so HYBRID_MAX_WORKERS can come from .env (loaded at startup).
+    """
+    return ThreadPoolExecutor(
+        max_workers=int(os.getenv("HYBRID_MAX_WORKERS", "8")),
+        thread_name_prefix="retrieval",
+    )
+
 
-def answer_question(question: str, top_k: int = 10) -> dict[str, Any]:
+def reciprocal_rank_fusion(
+    result_lists: list[list[dict[str, Any]]],
+    k: int = 60,
+    limit: int | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Fuse ranked chunk lists with reciprocal-rank fusion.
+    
+    Each chunk scores sum(1 / (k + rank)) over the lists it appears in, so
+    chunks ranked well by both legs come first. The fused score is added to
+    each chunk as `rrf_score`.
+    """
+    scores: dict[str, float] = {}
+    chunks: dict[str, dict[str, Any]] = {}
+    
+    for results in result_lists:
+        for rank, chunk in enumerate(results, start=1):
+            chunk_id = chunk["chunk_id"]
+            scores[chunk_id] = scores.get(chunk_id, 0.0) + 1.0 / (k + rank)
+            chunks.setdefault(chunk_id, chunk)
+    
+    ranked_ids = sorted(scores, key=scores.__getitem__, reverse=True)
+    if limit is not None:
+        ranked_ids = ranked_ids[:limit]
+    return [{**chunks[chunk_id], "rrf_score": scores[chunk_id]} for chunk_id in ranked_ids]
+
+
+def _timed(fn, *args) -> tuple[Any, float]:
+    """Call fn(*args) and return (result, elapsed_ms)."""
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, (time.perf_counter() - start) * 1000
+
+
+def search_vector(
+    question_embedding: list[float],
+    top_k: int,
+    similarity_threshold: float,
+    filters: dict[str, Any] | None = None,
+    hierarchical: bool = False,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """
+    search_similar_chunks (or, with hierarchical, search_hierarchical_chunks)
+    behind the semantic cache (see api.semantic_cache).
+    
+    Without SEMANTIC_CACHE=true, or while the corpus version cannot be read,
+    this is a plain search call.
+    """
+    search = search_hierarchical_chunks if hierarchical else search_similar_chunks
+    if not semantic_cache_enabled():
+        return search(question_embedding, top_k, similarity_threshold, filters=filters)
+    version = get_corpus_version_poller().get()
+    if version is None:
+        return search(question_embedding, top_k, similarity_threshold, filters=filters)
+    
+    cache = get_semantic_cache()
+    scope = (top_k, similarity_threshold, filters_key(filters), hierarchical)
+    cached, similarity = cache.get(question_embedding, scope, version)
+    if similarity is not None:
+        metrics.SEMANTIC_CACHE_SIMILARITY.observe(similarity)
+    if cached is not None:
+        metrics.CACHE_HITS.labels("semantic").inc()
+        return cached
+    
+    metrics.CACHE_MISSES.labels("semantic").inc()
+    result = search(question_embedding, top_k, similarity_threshold, filters=filters)
+    cache.put(question_embedding, scope, version, result)
+    return result
+
+
+def retrieve_chunks(
+    question: str,
+    question_embedding: list[float],
+    top_k: int,
+    similarity_threshold: float,
+    filters: dict[str, Any] | None = None,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """
+    Retrieve chunks for a question based on RETRIEVAL_MODE env var.
+    
+    Modes:
+    - 'vector': pgvector similarity search only (default)
+    - 'hybrid': vector and full-text legs run concurrently and are fused with
+      reciprocal-rank fusion (helps with rare identifiers like ticket numbers)
+    - 'hierarchical': vector search over the chunks of the documents whose
+      centroid embeddings are closest to the question (see
+      api.supabase_db.build_hierarchical_search_query)
+    
+    Optional filters (document_ids, trace_ids, created_after, created_before)
+    apply to both legs.
+    
+    Returns (filtered_results, all_results) like search_similar_chunks.
+    """
+    mode = os.getenv("RETRIEVAL_MODE", "vector").lower()
+    if mode != "hybrid":
+        return search_vector(
+            question_embedding, top_k, similarity_threshold, filters=filters, hierarchical=mode == "hierarchical"
+        )
+    
+    # Each leg over-fetches so fusion has candidates to promote
+    leg_k = top_k * int(os.getenv("HYBRID_CANDIDATE_MULTIPLIER", "2"))
+    rrf_k = int(os.getenv("HYBRID_RRF_K", "60"))
+    
+    # copy_context keeps the lexical leg's span under the current ask span
+    lexical_future = get_retrieval_executor().submit(
+        contextvars.copy_context().run,
+        _timed, search_lexical_chunks, question, question_embedding, leg_k, filters
+    )
+    (_, vector_results), vector_ms = _timed(
+        search_vector, question_embedding, leg_k, similarity_threshold, filters
+    )
+    lexical_results, lexical_ms = lexical_future.result()
+    
+    all_results = reciprocal_rank_fusion([vector_results, lexical_results], k=rrf_k, limit=top_k)
+    filtered_results = [r for r in all_results if r["similarity"] >= similarity_threshold]
+    
+    logger.info(
+        f"RAG hybrid retrieval: vector_ms={vector_ms:.1f}, lexical_ms={lexical_ms:.1f}, "
+        f"vector_hits={len(vector_results)}, lexical_hits={len(lexical_results)}, "
+        f"fused={len(all_results)}"
+    )
+    
+    return filtered_results, all_results
+
+
+def answer_question(
+    question: str,
+    top_k: int = 10,
+    filters: dict[str, Any] | None = None,
+) -> dict[str, Any]:
     """
     Answer a question using RAG.
     
+    Optional filters scope retrieval (see api.supabase_db.build_filter_clause).
+    Stages are recorded as spans under the answer's trace_id.
+    
+    Unless ASK_SINGLE_FLIGHT=false, a request identical (same normalized
+    question, top_k and filters) to one already in progress waits for that
+    one's answer instead of embedding and querying again; it still gets its
+    own trace_id, and its ask span records the leader's as `shared_from`.
+    
     Returns answer, citations, and refusal status.
     """
     trace_id = generate_trace_id()
+    with span("ask", trace_id=trace_id, top_k=top_k, filtered=bool(filters)) as ask_span:
+        if os.getenv("ASK_SINGLE_FLIGHT", "true").lower() == "true":
+            result, shared, leader_trace_id = _in_flight.do(
+                ask_key(question, top_k, filters),
+                lambda: _answer_question(trace_id, question, top_k, filters),
+                tag=trace_id,
+                timeout=stage_timeout(get_ask_timeout()),
+            )
+            if shared:
+                metrics.SINGLE_FLIGHT_SHARED.inc()
+                ask_span.set_attribute("shared_from", leader_trace_id)
+                result = {**result, "trace_id": trace_id}
+        else:
+            result = _answer_question(trace_id, question, top_k, filters)
+        ask_span.set_attribute("refused", result["refused"])
+        ask_span.set_attribute("citations", len(result["citations"]))
+        return result
+
+
+def _answer_question(
+    trace_id: str,
+    question: str,
+    top_k: int,
+    filters: dict[str, Any] | None,
+) -> dict[str, Any]:
+    """Answer a question using RAG (body of answer_question)."""
     similarity_threshold = float(os.getenv("SIMILARITY_THRESHOLD", "0.5"))
     debug_rag = os.getenv("DEBUG_RAG", "false").lower() == "true"
     
     # Generate embedding for question
     embedding_mode = os.getenv("EMBEDDING_MODE", "fake").lower()
-    question_embedding = get_embedding(question)
+    with metrics.stage_timer("embed_question"):
+        embedding_timeout = stage_timeout(float(os.getenv("EMBEDDING_TIMEOUT_SECONDS", "30")))
+        try:
+            if coalescing_enabled():
+                # Batched with concurrent questions (see api.coalescer)
+                question_embedding = get_embedding_coalescer().embed(question, timeout=embedding_timeout)
+            else:
+                question_embedding = get_embedding(question, timeout=embedding_timeout)
+        except TimeoutError as e:
+            # Tagged so /ask reports the stage; other timeouts are not the embedding's
+            raise EmbeddingTimeoutError(str(e)) from e
     
     if debug_rag:
         logger.info(f"RAG query: embedding_mode={embedding_mode}, dimension={len(question_embedding)}, threshold={similarity_threshold}")
@@ -44,10 +244,13 @@ def answer_question(question: str, top_k: int = 10) -> dict[str, Any]:
             debug_info["table_counts_error"] = str(e)
     
     # Search for similar chunks (returns filtered and all results)
-    filtered_chunks, all_chunks = search_similar_chunks(question_embedding, top_k, similarity_threshold)
+    filtered_chunks, all_chunks = retrieve_chunks(
+        question, question_embedding, top_k, similarity_threshold, filters=filters
+    )
     
     # Get best similarity score for logging and refusal logic
-    best_similarity = all_chunks[0]["similarity"] if all_chunks else 0.0
+    # (hybrid results are ordered by fused rank, not similarity)
+    best_similarity = max((c["similarity"] for c in all_chunks), default=0.0)
     returned_chunk_count = len(filtered_chunks)
     
     # Improved refusal policy with low confidence tier
@@ -79,6 +282,7 @@ def answer_question(question: str, top_k: int = 10) -> dict[str, Any]:
             )
         else:
             refusal_reason = "No chunks found in knowledge base"
+        metrics.REFUSALS.labels("no_chunks").inc()
         
         result = {
             "trace_id": trace_id,
@@ -106,6 +310,7 @@ def answer_question(question: str, top_k: int = 10) -> dict[str, Any]:
             f"Best similarity ({best_similarity:.3f}) below low confidence threshold ({low_confidence_threshold:.3f}). "
             f"Similarity threshold is {similarity_threshold:.3f}."
         )
+        metrics.REFUSALS.labels("below_floor").inc()
         result = {
             "trace_id": trace_id,
             "answer": "",
@@ -117,25 +322,22 @@ def answer_question(question: str, top_k: int = 10) -> dict[str, Any]:
             result["debug"] = debug_info
         return result
     
-    # Build answer from chunks
-    answer_parts = []
-    citations = []
-    
-    for chunk in chunks_to_use:
-        excerpt = chunk["content"][:200] + "..." if len(chunk["content"]) > 200 else chunk["content"]
-        citations.append({
-            "doc_id": chunk["doc_id"],
-            "chunk_id": chunk["chunk_id"],
-            "score": chunk["similarity"],
-            "excerpt": excerpt,
-        })
-        answer_parts.append(chunk["content"])
-    
-    answer = "\n\n".join(answer_parts)
-    
-    # Add low confidence note if applicable
-    if low_confidence:
-        answer = f"[Low confidence answer - similarity {best_similarity:.3f} below threshold {similarity_threshold:.3f}]\n\n{answer}"
+    # Build answer from chunks: adjacent chunks merged, overlap removed, within budget
+    with metrics.stage_timer("answer_assembly"):
+        context = assemble_context(chunks_to_use)
+        answer = context["text"]
+        citations = context["citations"]
+        metrics.CONTEXT_BYTES.observe(context["bytes"])
+        logger.info(
+            f"RAG context: chunks={len(chunks_to_use)}, passages={context['passages']}, "
+            f"bytes={context['bytes']}, est_tokens={estimate_tokens(answer)}, "
+            f"truncated={context['truncated']}, dropped_chunks={context['dropped_chunks']}"
+        )
+        
+        # Add low confidence note if applicable
+        if low_confidence:
+            metrics.LOW_CONFIDENCE.inc()
+            answer = f"[Low confidence answer - similarity {best_similarity:.3f} below threshold {similarity_threshold:.3f}]\n\n{answer}"
     
     result = {
         "trace_id": trace_id,
@@ -0,0 +1,121 @@
+"""Fast JSON responses with negotiated compression.
+
+Endpoints returning large payloads (/ask, /presign/batch) build plain dicts
+in the shape of their response model and serialize them here, instead of
+constructing the Pydantic model and letting FastAPI validate and serialize
+it again. The response_model stays on the route for the OpenAPI schema.
+
+- JSON: orjson when installed, else the stdlib encoder (compact separators)
+- Compression: br (if the brotli package is installed) or gzip, chosen from
+  Accept-Encoding, for bodies of at least RESPONSE_COMPRESSION_MIN_BYTES
+  (default 1024; 0 disables compression)
+
+RESPONSE_GZIP_LEVEL (default 1) and RESPONSE_BROTLI_QUALITY (default 4) trade
+CPU for size; for a top_k=20 answer level 1 already cuts the body ~3x at
+under half the CPU of level 5 (see benchmarks/bench_responses.py).
+"""
+
+import gzip
+import json
+import os
+from typing import Any
+
+from fastapi import Request, Response
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+try:
+    import brotli
+except ImportError:  # optional; gzip is used instead
+    brotli = None
+
+
+def dumps(payload: Any) -> bytes:
+    """Serialize to compact UTF-8 JSON."""
+    if orjson is not None:
+        return orjson.dumps(payload)
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+
+def _accepted_encodings(accept_encoding: str) -> dict[str, float]:
+    """Parse Accept-Encoding into {coding: q}."""
+    accepted = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        accepted[coding] = q
+    return accepted
+
+
+def choose_encoding(accept_encoding: str | None) -> str | None:
+    """Pick 'br' or 'gzip' from an Accept-Encoding header, or None for identity."""
+    if not accept_encoding:
+        return None
+    accepted = _accepted_encodings(accept_encoding)
+    wildcard = accepted.get("*", 0.0)
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best = None
+    best_q = 0.0
+    for coding in candidates:
+        q = accepted.get(coding, wildcard)
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    """Compress body with 'br' or 'gzip'."""
+    if encoding == "br":
+        return brotli.compress(body, quality=int(os.getenv("RESPONSE_BROTLI_QUALITY", "4")))
+    return gzip.compress(body, compresslevel=int(os.getenv("RESPONSE_GZIP_LEVEL", "1")), mtime=0)
+
+
+def encode_body(body: bytes, accept_encoding: str | None) -> tuple[bytes, str | None]:
+    """Compress body if it is large enough and the client accepts a supported coding."""
+    min_bytes = int(os.getenv("RESPONSE_COMPRESSION_MIN_BYTES", "1024"))
+    if min_bytes <= 0 or len(body) < min_bytes:
+        return body, None
+    encoding = choose_encoding(accept_encoding)
+    if encoding is None:
+        return body, None
+    return compress(body, encoding), encoding
+
+
+def json_response(payload: Any, request: Request, status_code: int = 200) -> Response:
+    """Serialize payload and compress it according to the request's Accept-Encoding."""
+    body, encoding = encode_body(dumps(payload), request.headers.get("accept-encoding"))
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, status_code=status_code, media_type="application/json", headers=headers)
+
+
+def ask_payload(result: dict[str, Any]) -> dict[str, Any]:
+    """The AskResponse fields of an answer_question result (drops e.g. debug info)."""
+    return {
+        "trace_id": result["trace_id"],
+        "answer": result["answer"],
+        "citations": [
+            {
+                "doc_id": str(c["doc_id"]),
+                "chunk_id": str(c["chunk_id"]),
+                "score": float(c["score"]),
+                "excerpt": c["excerpt"],
+            }
+            for c in result["citations"]
+        ],
+        "refused": result["refused"],
+        "refusal_reason": result.get("refusal_reason"),
+    }
@@ -0,0 +1,221 @@
+"""Semantic cache of vector retrieval results.
+
+Paraphrased questions ("how do I reset my password" / "password reset steps")
+have nearly identical embeddings and retrieve the same chunks. The cache keeps
+the results of recent vector searches keyed by question embedding; a new
+question whose embedding has cosine similarity >= SEMANTIC_CACHE_MIN_SIMILARITY
+(default 0.95) with a cached one, under the same search parameters (top_k,
+threshold, filters) and corpus version, reuses that result.
+
+Candidates are found with sign-random-projection LSH (SEMANTIC_CACHE_TABLES
+tables of SEMANTIC_CACHE_BITS bits over sparse random hyperplanes), then
+checked with an exact cosine, so a lookup costs a few hundred multiplications
+plus one dot product per candidate instead of a scan of every entry. LSH can
+miss a qualifying entry (a cache miss, never a wrong hit).
+
+Entries are dropped when the corpus version changes (corpus_state, see
+db/migrations/007_corpus_state.sql), after SEMANTIC_CACHE_TTL_SECONDS (default
+300), or least-recently-used beyond SEMANTIC_CACHE_SIZE (default 1024). The
+version is read from the database at most every CORPUS_VERSION_TTL_MS (default
+1000), which bounds how long a change can go unnoticed.
+
+Similarities in a cached result were computed against the question that
+populated the entry, which differs from the current one by less than the
+cache threshold.
+
+Enable with SEMANTIC_CACHE=true after running the migration.
+"""
+
+import logging
+import math
+import operator
+import os
+import random
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any
+
+from api import metrics
+from api.supabase_db import get_corpus_version
+from worker.embeddings import get_embedding_dimensions
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class _Entry:
+    embedding: list[float]
+    scope: Hashable
+    value: Any
+    expires_at: float
+    keys: list[tuple]
+
+
+def _normalize(vector: list[float]) -> list[float]:
+    norm = math.sqrt(sum(v * v for v in vector))
+    return [v / norm for v in vector] if norm else list(vector)
+
+
+class SemanticCache:
+    """LRU cache of values keyed by embedding similarity, scope and corpus version."""
+
+    def __init__(
+        self,
+        dimension: int,
+        min_similarity: float = 0.95,
+        max_entries: int = 1024,
+        ttl_s: float = 300.0,
+        tables: int = 8,
+        bits: int = 12,
+        nonzeros: int = 48,
+        seed: int = 0,
+    ):
+        self.dimension = dimension
+        self.min_similarity = min_similarity
+        self.max_entries = max(1, max_entries)
+        self.ttl_s = ttl_s
+        self.tables = tables
+        self.bits = bits
+        # Sparse hyperplanes: indices with +1 and with -1 coefficients
+        rng = random.Random(seed)
+        self._planes: list[tuple[list[int], list[int]]] = []
+        for _ in range(tables * bits):
+            indices = rng.sample(range(dimension), min(nonzeros, dimension))
+            half = len(indices) // 2
+            self._planes.append((indices[:half], indices[half:]))
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[int, _Entry] = OrderedDict()
+        self._buckets: dict[tuple, set[int]] = {}
+        self._next_id = 0
+        self._version: Any = None
+
+    def _keys(self, embedding: list[float], scope: Hashable) -> list[tuple]:
+        """One bucket key per table: (table, signature, scope)."""
+        keys = []
+        get = embedding.__getitem__
+        for table in range(self.tables):
+            signature = 0
+            for plus, minus in self._planes[table * self.bits:(table + 1) * self.bits]:
+                signature = (signature << 1) | (sum(map(get, plus)) >= sum(map(get, minus)))
+            keys.append((table, signature, scope))
+        return keys
+
+    def _check_version(self, version: Any) -> None:
+        if version != self._version:
+            self._entries.clear()
+            self._buckets.clear()
+            self._version = version
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        for key in entry.keys:
+            bucket = self._buckets.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del self._buckets[key]
+
+    def get(self, embedding: list[float], scope: Hashable, version: Any) -> tuple[Any, float | None]:
+        """
+        Look up a value for a similar embedding.
+
+        Returns (value, similarity) on a hit, (None, best_similarity) on a miss;
+        best_similarity is None when LSH found no candidate.
+        """
+        query = _normalize(embedding)
+        keys = self._keys(query, scope)
+        now = time.monotonic()
+        with self._lock:
+            self._check_version(version)
+            candidates: set[int] = set()
+            for key in keys:
+                candidates.update(self._buckets.get(key, ()))
+            best_id, best = None, None
+            for entry_id in candidates:
+                entry = self._entries[entry_id]
+                if entry.expires_at <= now:
+                    self._remove(entry_id)
+                    continue
+                similarity = sum(map(operator.mul, query, entry.embedding))
+                if best is None or similarity > best:
+                    best_id, best = entry_id, similarity
+            if best is not None and best >= self.min_similarity:
+                self._entries.move_to_end(best_id)
+                return self._entries[best_id].value, best
+        return None, best
+
+    def put(self, embedding: list[float], scope: Hashable, version: Any, value: Any) -> None:
+        """Cache value for this embedding, scope and corpus version."""
+        query = _normalize(embedding)
+        keys = self._keys(query, scope)
+        with self._lock:
+            self._check_version(version)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = _Entry(query, scope, value, time.monotonic() + self.ttl_s, keys)
+            for key in keys:
+                self._buckets.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+class VersionPoller:
+    """Caches a version number read by fetch(), refreshing it at most every ttl_s."""
+
+    def __init__(self, fetch: Callable[[], int], ttl_s: float):
+        self._fetch = fetch
+        self.ttl_s = ttl_s
+        self._value: int | None = None
+        self._fetched_at = float("-inf")
+        self._lock = threading.Lock()
+
+    def get(self) -> int | None:
+        """Current version, or None if it has never been read successfully."""
+        if time.monotonic() - self._fetched_at < self.ttl_s:
+            return self._value
+        # One thread refreshes; the others keep using the previous value
+        if not self._lock.acquire(blocking=self._value is None):
+            return self._value
+        try:
+            if time.monotonic() - self._fetched_at >= self.ttl_s:
+                try:
+                    self._value = self._fetch()
+                except Exception as e:
+                    logger.warning(f"Could not read corpus version, bypassing semantic cache: {e}")
+                    self._value = None
+                self._fetched_at = time.monotonic()
+            return self._value
+        finally:
+            self._lock.release()
+
+
+def semantic_cache_enabled() -> bool:
+    return os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+
+
+@lru_cache(maxsize=1)
+def get_semantic_cache() -> SemanticCache:
+    """Process-wide semantic cache, configured from the environment on first use."""
+    cache = SemanticCache(
+        get_embedding_dimensions(),
+        min_similarity=float(os.getenv("SEMANTIC_CACHE_MIN_SIMILARITY", "0.95")),
+        max_entries=int(os.getenv("SEMANTIC_CACHE_SIZE", "1024")),
+        ttl_s=float(os.getenv("SEMANTIC_CACHE_TTL_SECONDS", "300")),
+        tables=int(os.getenv("SEMANTIC_CACHE_TABLES", "8")),
+        bits=int(os.getenv("SEMANTIC_CACHE_BITS", "12")),
+    )
+    metrics.SEMANTIC_CACHE_ENTRIES.set_function(lambda: len(cache))
+    return cache
+
+
+@lru_cache(maxsize=1)
+def get_corpus_version_poller() -> VersionPoller:
+    """Corpus version read through CORPUS_VERSION_TTL_MS (default 1000)."""
+    return VersionPoller(get_corpus_version, float(os.getenv("CORPUS_VERSION_TTL_MS", "1000")) / 1000)
@@ -0,0 +1,95 @@
+"""Single-flight execution: concurrent calls with the same key share one run.
+
+The first caller for a key (the leader) runs the function; callers arriving
+while it runs wait for its result (or exception) instead of repeating the
+work. The key is forgotten as soon as the run finishes, so this only merges
+calls that overlap in time; it is not a cache. A follower waits at most its
+own timeout, so a stuck leader cannot hold it past its deadline.
+"""
+
+import json
+import threading
+from collections.abc import Callable, Hashable
+from concurrent.futures import Future
+from typing import Any, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlightTimeoutError(TimeoutError):
+    """A follower's timeout ran out while it waited for the leader's result."""
+
+
+class SingleFlight:
+    """Thread-safe single-flight group."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls: dict[Hashable, tuple[Future, Any]] = {}
+
+    def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], T],
+        tag: Any = None,
+        timeout: float | None = None,
+    ) -> tuple[T, bool, Any]:
+        """
+        Run fn() once for all concurrent callers with the same key.
+
+        Returns (result, shared, leader_tag): shared is True for callers that
+        received another caller's result, and leader_tag is the `tag` the
+        leader passed (e.g. its trace_id). A follower still waiting after
+        `timeout` seconds raises SingleFlightTimeoutError.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            if call is None:
+                future: Future = Future()
+                self._calls[key] = (future, tag)
+        if call is not None:
+            future, leader_tag = call
+            try:
+                result = future.result(timeout=timeout)
+            except TimeoutError as e:
+                if not future.done():
+                    raise SingleFlightTimeoutError(f"Waited {timeout:.2f}s for an identical request in progress") from e
+                # The leader finished just now, or its own run timed out
+                result = future.result()
+            return result, True, leader_tag
+
+        try:
+            result = fn()
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+        finally:
+            with self._lock:
+                del self._calls[key]
+        return result, False, tag
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+def normalize_question(question: str) -> str:
+    """Case- and whitespace-insensitive form of a question."""
+    return " ".join(question.casefold().split())
+
+
+def filters_key(filters: dict[str, Any] | None) -> str | None:
+    """Canonical string for search filters (key and list order ignored)."""
+    if not filters:
+        return None
+    return json.dumps(
+        {k: sorted(map(str, v)) if isinstance(v, list) else str(v) for k, v in filters.items()},
+        sort_keys=True,
+    )
+
+
+def ask_key(question: str, top_k: int, filters: dict[str, Any] | None) -> tuple:
+    """Single-flight key of an /ask request: normalized question, top_k and filters."""
+    return normalize_question(question), top_k, filters_key(filters)
@@ -0,0 +1,203 @@
+"""Application startup: configuration checks, dependency warm-up and readiness.
+
+Importing the app has no side effects. The lifespan loads .env, validates
+configuration (fast, no network), then warms dependencies concurrently in
+worker threads: resolving the boto3 credential chain for the S3 client and
+the local presigner, opening the DB pool, checking the embedding config and,
+with SEMANTIC_CACHE=true, reading the corpus version.
+
+STARTUP_WARMUP controls when warm-up runs:
+- 'background' (default): serve immediately; /ready returns 503 until warm
+- 'blocking': finish warm-up before serving
+- 'off': no warm-up; dependencies initialize on first use and /ready only
+  reflects configuration
+
+Components are registered by name with register(); /ready reports each one.
+A component that failed is warmed again in the background by a later /ready
+probe, with exponential backoff between attempts (WARMUP_RETRY_MAX_SECONDS,
+default 30, caps the wait), so readiness recovers when the dependency does.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from api import metrics
+from api.deps import (
+    get_aws_credentials,
+    get_s3_bucket,
+    get_s3_client,
+    load_env,
+    validate_region_consistency,
+)
+from api.semantic_cache import get_corpus_version_poller, get_semantic_cache, semantic_cache_enabled
+from api.supabase_db import get_pool
+
+logger = logging.getLogger(__name__)
+
+PENDING = "pending"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+LAZY = "lazy"
+
+# Wait before the first re-warm of a failed component, doubled per failure
+RETRY_BASE_S = 1.0
+
+
+@dataclass
+class Component:
+    """A dependency warmed at startup and reported by /ready."""
+
+    name: str
+    warm: Callable[[], None]
+    status: str = PENDING
+    error: str | None = None
+    duration_ms: float | None = None
+    failures: int = 0
+    retry_at: float = 0.0
+
+
+_components: dict[str, Component] = {}
+# Re-warm tasks started by retry_failed (kept referenced until they finish)
+_retries: set[asyncio.Task] = set()
+
+
+def register(name: str, warm: Callable[[], None]) -> None:
+    """Register (or replace) a component; warm() runs in a worker thread and raises on failure."""
+    _components[name] = Component(name, warm)
+
+
+def get_warmup_mode() -> str:
+    mode = os.getenv("STARTUP_WARMUP", "background").lower()
+    return mode if mode in ("background", "blocking", "off") else "background"
+
+
+def get_retry_max_seconds() -> float:
+    return float(os.getenv("WARMUP_RETRY_MAX_SECONDS", "30"))
+
+
+def _warm_db_pool() -> None:
+    get_pool().wait(timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")))
+
+
+def _warm_presign_credentials() -> None:
+    get_aws_credentials().get_frozen_credentials()
+
+
+def _warm_embedding_client() -> None:
+    mode = os.getenv("EMBEDDING_MODE", "fake").lower()
+    if mode == "openai" and not os.getenv("OPENAI_API_KEY"):
+        raise ValueError("OPENAI_API_KEY is required for EMBEDDING_MODE=openai")
+
+
+def _warm_semantic_cache() -> None:
+    if not semantic_cache_enabled():
+        return
+    get_semantic_cache()
+    if get_corpus_version_poller().get() is None:
+        raise RuntimeError("corpus_state is not readable; run db/migrations/007_corpus_state.sql")
+
+
+register("s3_client", get_s3_client)
+register("presign_credentials", _warm_presign_credentials)
+register("db_pool", _warm_db_pool)
+register("embedding_client", _warm_embedding_client)
+register("semantic_cache", _warm_semantic_cache)
+
+
+def _warm_one(component: Component) -> None:
+    component.status = WARMING
+    start = time.perf_counter()
+    try:
+        component.warm()
+        component.status = READY
+        component.error = None
+        component.failures = 0
+    except Exception as e:
+        component.status = FAILED
+        component.error = str(e)
+        component.failures += 1
+        backoff = min(get_retry_max_seconds(), RETRY_BASE_S * 2 ** (component.failures - 1))
+        component.retry_at = time.monotonic() + backoff
+        logger.warning(f"Warm-up of {component.name} failed (retry in {backoff:.0f}s): {e}")
+    finally:
+        component.duration_ms = (time.perf_counter() - start) * 1000
+        metrics.WARMUP_SECONDS.labels(component.name).set(component.duration_ms / 1000)
+
+
+async def warm_up() -> None:
+    """Warm all registered components concurrently (failures are recorded, not raised)."""
+    start = time.perf_counter()
+    components = list(_components.values())
+    for component in components:
+        component.status = PENDING
+    await asyncio.gather(*(asyncio.to_thread(_warm_one, c) for c in components))
+    logger.info(
+        f"Warm-up finished in {(time.perf_counter() - start) * 1000:.1f} ms: "
+        + ", ".join(f"{c.name}={c.status}" for c in components)
+    )
+
+
+def retry_failed() -> None:
+    """Re-warm, in the background, failed components whose backoff has passed (called by /ready)."""
+    now = time.monotonic()
+    for component in _components.values():
+        if component.status == FAILED and now >= component.retry_at:
+            # Marked before the thread starts so concurrent probes do not start it twice
+            component.status = WARMING
+            task = asyncio.create_task(asyncio.to_thread(_warm_one, component))
+            _retries.add(task)
+            task.add_done_callback(_retries.discard)
+
+
+def check_config() -> None:
+    """Load .env and validate configuration; raises so a misconfigured app fails to start."""
+    load_env()
+    validate_region_consistency()
+    bucket = get_s3_bucket()
+    region = os.getenv("AWS_REGION") or os.getenv("AWS_DEFAULT_REGION") or "us-east-1"
+    logger.info(f"S3 configuration: region={region}, bucket={bucket}")
+
+
+async def start() -> asyncio.Task | None:
+    """
+    Run startup according to STARTUP_WARMUP.
+
+    Returns the background warm-up task, if any, so the caller can cancel it
+    on shutdown.
+    """
+    start_time = time.perf_counter()
+    check_config()
+
+    mode = get_warmup_mode()
+    task = None
+    if mode == "blocking":
+        await warm_up()
+    elif mode == "background":
+        task = asyncio.create_task(warm_up())
+    else:
+        for component in _components.values():
+            component.status = LAZY
+
+    elapsed = time.perf_counter() - start_time
+    metrics.STARTUP_SECONDS.set(elapsed)
+    logger.info(f"Startup completed in {elapsed * 1000:.1f} ms (warm-up: {mode})")
+    return task
+
+
+def readiness() -> dict:
+    """Readiness report: ready when every component is ready (or lazy)."""
+    components = {
+        c.name: {
+            "status": c.status,
+            "duration_ms": round(c.duration_ms, 1) if c.duration_ms is not None else None,
+            **({"error": c.error} if c.error else {}),
+        }
+        for c in _components.values()
+    }
+    ready = all(c.status in (READY, LAZY) for c in _components.values())
+    return {"ready": ready, "components": components}
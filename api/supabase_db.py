@@ -2,18 +2,24 @@
 
 import logging
 import os
+import threading
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
 from typing import Any
 
 import psycopg
-from dotenv import load_dotenv
+from psycopg_pool import ConnectionPool
 
-load_dotenv()
+from api import metrics
+from api.admission import stage_timeout
+from worker.embeddings import get_coarse_dimensions, shorten_embedding
 
 logger = logging.getLogger(__name__)
 
 
-def get_db_connection():
-    """Get database connection from Supabase.
+def get_conninfo() -> str:
+    """Build the Postgres connection string for Supabase.
     
     Expects SUPABASE_URL to be either:
     - A direct postgresql:// connection string, OR
@@ -55,30 +61,7 @@ def get_db_connection():
     
     # If it's already a postgres URL, use it directly
     if url.startswith("postgresql://") or url.startswith("postgres://"):
-        # Extract host/port from connection string for error messages
-        try:
-            # Parse connection string to show host/port in errors
-            if "@" in url and ":" in url:
-                parts = url.split("@")
-                if len(parts) == 2:
-                    host_port = parts[1].split("/")[0]
-                    if ":" in host_port:
-                        host, port = host_port.split(":", 1)
-                        if debug_rag:
-                            logger.info(f"Connecting to Supabase: {host}:{port}")
-        except Exception:
-            pass  # If parsing fails, just try to connect
-        try:
-            return psycopg.connect(url)
-        except Exception as e:
-            # Extract host/port for clearer error
-            if "@" in url:
-                try:
-                    host_port = url.split("@")[1].split("/")[0]
-                    raise ConnectionError(f"Failed to connect to {host_port}: {e}") from e
-                except Exception:
-                    pass
-            raise
+        return url
     
     # Otherwise, construct from Supabase project URL
     if url.startswith("https://"):
@@ -112,84 +95,530 @@ def get_db_connection():
             if debug_rag:
                 logger.info(f"Connecting to Supabase direct: {host}:{port} (username: {username})")
         
-        try:
-            return psycopg.connect(db_url)
-        except Exception as e:
-            raise ConnectionError(f"Failed to connect to Supabase {host}:{port}: {e}") from e
+        return db_url
     
     raise ValueError(f"Invalid SUPABASE_URL format: {url}. Expected postgresql://... or https://xxx.supabase.co")
 
 
+def _host_port(conninfo: str) -> str:
+    """Extract host:port from a connection string for error messages (no secrets)."""
+    try:
+        return conninfo.split("@", 1)[1].split("/")[0]
+    except IndexError:
+        return "database"
+
+
+def _connect_kwargs(conninfo: str) -> dict[str, Any]:
+    """Extra psycopg connect arguments for a connection string."""
+    # Transaction-mode poolers (Supabase pooler on 6543, PgBouncer) do not keep
+    # server-side prepared statements, so psycopg must not prepare automatically
+    if ":6543" in conninfo or os.getenv("SUPABASE_USE_POOLER", "false").lower() == "true":
+        return {"prepare_threshold": None}
+    return {}
+
+
+def get_db_connection():
+    """Open a new, unpooled database connection (see get_conninfo).
+    
+    Request paths should use db_connection() instead, which borrows from the pool.
+    """
+    conninfo = get_conninfo()
+    try:
+        return psycopg.connect(conninfo, **_connect_kwargs(conninfo))
+    except Exception as e:
+        raise ConnectionError(f"Failed to connect to Supabase {_host_port(conninfo)}: {e}") from e
+
+
+_pool: ConnectionPool | None = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    """Get the shared connection pool, creating it on first use.
+    
+    Sized by DB_POOL_MIN_SIZE (default 1) and DB_POOL_MAX_SIZE (default 10);
+    DB_POOL_TIMEOUT is how long a request waits for a free connection (seconds).
+    """
+    global _pool
+    if _pool is not None:
+        return _pool
+    
+    with _pool_lock:
+        if _pool is None:
+            conninfo = get_conninfo()
+            max_size = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+            pool = ConnectionPool(
+                conninfo,
+                min_size=min(int(os.getenv("DB_POOL_MIN_SIZE", "1")), max_size),
+                max_size=max_size,
+                timeout=float(os.getenv("DB_POOL_TIMEOUT", "10")),
+                kwargs=_connect_kwargs(conninfo),
+                name="api",
+                open=True,
+            )
+            metrics.DB_POOL_SIZE.set_function(lambda: pool.get_stats().get("pool_size", 0))
+            metrics.DB_POOL_AVAILABLE.set_function(lambda: pool.get_stats().get("pool_available", 0))
+            metrics.DB_POOL_WAITING.set_function(lambda: pool.get_stats().get("requests_waiting", 0))
+            metrics.DB_POOL_MAX.set(max_size)
+            _pool = pool
+    return _pool
+
+
+def close_pool() -> None:
+    """Close the shared connection pool if it was created (app shutdown)."""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.close()
+
+
+@contextmanager
+def db_connection() -> Iterator[psycopg.Connection]:
+    """Borrow a pooled connection for one transaction.
+    
+    Commits on success and rolls back on error when the block exits, then
+    returns the connection to the pool. Time spent waiting for a connection is
+    recorded as the db_acquire stage; the wait is capped by the request
+    deadline (PoolTimeout).
+    """
+    pool = get_pool()
+    start = time.perf_counter()
+    with pool.connection(timeout=stage_timeout(pool.timeout)) as conn:
+        metrics.STAGE_SECONDS.labels("db_acquire").observe(time.perf_counter() - start)
+        yield conn
+
+
 def get_table_counts() -> dict[str, int]:
     """Get counts from chunks and documents tables for debugging."""
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT COUNT(*) FROM chunks")
-            chunks_count = cur.fetchone()[0]
-            
-            cur.execute("SELECT COUNT(*) FROM documents")
-            documents_count = cur.fetchone()[0]
-            
-            return {
-                "chunks": chunks_count,
-                "documents": documents_count,
-            }
-    finally:
-        conn.close()
+    with db_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT COUNT(*) FROM chunks")
+        chunks_count = cur.fetchone()[0]
+        
+        cur.execute("SELECT COUNT(*) FROM documents")
+        documents_count = cur.fetchone()[0]
+        
+        return {
+            "chunks": chunks_count,
+            "documents": documents_count,
+        }
+
+
+def get_corpus_version() -> int:
+    """Current corpus_state.version, bumped on every change to chunks (007_corpus_state.sql)."""
+    with db_connection() as conn, conn.cursor() as cur:
+        cur.execute("SELECT version FROM corpus_state WHERE id = 1")
+        row = cur.fetchone()
+    return row[0] if row else 0
+
+
+def _vector_literal(embedding: list[float]) -> str:
+    """Encode an embedding as a pgvector literal ('[v1,v2,...]')."""
+    return "[" + ",".join(str(v) for v in embedding) + "]"
+
+
+def _rows_to_results(rows: list[tuple]) -> list[dict[str, Any]]:
+    """Convert search result rows to chunk dicts."""
+    results = []
+    for row in rows:
+        chunk_id, doc_id, content, trace_id, chunk_index, similarity = row
+        results.append({
+            "chunk_id": str(chunk_id),
+            "doc_id": str(doc_id),
+            "content": content,
+            "trace_id": trace_id,
+            "chunk_index": chunk_index,
+            "similarity": float(similarity),
+        })
+    return results
+
+
+def chunks_partitioned() -> bool:
+    """Whether the chunks table uses the monthly partitioned layout (006_partition_chunks.sql)."""
+    return os.getenv("CHUNKS_PARTITIONED", "false").lower() == "true"
+
+
+def build_filter_clause(
+    filters: dict[str, Any] | None,
+    alias: str = "c",
+    prune_partitions: bool = False,
+) -> tuple[str, dict[str, Any]]:
+    """
+    Build SQL conditions for metadata filters.
+    
+    Supported keys: document_ids, trace_ids, created_after, created_before.
+    Each condition is index-backed (see 002_tables.sql and 005_search_filter_indexes.sql).
+    
+    With prune_partitions, document/trace filters also bound chunks.created_at by
+    the matching documents' created_at (chunks share their document's timestamp in
+    the partitioned layout), so Postgres skips partitions outside that range.
+    
+    Returns:
+        (conditions, params) where conditions are SQL fragments joined with AND
+        (empty string if no filters), using named %(...)s placeholders.
+    """
+    if not filters:
+        return "", {}
+    
+    conditions = []
+    params: dict[str, Any] = {}
+    
+    if filters.get("document_ids"):
+        conditions.append(f"{alias}.document_id = ANY(%(filter_document_ids)s::uuid[])")
+        params["filter_document_ids"] = [str(d) for d in filters["document_ids"]]
+    if filters.get("trace_ids"):
+        conditions.append(f"{alias}.trace_id = ANY(%(filter_trace_ids)s::text[])")
+        params["filter_trace_ids"] = list(filters["trace_ids"])
+    if filters.get("created_after"):
+        conditions.append(f"{alias}.created_at >= %(filter_created_after)s::timestamptz")
+        params["filter_created_after"] = filters["created_after"]
+    if filters.get("created_before"):
+        conditions.append(f"{alias}.created_at < %(filter_created_before)s::timestamptz")
+        params["filter_created_before"] = filters["created_before"]
+    
+    if prune_partitions and (filters.get("document_ids") or filters.get("trace_ids")):
+        if filters.get("document_ids"):
+            documents_match = "d.id = ANY(%(filter_document_ids)s::uuid[])"
+        else:
+            documents_match = "d.trace_id = ANY(%(filter_trace_ids)s::text[])"
+        # Scalar subqueries become init plans, which Postgres uses for run-time pruning
+        conditions.append(
+            f"{alias}.created_at >= (SELECT min(d.created_at) FROM documents d WHERE {documents_match})"
+        )
+        conditions.append(
+            f"{alias}.created_at <= (SELECT max(d.created_at) FROM documents d WHERE {documents_match})"
+        )
+    
+    return " AND ".join(conditions), params
+
+
+def build_document_filter_clause(filters: dict[str, Any] | None, alias: str = "d") -> tuple[str, dict[str, Any]]:
+    """
+    The conditions of build_filter_clause applied to documents instead of chunks
+    (id, trace_id and created_at), with the same parameter names.
+    """
+    if not filters:
+        return "", {}
+    
+    conditions = []
+    params: dict[str, Any] = {}
+    if filters.get("document_ids"):
+        conditions.append(f"{alias}.id = ANY(%(filter_document_ids)s::uuid[])")
+        params["filter_document_ids"] = [str(d) for d in filters["document_ids"]]
+    if filters.get("trace_ids"):
+        conditions.append(f"{alias}.trace_id = ANY(%(filter_trace_ids)s::text[])")
+        params["filter_trace_ids"] = list(filters["trace_ids"])
+    if filters.get("created_after"):
+        conditions.append(f"{alias}.created_at >= %(filter_created_after)s::timestamptz")
+        params["filter_created_after"] = filters["created_after"]
+    if filters.get("created_before"):
+        conditions.append(f"{alias}.created_at < %(filter_created_before)s::timestamptz")
+        params["filter_created_before"] = filters["created_before"]
+    return " AND ".join(conditions), params
+
+
+def build_vector_search_query(
+    question_embedding: list[float],
+    top_k: int,
+    coarse_dimensions: int = 0,
+    candidate_multiplier: int = 4,
+    filters: dict[str, Any] | None = None,
+    prune_partitions: bool = False,
+) -> tuple[str, dict[str, Any]]:
+    """
+    Build the similarity search SQL and its parameters.
+    
+    With coarse_dimensions > 0 the query runs in two stages: an ANN scan over
+    the short `embedding_coarse` vector picks top_k * candidate_multiplier
+    candidates, which are then re-ranked exactly with the full embedding.
+    Filters are applied inside the ANN scan, not after it.
+    """
+    filter_sql, params = build_filter_clause(filters, prune_partitions=prune_partitions)
+    where = f"WHERE {filter_sql}" if filter_sql else ""
+    params["embedding"] = _vector_literal(question_embedding)
+    params["top_k"] = top_k
+    
+    if coarse_dimensions and coarse_dimensions < len(question_embedding):
+        params["coarse_embedding"] = _vector_literal(
+            shorten_embedding(question_embedding, coarse_dimensions)
+        )
+        params["candidates"] = top_k * max(1, candidate_multiplier)
+        query = f"""
+            WITH candidates AS (
+                SELECT c.id, c.document_id, c.content, c.trace_id, c.chunk_index, c.embedding
+                FROM chunks c
+                {where}
+                ORDER BY c.embedding_coarse <=> %(coarse_embedding)s::vector
+                LIMIT %(candidates)s
+            )
+            SELECT
+                id as chunk_id,
+                document_id as doc_id,
+                content,
+                trace_id,
+                chunk_index,
+                1 - (embedding <=> %(embedding)s::vector) as similarity
+            FROM candidates
+            ORDER BY embedding <=> %(embedding)s::vector
+            LIMIT %(top_k)s
+        """
+        return query, params
+    
+    query = f"""
+        SELECT
+            c.id as chunk_id,
+            c.document_id as doc_id,
+            c.content,
+            c.trace_id,
+            c.chunk_index,
+            1 - (c.embedding <=> %(embedding)s::vector) as similarity
+        FROM chunks c
+        {where}
+        ORDER BY c.embedding <=> %(embedding)s::vector
+        LIMIT %(top_k)s
+    """
+    return query, params
+
+
+def build_hierarchical_search_query(
+    question_embedding: list[float],
+    top_k: int,
+    top_documents: int = 20,
+    filters: dict[str, Any] | None = None,
+    prune_partitions: bool = False,
+) -> tuple[str, dict[str, Any]]:
+    """
+    Build the document-then-chunk similarity search SQL and its parameters.
+    
+    The first stage ranks documents by centroid similarity (ANN over
+    documents.centroid, see 011_document_centroids.sql) and keeps
+    top_documents of them; the second ranks only those documents' chunks,
+    exactly. Both stages are MATERIALIZED, so chunks are read through
+    idx_chunks_document_id rather than by walking the chunk vector index
+    with a filter, and the cost follows the size of the selected documents,
+    not of the corpus. Filters apply to both stages.
+    
+    With prune_partitions, chunks are also matched on their document's
+    created_at, so each document's lookup touches one partition.
+    """
+    document_sql, params = build_document_filter_clause(filters)
+    chunk_sql, chunk_params = build_filter_clause(filters)
+    params.update(chunk_params)
+    params["embedding"] = _vector_literal(question_embedding)
+    params["top_k"] = top_k
+    params["top_documents"] = max(1, top_documents)
+    
+    document_where = f"AND {document_sql}" if document_sql else ""
+    chunk_where = f"WHERE {chunk_sql}" if chunk_sql else ""
+    partition_match = "AND c.created_at = t.created_at" if prune_partitions else ""
+    query = f"""
+        WITH top_documents AS MATERIALIZED (
+            SELECT d.id, d.created_at
+            FROM documents d
+            WHERE d.centroid IS NOT NULL {document_where}
+            ORDER BY d.centroid <=> %(embedding)s::vector
+            LIMIT %(top_documents)s
+        ),
+        candidates AS MATERIALIZED (
+            SELECT c.id, c.document_id, c.content, c.trace_id, c.chunk_index,
+                   c.embedding <=> %(embedding)s::vector AS distance
+            FROM top_documents t
+            JOIN chunks c ON c.document_id = t.id {partition_match}
+            {chunk_where}
+        )
+        SELECT
+            id as chunk_id,
+            document_id as doc_id,
+            content,
+            trace_id,
+            chunk_index,
+            1 - distance as similarity
+        FROM candidates
+        ORDER BY distance
+        LIMIT %(top_k)s
+    """
+    return query, params
+
+
+def _set_statement_timeout(cur) -> None:
+    """
+    Cap query time for the current transaction.
+    
+    DB_STATEMENT_TIMEOUT_MS (default 5000, 0 = server default), further capped
+    by the request deadline. SET LOCAL semantics, so it also works through
+    transaction-mode poolers.
+    """
+    timeout_ms = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "5000"))
+    if timeout_ms <= 0:
+        return
+    timeout_ms = max(1, int(stage_timeout(timeout_ms / 1000) * 1000))
+    cur.execute("SELECT set_config('statement_timeout', %s, true)", (str(timeout_ms),))
+
+
+def _enable_iterative_scan(cur) -> str:
+    """
+    Enable pgvector iterative index scans for the current transaction.
+    
+    Without them, an HNSW/IVFFlat scan returns its first ef_search/probes
+    candidates and a selective filter silently drops most of them. Controlled by
+    VECTOR_ITERATIVE_SCAN ('strict_order' default, 'relaxed_order', or 'off'
+    for pgvector < 0.8). Returns the mode that was applied.
+    """
+    mode = os.getenv("VECTOR_ITERATIVE_SCAN", "strict_order").lower()
+    if mode == "off":
+        return mode
+    
+    cur.execute("SELECT set_config('hnsw.iterative_scan', %s, true)", (mode,))
+    if mode == "relaxed_order":
+        # IVFFlat only supports relaxed ordering
+        cur.execute("SELECT set_config('ivfflat.iterative_scan', %s, true)", (mode,))
+    return mode
 
 
 def search_similar_chunks(
     question_embedding: list[float],
     top_k: int,
     similarity_threshold: float = 0.48,
+    filters: dict[str, Any] | None = None,
 ) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
     """
     Search for similar chunks using pgvector cosine similarity.
     
+    Uses two-stage (coarse ANN + full re-rank) search when
+    EMBEDDING_COARSE_DIMENSIONS is set; COARSE_CANDIDATE_MULTIPLIER controls
+    how many coarse candidates are re-ranked per requested result.
+    
+    Optional filters (see build_filter_clause) are pushed into the SQL and
+    use iterative index scans so they do not reduce the result count.
+    
     Returns:
         (filtered_results, all_results) where:
         - filtered_results: chunks with similarity >= threshold
         - all_results: top_k chunks without threshold (for debugging)
     """
-    conn = get_db_connection()
-    try:
-        with conn.cursor() as cur:
-            # Convert embedding list to PostgreSQL array format
-            embedding_array = "[" + ",".join(str(v) for v in question_embedding) + "]"
-            
-            # First, fetch top_k chunks WITHOUT threshold (for debugging)
-            query_all = """
-                SELECT 
-                    c.id as chunk_id,
-                    c.document_id as doc_id,
-                    c.content,
-                    c.trace_id,
-                    c.chunk_index,
-                    1 - (c.embedding <=> %s::vector) as similarity
-                FROM chunks c
-                ORDER BY c.embedding <=> %s::vector
-                LIMIT %s
-            """
-            
-            cur.execute(query_all, (embedding_array, embedding_array, top_k))
-            
-            all_results = []
-            for row in cur.fetchall():
-                chunk_id, doc_id, content, trace_id, chunk_index, similarity = row
-                all_results.append({
-                    "chunk_id": str(chunk_id),
-                    "doc_id": str(doc_id),
-                    "content": content,
-                    "trace_id": trace_id,
-                    "chunk_index": chunk_index,
-                    "similarity": float(similarity),
-                })
-            
-            # Filter by threshold in Python
-            filtered_results = [r for r in all_results if r["similarity"] >= similarity_threshold]
+    query, params = build_vector_search_query(
+        question_embedding,
+        top_k,
+        coarse_dimensions=get_coarse_dimensions(),
+        candidate_multiplier=int(os.getenv("COARSE_CANDIDATE_MULTIPLIER", "4")),
+        filters=filters,
+        prune_partitions=chunks_partitioned(),
+    )
+    
+    return _run_vector_query(query, params, similarity_threshold, filters)
+
+
+def _run_vector_query(
+    query: str,
+    params: dict[str, Any],
+    similarity_threshold: float,
+    filters: dict[str, Any] | None,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """Run a similarity query; returns (results above the threshold, all results)."""
+    with db_connection() as conn, conn.cursor() as cur:
+        with metrics.stage_timer("vector_query"):
+            scan_mode = _enable_iterative_scan(cur) if filters else "off"
+            _set_statement_timeout(cur)
             
-            return filtered_results, all_results
-    finally:
-        conn.close()
+            # Fetch top_k chunks WITHOUT threshold (for debugging)
+            cur.execute(query, params)
+            rows = cur.fetchall()
+    
+    all_results = _rows_to_results(rows)
+    if scan_mode == "relaxed_order":
+        # Relaxed iterative scans can return rows slightly out of order
+        all_results.sort(key=lambda r: r["similarity"], reverse=True)
+    
+    # Filter by threshold in Python
+    filtered_results = [r for r in all_results if r["similarity"] >= similarity_threshold]
+    
+    return filtered_results, all_results
+
+
+def search_hierarchical_chunks(
+    question_embedding: list[float],
+    top_k: int,
+    similarity_threshold: float = 0.48,
+    filters: dict[str, Any] | None = None,
+) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+    """
+    Search the chunks of the HIERARCHICAL_TOP_DOCUMENTS (default 20) documents
+    whose centroids are most similar to the question.
+    
+    See build_hierarchical_search_query. Returns the same
+    (filtered_results, all_results) as search_similar_chunks.
+    """
+    query, params = build_hierarchical_search_query(
+        question_embedding,
+        top_k,
+        top_documents=int(os.getenv("HIERARCHICAL_TOP_DOCUMENTS", "20")),
+        filters=filters,
+        prune_partitions=chunks_partitioned(),
+    )
+    return _run_vector_query(query, params, similarity_threshold, filters)
 
+
+def build_lexical_search_query(
+    question: str,
+    question_embedding: list[float],
+    top_k: int,
+    filters: dict[str, Any] | None = None,
+    prune_partitions: bool = False,
+) -> tuple[str, dict[str, Any]]:
+    """
+    Build the full-text search SQL and its parameters.
+    
+    Question terms are OR-ed together (plainto_tsquery AND-s them, which is too
+    strict for natural-language questions) and ranked with ts_rank_cd over the
+    GIN-indexed `content_tsv` column. The cosine similarity to the question
+    embedding is returned too, so refusal logic works the same for both legs.
+    """
+    filter_sql, params = build_filter_clause(filters, prune_partitions=prune_partitions)
+    extra = f"AND {filter_sql}" if filter_sql else ""
+    query = f"""
+        WITH q AS (
+            SELECT to_tsquery(
+                'english',
+                replace(plainto_tsquery('english', %(question)s)::text, ' & ', ' | ')
+            ) AS tsq
+        )
+        SELECT
+            c.id as chunk_id,
+            c.document_id as doc_id,
+            c.content,
+            c.trace_id,
+            c.chunk_index,
+            1 - (c.embedding <=> %(embedding)s::vector) as similarity
+        FROM chunks c, q
+        WHERE c.content_tsv @@ q.tsq {extra}
+        ORDER BY ts_rank_cd(c.content_tsv, q.tsq) DESC
+        LIMIT %(top_k)s
+    """
+    params["question"] = question
+    params["embedding"] = _vector_literal(question_embedding)
+    params["top_k"] = top_k
+    return query, params
+
+
+def search_lexical_chunks(
+    question: str,
+    question_embedding: list[float],
+    top_k: int,
+    filters: dict[str, Any] | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Search chunks by full-text match on content (see 004_content_tsvector.sql).
+    
+    Returns top_k chunks ordered by text rank, each with its vector similarity.
+    """
+    query, params = build_lexical_search_query(
+        question, question_embedding, top_k, filters, prune_partitions=chunks_partitioned()
+    )
+    
+    with db_connection() as conn, conn.cursor() as cur:
+        with metrics.stage_timer("lexical_query"):
+            _set_statement_timeout(cur)
+            cur.execute(query, params)
+            rows = cur.fetchall()
+    
+    return _rows_to_results(rows)
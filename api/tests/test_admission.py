@@ -0,0 +1,134 @@
+"""Tests for /ask admission control and per-stage timeouts."""
+
+import asyncio
+import os
+import time
+from unittest.mock import patch
+
+import pytest
+from fastapi.testclient import TestClient
+from psycopg_pool import PoolTimeout
+
+from api.admission import (
+    DEADLINE,
+    QUEUE_FULL,
+    QUEUE_TIMEOUT,
+    AdmissionController,
+    OverloadedError,
+    stage_timeout,
+)
+from worker.embeddings import get_openai_embeddings
+
+os.environ.setdefault("S3_BUCKET_NAME", "test-bucket")
+
+from api.main import app  # noqa: E402
+
+
+def test_queue_hands_over_slots_in_order():
+    """Test that a released slot goes to the oldest waiter and a full queue is rejected."""
+    async def scenario():
+        controller = AdmissionController(limit=1, max_queue=1, queue_timeout=1.0)
+        await controller.acquire()
+        waiter = asyncio.create_task(controller.acquire())
+        await asyncio.sleep(0)
+
+        with pytest.raises(OverloadedError) as rejected:
+            await controller.acquire()
+        controller.release(0.05)
+        await waiter
+        return controller, rejected.value
+
+    controller, rejected = asyncio.run(scenario())
+
+    assert rejected.reason == QUEUE_FULL and rejected.retry_after >= 1
+    assert controller.active == 1 and controller.queued == 0
+
+
+def test_rejects_when_estimated_wait_exceeds_deadline():
+    """Test fast rejection once recent service times predict a wait beyond the queue timeout."""
+    async def scenario():
+        controller = AdmissionController(limit=1, max_queue=10, queue_timeout=0.5)
+        await controller.acquire()
+        controller.release(2.0)
+        await controller.acquire()
+        start = time.perf_counter()
+        with pytest.raises(OverloadedError) as rejected:
+            await controller.acquire()
+        return rejected.value, time.perf_counter() - start
+
+    rejected, elapsed = asyncio.run(scenario())
+
+    assert rejected.reason == DEADLINE and rejected.retry_after == 2
+    assert elapsed < 0.1
+
+
+def test_queue_timeout_frees_queue_position():
+    """Test that a waiter that times out leaves the queue."""
+    async def scenario():
+        controller = AdmissionController(limit=1, max_queue=1, queue_timeout=0.01)
+        await controller.acquire()
+        with pytest.raises(OverloadedError) as rejected:
+            await controller.acquire()
+        return controller, rejected.value
+
+    controller, rejected = asyncio.run(scenario())
+
+    assert rejected.reason == QUEUE_TIMEOUT
+    assert controller.queued == 0 and controller.active == 1
+
+
+def test_stage_timeout_capped_by_deadline():
+    """Test that stage timeouts shrink to the time left before the request deadline."""
+    async def scenario():
+        controller = AdmissionController(limit=1, max_queue=0, queue_timeout=1.0)
+        async with controller.admit(timeout=0.2):
+            return stage_timeout(5.0)
+
+    assert stage_timeout(5.0) == 5.0
+    assert 0 < asyncio.run(scenario()) <= 0.2
+
+
+def test_ask_sheds_with_retry_after():
+    """Test that /ask returns 503 with Retry-After when no slot or queue position is free."""
+    controller = AdmissionController(limit=1, max_queue=0, queue_timeout=1.0)
+    controller.active = 1
+
+    with patch("api.main.get_admission_controller", return_value=controller):
+        response = TestClient(app).post("/ask", json={"question": "What is AI?"})
+
+    assert response.status_code == 503
+    assert response.headers["retry-after"] == "1"
+
+
+def test_ask_stage_timeout_is_503():
+    """Test that running out of pool-acquire time is reported as 503, not 500."""
+    with patch("api.main.answer_question", side_effect=PoolTimeout("no connection")):
+        response = TestClient(app).post("/ask", json={"question": "What is AI?"})
+
+    assert response.status_code == 503
+    assert "db_acquire" in response.json()["detail"]
+
+
+def test_ask_timeout_stage_comes_from_the_embedding_call_only():
+    """Test that only an embedding timeout is reported as one; other TimeoutErrors are 500s."""
+    with patch("api.rag.get_embedding", side_effect=TimeoutError("budget exhausted")):
+        response = TestClient(app).post("/ask", json={"question": "What is AI?"})
+    assert response.status_code == 503
+    assert "embedding" in response.json()["detail"]
+
+    with patch("api.main.answer_question", side_effect=TimeoutError("read timed out")):
+        response = TestClient(app).post("/ask", json={"question": "What is AI?"})
+    assert response.status_code == 500
+
+
+def test_embedding_budget_stops_retries():
+    """Test that the overall embedding budget raises TimeoutError instead of retrying past it."""
+    env = {"OPENAI_API_KEY": "sk-test", "EMBEDDING_MAX_RETRIES": "5", "EMBEDDING_RETRY_BASE_SECONDS": "1"}
+
+    with patch.dict(os.environ, env), \
+            patch("urllib.request.urlopen", side_effect=TimeoutError("timed out")) as urlopen:
+        with pytest.raises(TimeoutError):
+            get_openai_embeddings(["q"], timeout=0.2)
+
+    assert urlopen.call_count == 1
+    assert urlopen.call_args.kwargs["timeout"] <= 0.2
@@ -0,0 +1,82 @@
+"""Tests for coalescing concurrent question embeddings."""
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from api.coalescer import EmbeddingCoalescer, coalescing_enabled
+
+
+class RecordingProvider:
+    def __init__(self, latency_s: float = 0.02, error: Exception | None = None):
+        self.latency_s = latency_s
+        self.error = error
+        self.batches: list[list[str]] = []
+        self._lock = threading.Lock()
+
+    def __call__(self, texts, timeout=None):
+        with self._lock:
+            self.batches.append(list(texts))
+        time.sleep(self.latency_s)
+        if self.error:
+            raise self.error
+        return [[float(len(t))] for t in texts]
+
+
+def test_concurrent_questions_share_provider_calls():
+    """Test that concurrent embed() calls are batched and each caller gets its own result."""
+    provider = RecordingProvider()
+    coalescer = EmbeddingCoalescer(provider, window_s=0.01, max_batch=32, max_inflight=1)
+    texts = [f"question {i % 10}" + "?" * (i % 10) for i in range(40)]
+
+    with ThreadPoolExecutor(max_workers=40) as pool:
+        results = list(pool.map(coalescer.embed, texts))
+
+    assert results == [[float(len(t))] for t in texts]
+    assert len(provider.batches) < 10
+    assert all(len(batch) == len(set(batch)) for batch in provider.batches)
+
+
+def test_lone_question_waits_only_the_window():
+    """Test that a single request is sent after the window, not held for a full batch."""
+    provider = RecordingProvider(latency_s=0)
+    coalescer = EmbeddingCoalescer(provider, window_s=0.005, max_batch=32)
+
+    start = time.perf_counter()
+    coalescer.embed("alone")
+
+    assert time.perf_counter() - start < 0.5
+    assert provider.batches == [["alone"]]
+
+
+def test_provider_error_reaches_every_caller():
+    """Test that a failed batch raises in each waiting caller."""
+    coalescer = EmbeddingCoalescer(RecordingProvider(error=ValueError("boom")), window_s=0.01, max_batch=8)
+
+    with ThreadPoolExecutor(max_workers=3) as pool:
+        futures = [pool.submit(coalescer.embed, f"q{i}") for i in range(3)]
+        for future in futures:
+            with pytest.raises(ValueError):
+                future.result()
+
+
+def test_caller_timeout():
+    """Test that a caller gives up after its own timeout."""
+    coalescer = EmbeddingCoalescer(RecordingProvider(latency_s=0.5), window_s=0, max_batch=1)
+
+    with pytest.raises(TimeoutError):
+        coalescer.embed("slow", timeout=0.05)
+
+
+def test_coalescing_only_for_openai():
+    """Test that in-process providers are not coalesced and the window can disable it."""
+    with patch.dict(os.environ, {"EMBEDDING_MODE": "openai", "EMBEDDING_BATCH_WINDOW_MS": "2"}):
+        assert coalescing_enabled()
+    with patch.dict(os.environ, {"EMBEDDING_MODE": "openai", "EMBEDDING_BATCH_WINDOW_MS": "0"}):
+        assert not coalescing_enabled()
+    with patch.dict(os.environ, {"EMBEDDING_MODE": "local"}):
+        assert not coalescing_enabled()
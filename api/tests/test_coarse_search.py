@@ -0,0 +1,40 @@
+"""Tests for two-stage (coarse + re-rank) vector search."""
+
+import math
+
+from api.supabase_db import build_vector_search_query
+from worker.embeddings import get_fake_embedding, shorten_embedding
+
+
+def test_shorten_embedding_is_normalized_prefix():
+    """Test that the shortened embedding is a unit-length prefix of the full one."""
+    embedding = get_fake_embedding("machine learning", dimension=1536)
+    short = shorten_embedding(embedding, 256)
+
+    assert len(short) == 256
+    assert math.isclose(math.sqrt(sum(v * v for v in short)), 1.0, rel_tol=1e-9)
+
+    # Same direction as the prefix of the full vector
+    scale = embedding[0] / short[0]
+    assert all(math.isclose(a, b * scale, rel_tol=1e-9) for a, b in zip(embedding[:256], short))
+
+
+def test_full_search_query_by_default():
+    """Test that coarse search is not used when coarse dimensions are disabled."""
+    query, params = build_vector_search_query([0.1] * 1536, top_k=5)
+
+    assert "embedding_coarse" not in query
+    assert params["top_k"] == 5
+    assert "coarse_embedding" not in params
+
+
+def test_two_stage_search_query():
+    """Test that the two-stage query scans coarse vectors and re-ranks candidates."""
+    query, params = build_vector_search_query(
+        [0.1] * 1536, top_k=5, coarse_dimensions=256, candidate_multiplier=4
+    )
+
+    assert "embedding_coarse <=> %(coarse_embedding)s" in query
+    assert params["candidates"] == 20
+    assert params["coarse_embedding"].count(",") == 255
+    assert params["embedding"].count(",") == 1535
@@ -0,0 +1,67 @@
+"""Tests for worker cold-start behaviour and the cold-start tooling."""
+
+import importlib.util
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from benchmarks.cold_start import parse_importtime
+from worker.utils import extract_trace_id_from_key
+
+ROOT = Path(__file__).resolve().parents[2]
+
+
+def _load_build_script():
+    spec = importlib.util.spec_from_file_location("build_slim_worker", ROOT / "scripts" / "build_slim_worker.py")
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def test_handler_import_does_not_load_boto3_outside_lambda():
+    """Test that importing the handler outside Lambda defers boto3 until first use."""
+    env = {k: v for k, v in os.environ.items() if k != "AWS_LAMBDA_FUNCTION_NAME"}
+    output = subprocess.run(
+        [sys.executable, "-c", "import sys, worker.lambda_handler; print('boto3' in sys.modules)"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    assert output.strip() == "False"
+
+
+def test_extract_trace_id_from_key():
+    """Test trace_id extraction with the precompiled pattern."""
+    trace_id = "0b7c6d1e-2f3a-4b5c-8d9e-0f1a2b3c4d5e"
+    assert extract_trace_id_from_key(f"uploads/2024/01/15/{trace_id}/doc.txt") == trace_id
+    assert extract_trace_id_from_key("uploads/doc.txt") is None
+
+
+def test_parse_importtime():
+    """Test parsing of -X importtime output."""
+    stderr = (
+        "import time: self [us] | cumulative | imported package\n"
+        "import time:       120 |        120 |   json.decoder\n"
+        "import time:       300 |        420 | json\n"
+        "unrelated line\n"
+    )
+    rows = parse_importtime(stderr)
+    assert [r["module"] for r in rows] == ["json.decoder", "json"]
+    assert rows[0]["depth"] == 1 and rows[1]["cumulative_us"] == 420
+
+
+def test_prune_botocore_data(tmp_path):
+    """Test that only kept service models and top-level data files survive pruning."""
+    data = tmp_path / "botocore" / "data"
+    for service in ("s3", "sqs", "ec2"):
+        version = data / service / "2020-01-01"
+        version.mkdir(parents=True)
+        (version / "service-2.json").write_text("{}")
+        (version / "examples-1.json").write_text("{}")
+    (data / "endpoints.json").write_text("{}")
+
+    removed = _load_build_script().prune_botocore_data(tmp_path, {"s3", "sqs"})
+
+    assert removed > 0
+    assert sorted(p.name for p in data.iterdir()) == ["endpoints.json", "s3", "sqs"]
+    assert not list(data.rglob("examples-*.json"))
+    assert (data / "s3" / "2020-01-01" / "service-2.json").exists()
@@ -0,0 +1,212 @@
+"""Tests for the long-running queue consumer and its supporting pieces."""
+
+import http.client
+import http.server
+import json
+import os
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from unittest.mock import patch
+
+import pytest
+
+from worker import connections
+from worker.consumer import Consumer, _InFlight
+from worker.queues import LocalQueue
+
+
+def _body(key: str) -> str:
+    return json.dumps({"Records": [{"s3": {"bucket": {"name": "bucket"}, "object": {"key": key}}}]})
+
+
+def _consumer(queue, **kwargs) -> Consumer:
+    kwargs.setdefault("wait_s", 0)
+    return Consumer(queue, executor_factory=ThreadPoolExecutor, **kwargs)
+
+
+def test_local_queue_visibility_and_dead_letter():
+    """Test that received messages hide, reappear, and move to dead after max_receives."""
+    queue = LocalQueue(["a"], visibility_timeout=0.05, max_receives=2)
+
+    first = queue.receive(wait_s=0)
+    assert [m.body for m in first] == ["a"]
+    assert queue.receive(wait_s=0) == []
+
+    second = queue.receive(wait_s=1)
+    assert [m.body for m in second] == ["a"]
+    queue.delete(first[0])  # stale handle from the earlier receive
+    assert len(queue) == 1
+
+    time.sleep(0.06)
+    assert queue.receive(wait_s=0) == []
+    assert queue.dead == ["a"] and len(queue) == 0
+
+
+@patch("worker.consumer.ingest_message")
+def test_consumer_deletes_succeeded_and_retries_failed(mock_ingest):
+    """Test that successes are deleted and a failure is retried after the retry delay."""
+    attempts = {}
+
+    def ingest(body):
+        key = json.loads(body)["Records"][0]["s3"]["object"]["key"]
+        attempts[key] = attempts.get(key, 0) + 1
+        if key == "flaky" and attempts[key] == 1:
+            raise ValueError("OpenAI API error (503)")
+        return [{"chunk_count": 2}]
+
+    mock_ingest.side_effect = ingest
+    queue = LocalQueue([_body(k) for k in ("a", "b", "c", "flaky")])
+    consumer = _consumer(queue, processes=2, retry_delay=0, exit_when_empty=True)
+
+    stats = consumer.run()
+
+    assert len(queue) == 0
+    assert attempts == {"a": 1, "b": 1, "c": 1, "flaky": 2}
+    assert (stats["succeeded"], stats["failed"], stats["documents"], stats["chunks"]) == (4, 1, 4, 8)
+
+
+@patch("worker.consumer.ingest_message")
+def test_consumer_extends_visibility_for_long_documents(mock_ingest):
+    """Test that a message outliving its visibility timeout is not redelivered."""
+    mock_ingest.side_effect = lambda body: time.sleep(0.6) or []
+    queue = LocalQueue([_body("long")], visibility_timeout=0.3)
+    consumer = _consumer(queue, processes=2, visibility_timeout=0.3, exit_when_empty=True)
+
+    consumer.run()
+
+    assert mock_ingest.call_count == 1
+    assert len(queue) == 0
+
+
+@patch("worker.consumer.ingest_message")
+def test_consumer_drains_on_stop(mock_ingest):
+    """Test that stop() finishes messages in flight and leaves the rest queued."""
+    started = threading.Event()
+
+    def ingest(body):
+        started.set()
+        time.sleep(0.2)
+        return []
+
+    mock_ingest.side_effect = ingest
+    queue = LocalQueue([_body(f"k{i}") for i in range(6)])
+    consumer = _consumer(queue, processes=2)
+
+    runner = threading.Thread(target=consumer.run)
+    runner.start()
+    started.wait(1)
+    consumer.stop()
+    runner.join(5)
+
+    assert not runner.is_alive()
+    assert consumer.stats["succeeded"] == 2
+    assert len(queue) == 4
+    assert len(queue.receive(wait_s=0)) == 4
+
+
+def test_broken_pool_settles_finished_messages_first():
+    """Test that results already in are settled before a broken pool releases the rest."""
+    queue = LocalQueue([_body("done"), _body("lost")])
+    done_message, lost_message = queue.receive(wait_s=0)
+    finished, broken = Future(), Future()
+    finished.set_result((True, [{"chunk_count": 3}]))
+    broken.set_exception(BrokenProcessPool("worker died"))
+    consumer = _consumer(queue)
+    # The broken future first, so a plain loop would stop before the finished one
+    consumer._in_flight = {broken: _InFlight(lost_message, 0.0), finished: _InFlight(done_message, 0.0)}
+
+    with patch("worker.consumer.wait", return_value=([broken, finished], [])), pytest.raises(BrokenProcessPool):
+        consumer._collect(0)
+
+    assert consumer.stats["succeeded"] == 1 and consumer.stats["chunks"] == 3
+    assert list(consumer._in_flight.values()) == [_InFlight(lost_message, 0.0)]
+    assert len(queue) == 1
+
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    connections: set = set()
+
+    def do_POST(self):
+        _Handler.connections.add(self.client_address)
+        self.rfile.read(int(self.headers["Content-Length"]))
+        status, body = (404, b'{"error": "missing"}') if self.path == "/missing" else (200, b'{"ok": true}')
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def http_server():
+    server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _Handler.connections = set()
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+def test_keepalive_reuses_connection(http_server):
+    """Test that HTTP_KEEPALIVE reuses one connection and maps errors to urllib's."""
+    def post(path):
+        request = urllib.request.Request(f"{http_server}{path}", data=b"{}", method="POST")
+        with connections.urlopen(request, timeout=5) as response:
+            return json.loads(response.read())
+
+    with patch.dict(os.environ, {"HTTP_KEEPALIVE": "true"}):
+        assert post("/a") == {"ok": True}
+        assert post("/b") == {"ok": True}
+        with pytest.raises(urllib.error.HTTPError) as error:
+            post("/missing")
+    assert error.value.code == 404 and json.loads(error.value.read()) == {"error": "missing"}
+    assert len(_Handler.connections) == 1
+
+
+class _StaleConnection:
+    """A pooled connection the server closed: the request goes out, the response never comes."""
+
+    sock = None
+    timeout = None
+
+    def __init__(self):
+        self.requests = []
+
+    def request(self, method, path, body=None, headers=None):
+        self.requests.append(method)
+
+    def getresponse(self):
+        raise http.client.RemoteDisconnected("Remote end closed connection without response")
+
+    def close(self):
+        pass
+
+
+@pytest.mark.parametrize("method, retried", [("GET", True), ("POST", False)])
+def test_keepalive_retries_stale_connection_only_for_idempotent_requests(http_server, method, retried):
+    """Test that a POST already written on a stale connection is not sent again."""
+    netloc = http_server.split("://", 1)[1]
+    stale = _StaleConnection()
+    request = urllib.request.Request(f"{http_server}/a", data=b"{}" if method == "POST" else None, method=method)
+
+    with patch.dict(os.environ, {"HTTP_KEEPALIVE": "true"}), \
+            patch.dict(connections._idle, {("http", netloc): [stale]}, clear=True):
+        if retried:
+            # The test server answers GET with 501: the retry reached it
+            with pytest.raises(urllib.error.HTTPError) as error:
+                connections.urlopen(request, timeout=5)
+            assert error.value.code == 501
+        else:
+            with pytest.raises(urllib.error.URLError) as error:
+                connections.urlopen(request, timeout=5)
+            assert isinstance(error.value.reason, http.client.RemoteDisconnected)
+
+    assert stale.requests == [method]
+    if not retried:
+        assert not _Handler.connections
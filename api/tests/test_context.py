@@ -0,0 +1,79 @@
+"""Tests for overlap-aware context assembly."""
+
+from api.context import assemble_context, build_passages, strip_overlap
+from worker.chunking import chunk_text
+
+TEXT = " ".join(
+    f"Sentence {i} discusses topic {i % 7} in some detail for the retrieval tests." for i in range(200)
+)
+
+
+def _rows(chunks, doc_id="doc1", start=0, similarity=0.9):
+    return [
+        {
+            "chunk_id": f"{doc_id}-{start + i}",
+            "doc_id": doc_id,
+            "content": content,
+            "chunk_index": start + i,
+            "similarity": similarity - i * 0.01,
+        }
+        for i, content in enumerate(chunks)
+    ]
+
+
+def test_strip_overlap():
+    """Test that only a real shared boundary is removed."""
+    assert strip_overlap("abc " + "x" * 30 + " shared overlap text", "x" * 30 + " shared overlap text. New") == ". New"
+    assert strip_overlap("completely different text here", "no shared prefix at all here") == (
+        "no shared prefix at all here"
+    )
+
+
+def test_adjacent_chunks_merge_without_duplication():
+    """Test that merging consecutive chunk_text chunks reproduces the source text."""
+    chunks = chunk_text(TEXT)
+    rows = _rows(chunks[:5])
+
+    result = assemble_context(rows, max_bytes=0)
+
+    assert result["passages"] == 1
+    assert result["text"] in TEXT
+    assert len(result["text"]) < sum(len(c) for c in chunks[:5])
+    assert [c["chunk_id"] for c in result["citations"]] == [r["chunk_id"] for r in rows]
+
+
+def test_non_adjacent_chunks_stay_separate_in_rank_order():
+    """Test that gaps in chunk_index and other documents start new passages."""
+    chunks = chunk_text(TEXT)
+    rows = [
+        _rows([chunks[5]], "doc2", start=5, similarity=0.95)[0],
+        *_rows([chunks[0], chunks[1]], "doc1"),
+        _rows([chunks[3]], "doc1", start=3, similarity=0.5)[0],
+    ]
+
+    passages = build_passages(rows)
+
+    assert [(p["doc_id"], len(p["segments"])) for p in passages] == [("doc2", 1), ("doc1", 2), ("doc1", 1)]
+
+
+def test_budget_truncates_and_drops():
+    """Test that the byte budget cuts the crossing passage and drops the rest."""
+    chunks = chunk_text(TEXT)
+    rows = _rows(chunks[:3]) + _rows(chunks[10:12], start=10)
+
+    result = assemble_context(rows, max_bytes=1500)
+
+    assert result["truncated"] is True
+    assert len(result["text"].encode("utf-8")) <= 1500
+    assert result["dropped_chunks"] > 0
+    assert len(result["citations"]) + result["dropped_chunks"] == len(rows)
+
+
+def test_token_budget_and_excerpts():
+    """Test the token budget (4 bytes per token) and short excerpts."""
+    rows = _rows(chunk_text(TEXT)[:4])
+
+    result = assemble_context(rows, max_bytes=0, max_tokens=100, excerpt_chars=50)
+
+    assert result["bytes"] <= 400
+    assert all(len(c["excerpt"]) <= 53 for c in result["citations"])
@@ -0,0 +1,110 @@
+"""Tests for near-duplicate chunk suppression at ingest (INGEST_DEDUP=true)."""
+
+import os
+import uuid
+from unittest.mock import MagicMock, patch
+
+from worker.dedup import (
+    MINHASH_BANDS,
+    MINHASH_BINS,
+    fingerprint_chunks,
+    minhash_signature,
+    plan_dedup,
+    signature_bands,
+    signature_similarity,
+)
+from worker.ingest import ingest_document
+
+FOOTER = (
+    "This message and any attachments are confidential and intended solely for the addressee. "
+    "If you received it in error, notify the sender and delete it. Page 3 of 17. "
+    "Copyright 2024 Example Corp. All rights reserved. Unauthorized copying, distribution or "
+    "disclosure of this material is strictly prohibited and may be unlawful. "
+) * 2
+
+
+def _unique(seed: int) -> str:
+    words = [f"topic{seed}word{i}" for i in range(40)]
+    return ("Section about " + " ".join(words) + ". ") * 3
+
+
+def test_signature_is_deterministic_and_fits_bigint():
+    signature = minhash_signature(FOOTER)
+    assert signature == minhash_signature(FOOTER)
+    assert len(signature) == MINHASH_BINS
+    assert all(0 <= value < 2**63 for value in signature)
+    bands = signature_bands(signature)
+    assert len(bands) == MINHASH_BANDS
+    assert all(-(2**63) <= band < 2**63 for band in bands)
+    assert minhash_signature("  ... ") is None
+
+
+def test_similarity_tracks_near_duplicates():
+    footer = minhash_signature(FOOTER)
+    assert signature_similarity(footer, minhash_signature(FOOTER.upper())) == 1.0
+    assert signature_similarity(footer, minhash_signature(FOOTER.replace("Page 3", "Page 4"))) >= 0.8
+    assert signature_similarity(footer, minhash_signature(_unique(1))) < 0.2
+
+
+def test_plan_links_repeats_within_document_to_first_occurrence():
+    chunks = [_unique(0), FOOTER, _unique(1), FOOTER.replace("Page 3", "Page 9"), FOOTER]
+    plan = plan_dedup("doc", chunks, fingerprint_chunks(chunks), [], min_similarity=0.8)
+    assert sorted(plan.fingerprints) == [0, 1, 2]
+    assert sorted(plan.duplicates) == [3, 4]
+    assert plan.duplicates[4]["canonical_document_id"] == "doc"
+    assert plan.duplicates[4]["canonical_chunk_index"] == 1
+    assert plan.duplicates[4]["similarity"] == 1.0
+    assert plan.duplicates[4]["content_bytes"] == len(FOOTER.encode())
+
+
+def test_plan_prefers_stored_match_and_resumes_with_own_fingerprints():
+    chunks = [FOOTER, _unique(0), _unique(1), FOOTER]
+    stored = [{"chunk_index": 2, "canonical_document_id": "other", "canonical_chunk_index": 7, "similarity": 0.95}]
+    own = fingerprint_chunks(chunks)[:1]  # chunk 0 committed by an earlier attempt
+    plan = plan_dedup("doc", chunks, fingerprint_chunks(chunks, start_index=1), stored, own, min_similarity=0.9)
+    assert sorted(plan.fingerprints) == [1]
+    assert plan.duplicates[2]["canonical_document_id"] == "other"
+    assert plan.duplicates[3]["canonical_chunk_index"] == 0
+
+
+def test_ingest_skips_duplicate_chunks():
+    paragraphs = [_unique(0), FOOTER, _unique(1), FOOTER, _unique(2), FOOTER]
+    body = MagicMock()
+    body.read.return_value = "\n".join(paragraphs).encode()
+    s3 = MagicMock()
+    s3.get_object.return_value = {"Body": body, "ETag": '"etag"'}
+    inserts = []
+    env = {
+        "INGEST_DEDUP": "true",
+        "INGEST_DEDUP_MIN_SIMILARITY": "0.9",
+        "INGEST_CHECKPOINTS": "false",
+        "EMBEDDING_MODE": "fake",
+        "EMBEDDING_BATCH_SIZE": "2",
+        "EMBEDDING_COARSE_DIMENSIONS": "0",
+        "SLOW_INGEST_MS": "0",
+    }
+
+    def insert_chunks(doc_id, trace_id, chunks, embeddings, chunk_indices=(), **kwargs):
+        inserts.extend(chunk_indices)
+        return 0
+
+    with patch.dict(os.environ, env), \
+            patch("worker.ingest.get_s3_client", return_value=s3), \
+            patch("worker.ingest.chunk_text", return_value=paragraphs), \
+            patch("worker.ingest.insert_document", return_value="doc1"), \
+            patch("worker.ingest.insert_chunks", side_effect=insert_chunks), \
+            patch("worker.ingest.find_chunk_near_duplicates", return_value=[]) as find, \
+            patch("worker.ingest.insert_chunk_duplicates") as insert_duplicates, \
+            patch("worker.ingest.insert_chunk_fingerprints") as insert_fingerprints, \
+            patch("worker.ingest.get_embeddings", side_effect=lambda texts, stats=None: [[0.0]] * len(texts)) as embed:
+        summary = ingest_document("bucket", f"uploads/2024/01/01/{uuid.uuid4()}/doc.txt")
+
+    assert summary["chunk_count"] == 6
+    assert summary["duplicate_chunks"] == 2
+    assert summary["dedup_saved_bytes"] > 2 * 1536 * 4
+    assert "dedup" in summary["stage_ms"]
+    assert find.call_args.args[2] == "doc1"
+    assert inserts == [0, 1, 2, 4]
+    assert sum(len(call.args[0]) for call in embed.call_args_list) == 4
+    assert [row["chunk_index"] for row in insert_duplicates.call_args.args[0]] == [3, 5]
+    assert [row["chunk_index"] for call in insert_fingerprints.call_args_list for row in call.args[0]] == [0, 1, 2, 4]
@@ -0,0 +1,103 @@
+"""Tests for hierarchical (document centroid, then chunk) retrieval."""
+
+import os
+import uuid
+from unittest.mock import MagicMock, patch
+
+from api.rag import retrieve_chunks
+from api.supabase_db import (
+    build_document_filter_clause,
+    build_hierarchical_search_query,
+    search_hierarchical_chunks,
+)
+from worker.ingest import ingest_document
+
+
+def test_document_filter_clause_maps_chunk_filters():
+    """Test that chunk filters become the equivalent conditions on documents."""
+    doc_id = uuid.uuid4()
+    sql, params = build_document_filter_clause({"document_ids": [doc_id], "trace_ids": ["t1"], "created_before": "2024-06-01"})
+
+    assert "d.id = ANY(%(filter_document_ids)s::uuid[])" in sql
+    assert "d.trace_id = ANY(%(filter_trace_ids)s::text[])" in sql
+    assert "d.created_at < %(filter_created_before)s" in sql
+    assert params["filter_document_ids"] == [str(doc_id)]
+    assert build_document_filter_clause(None) == ("", {})
+
+
+def test_hierarchical_query_ranks_documents_then_their_chunks():
+    """Test that chunks are ranked only within the top documents by centroid."""
+    query, params = build_hierarchical_search_query([0.1] * 1536, top_k=5, top_documents=3)
+
+    documents_cte, chunks_part = query.split("candidates AS MATERIALIZED")
+    assert "top_documents AS MATERIALIZED" in documents_cte
+    assert "ORDER BY d.centroid <=> %(embedding)s::vector" in documents_cte
+    assert "LIMIT %(top_documents)s" in documents_cte
+    assert "JOIN chunks c ON c.document_id = t.id" in chunks_part
+    assert "c.created_at = t.created_at" not in chunks_part
+    assert params["top_documents"] == 3
+    assert params["top_k"] == 5
+
+
+def test_hierarchical_query_filters_both_stages_and_prunes_partitions():
+    """Test that filters apply to the document and chunk stages."""
+    query, params = build_hierarchical_search_query(
+        [0.1] * 1536, top_k=5, filters={"trace_ids": ["t1"]}, prune_partitions=True
+    )
+
+    documents_cte, chunks_part = query.split("candidates AS MATERIALIZED")
+    assert "AND d.trace_id = ANY" in documents_cte
+    assert "WHERE c.trace_id = ANY" in chunks_part
+    assert "AND c.created_at = t.created_at" in chunks_part
+    assert params["filter_trace_ids"] == ["t1"]
+
+
+@patch("api.supabase_db.db_connection")
+def test_hierarchical_search_applies_threshold(mock_db_connection):
+    """Test that results are split by threshold like search_similar_chunks."""
+    cursor = MagicMock()
+    cursor.fetchall.return_value = [
+        ("c1", "d1", "close", "t1", 0, 0.9),
+        ("c2", "d1", "far", "t1", 1, 0.2),
+    ]
+    conn = mock_db_connection.return_value.__enter__.return_value
+    conn.cursor.return_value.__enter__.return_value = cursor
+
+    with patch.dict(os.environ, {"HIERARCHICAL_TOP_DOCUMENTS": "7"}):
+        filtered, all_results = search_hierarchical_chunks([0.1] * 1536, 5, similarity_threshold=0.5)
+
+    assert [r["chunk_id"] for r in filtered] == ["c1"]
+    assert len(all_results) == 2
+    assert cursor.execute.call_args.args[1]["top_documents"] == 7
+
+
+@patch("api.rag.search_similar_chunks")
+@patch("api.rag.search_hierarchical_chunks", return_value=([], []))
+def test_hierarchical_mode_uses_centroid_search(mock_hierarchical, mock_flat):
+    """Test that RETRIEVAL_MODE=hierarchical searches through document centroids."""
+    with patch.dict(os.environ, {"RETRIEVAL_MODE": "hierarchical", "SEMANTIC_CACHE": "false"}):
+        retrieve_chunks("q", [0.1] * 1536, 5, 0.5, filters={"trace_ids": ["t1"]})
+
+    mock_flat.assert_not_called()
+    assert mock_hierarchical.call_args.kwargs["filters"] == {"trace_ids": ["t1"]}
+
+
+def test_ingest_refreshes_document_centroid():
+    """Test that the worker recomputes the centroid after inserting all chunks."""
+    body = MagicMock()
+    body.read.return_value = b"Centroids summarize a document. " * 100
+    s3 = MagicMock()
+    s3.get_object.return_value = {"Body": body, "ETag": '"etag"'}
+    env = {"DOCUMENT_CENTROIDS": "true", "INGEST_CHECKPOINTS": "false", "EMBEDDING_MODE": "fake", "SLOW_INGEST_MS": "0"}
+
+    with patch.dict(os.environ, env), \
+            patch("worker.ingest.get_s3_client", return_value=s3), \
+            patch("worker.ingest.insert_document", return_value="doc1"), \
+            patch("worker.ingest.insert_chunks", return_value=0) as insert_chunks, \
+            patch("worker.ingest.refresh_document_centroid") as refresh:
+        summary = ingest_document("bucket", f"uploads/2024/01/01/{uuid.uuid4()}/doc.txt")
+
+    refresh.assert_called_once()
+    assert refresh.call_args.args[0] == "doc1"
+    assert refresh.call_args.args[1] == insert_chunks.call_args.kwargs["created_at"]
+    assert "centroid" in summary["stage_ms"]
@@ -0,0 +1,50 @@
+"""Tests for hybrid lexical + vector retrieval."""
+
+import os
+from unittest.mock import patch
+
+from api.rag import reciprocal_rank_fusion, retrieve_chunks
+
+
+def _chunk(chunk_id: str, similarity: float) -> dict:
+    return {
+        "chunk_id": chunk_id,
+        "doc_id": "doc1",
+        "content": f"content {chunk_id}",
+        "trace_id": "trace1",
+        "chunk_index": 0,
+        "similarity": similarity,
+    }
+
+
+def test_rrf_prefers_chunks_in_both_lists():
+    """Test that a chunk ranked by both legs beats single-leg top hits."""
+    vector = [_chunk("a", 0.9), _chunk("b", 0.8)]
+    lexical = [_chunk("c", 0.4), _chunk("b", 0.8)]
+
+    fused = reciprocal_rank_fusion([vector, lexical], k=60)
+
+    assert [c["chunk_id"] for c in fused][0] == "b"
+    assert {c["chunk_id"] for c in fused} == {"a", "b", "c"}
+    assert all("rrf_score" in c for c in fused)
+
+
+def test_rrf_limit():
+    """Test that fusion output is capped at limit."""
+    fused = reciprocal_rank_fusion([[_chunk(str(i), 0.5) for i in range(10)]], limit=3)
+    assert [c["chunk_id"] for c in fused] == ["0", "1", "2"]
+
+
+@patch("api.rag.search_lexical_chunks")
+@patch("api.rag.search_similar_chunks")
+def test_hybrid_mode_fuses_both_legs(mock_vector, mock_lexical):
+    """Test that hybrid mode queries both legs and filters fused results by threshold."""
+    mock_vector.return_value = ([_chunk("a", 0.9)], [_chunk("a", 0.9), _chunk("b", 0.3)])
+    mock_lexical.return_value = [_chunk("sku", 0.6)]
+
+    with patch.dict(os.environ, {"RETRIEVAL_MODE": "hybrid"}):
+        filtered, all_results = retrieve_chunks("SKU-123?", [0.1] * 1536, 5, 0.5)
+
+    assert mock_lexical.call_args.args[0] == "SKU-123?"
+    assert {c["chunk_id"] for c in all_results} == {"a", "b", "sku"}
+    assert {c["chunk_id"] for c in filtered} == {"a", "sku"}
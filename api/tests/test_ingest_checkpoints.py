@@ -0,0 +1,145 @@
+"""Tests for checkpointed, resumable ingestion (INGEST_CHECKPOINTS=true)."""
+
+import os
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from worker.ingest import get_checkpoint_chunks, ingest_document
+
+ENV = {
+    "INGEST_CHECKPOINTS": "true",
+    "INGEST_CHECKPOINT_CHUNKS": "8",
+    "EMBEDDING_MODE": "fake",
+    "EMBEDDING_BATCH_SIZE": "4",
+    "SLOW_INGEST_MS": "0",
+}
+KEY = f"uploads/2024/01/01/{uuid.uuid4()}/big.txt"
+
+
+class FakeStore:
+    """Stands in for the documents, chunks and ingest_jobs tables."""
+
+    def __init__(self, fail_insert_at: int | None = None):
+        self.jobs: dict[tuple, dict] = {}
+        self.chunks: dict[tuple, str] = {}
+        self.documents: list[str] = []
+        self.deleted: list[str] = []
+        self.fail_insert_at = fail_insert_at
+
+    def insert_document(self, trace_id, bucket, key, filename, created_at=None):
+        self.documents.append(f"doc{len(self.documents) + 1}")
+        return self.documents[-1]
+
+    def get_ingest_job(self, bucket, key):
+        job = self.jobs.get((bucket, key))
+        return dict(job) if job else None
+
+    def save_ingest_job(self, job):
+        self.jobs[(job["source_bucket"], job["source_key"])] = {
+            **job, "next_chunk_index": 0, "status": "running", "attempts": 1,
+        }
+
+    def update_ingest_job(self, bucket, key, **fields):
+        self.jobs[(bucket, key)].update(fields)
+
+    def delete_document(self, document_id):
+        self.deleted.append(document_id)
+        self.jobs = {k: v for k, v in self.jobs.items() if v["document_id"] != document_id}
+
+    def insert_chunks(self, doc_id, trace_id, chunks, embeddings, created_at=None, ignore_duplicates=False, chunk_indices=()):
+        if self.fail_insert_at is not None and chunk_indices[0] == self.fail_insert_at:
+            self.fail_insert_at = None
+            raise ValueError("Supabase API error (503)")
+        for i, chunk in zip(chunk_indices, chunks):
+            self.chunks.setdefault((doc_id, i), chunk)
+        return 100
+
+    def patches(self):
+        names = ("insert_document", "get_ingest_job", "save_ingest_job", "update_ingest_job", "delete_document", "insert_chunks")
+        return [patch(f"worker.ingest.{name}", side_effect=getattr(self, name)) for name in names]
+
+
+def _ingest(store: FakeStore, text: str, etag: str = '"v1"'):
+    body = MagicMock()
+    body.read.return_value = text.encode()
+    s3 = MagicMock()
+    s3.get_object.return_value = {"Body": body, "ETag": etag}
+    embedded = []
+
+    def embed(texts, stats=None):
+        embedded.extend(texts)
+        return [[0.0]] * len(texts)
+
+    patches = store.patches() + [
+        patch("worker.ingest.get_s3_client", return_value=s3),
+        patch("worker.ingest.get_embeddings", side_effect=embed),
+        patch.dict(os.environ, ENV),
+    ]
+    for p in patches:
+        p.start()
+    try:
+        return ingest_document("bucket", KEY), embedded
+    finally:
+        for p in reversed(patches):
+            p.stop()
+
+
+TEXT = "Sentence about machine learning and retrieval. " * 600
+
+
+def test_checkpoint_size_rounds_to_embedding_batches():
+    """Test that checkpoints hold whole embedding batches."""
+    with patch.dict(os.environ, {"INGEST_CHECKPOINT_CHUNKS": "10", "EMBEDDING_BATCH_SIZE": "4"}):
+        assert get_checkpoint_chunks() == 12
+
+
+def test_chunks_are_committed_in_checkpoints():
+    """Test that each checkpoint's chunks are stored and recorded before the next is embedded."""
+    store = FakeStore()
+    summary, embedded = _ingest(store, TEXT)
+
+    job = store.jobs[("bucket", KEY)]
+    assert job["status"] == "completed" and job["next_chunk_index"] == summary["chunk_count"]
+    assert sorted(i for _, i in store.chunks) == list(range(summary["chunk_count"]))
+    assert len(embedded) == summary["chunk_count"]
+
+
+def test_redelivery_resumes_after_last_checkpoint():
+    """Test that a retry re-embeds only the checkpoint that failed."""
+    store = FakeStore(fail_insert_at=16)
+    with pytest.raises(ValueError):
+        _ingest(store, TEXT)
+    assert store.jobs[("bucket", KEY)]["next_chunk_index"] == 16
+
+    summary, embedded = _ingest(store, TEXT)
+
+    assert summary["resumed_from_chunk"] == 16
+    assert len(embedded) == summary["chunk_count"] - 16
+    assert store.documents == ["doc1"]
+    assert store.jobs[("bucket", KEY)]["attempts"] == 2
+    assert len(store.chunks) == summary["chunk_count"]
+
+
+def test_completed_object_is_skipped():
+    """Test that a redelivered message for a finished object embeds nothing."""
+    store = FakeStore()
+    _ingest(store, TEXT)
+
+    summary, embedded = _ingest(store, TEXT)
+
+    assert summary["skipped"] and embedded == []
+
+
+def test_replaced_object_starts_over():
+    """Test that a job for an older version of the object is discarded."""
+    store = FakeStore(fail_insert_at=8)
+    with pytest.raises(ValueError):
+        _ingest(store, TEXT, etag='"v1"')
+
+    summary, embedded = _ingest(store, TEXT + " An appended paragraph.", etag='"v2"')
+
+    assert store.deleted == ["doc1"]
+    assert summary["doc_id"] == "doc2" and summary["resumed_from_chunk"] == 0
+    assert len(embedded) == summary["chunk_count"]
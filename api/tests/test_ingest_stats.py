@@ -0,0 +1,93 @@
+"""Tests for the ingest timing summary and embedding retries."""
+
+import io
+import json
+import logging
+import os
+import urllib.error
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from worker.embeddings import RequestStats, get_openai_embeddings
+from worker.ingest import ingest_document
+
+
+def _events(caplog) -> dict:
+    events = {}
+    for record in caplog.records:
+        try:
+            data = json.loads(record.getMessage())
+        except ValueError:
+            continue
+        events[data["event"]] = data
+    return events
+
+
+@patch("worker.ingest.insert_chunks")
+@patch("worker.ingest.insert_document")
+@patch("worker.ingest.get_s3_client")
+def test_ingest_completed_summary(mock_get_s3_client, mock_insert_document, mock_insert_chunks, caplog):
+    """Test that ingest_completed reports per-stage ms, throughput and payload bytes."""
+    body = MagicMock()
+    body.read.return_value = ("Sentence about machine learning. " * 200).encode()
+    mock_get_s3_client.return_value.get_object.return_value = {"Body": body}
+    mock_insert_document.return_value = "doc1"
+    mock_insert_chunks.return_value = 12345
+
+    env = {"EMBEDDING_MODE": "fake", "EMBEDDING_BATCH_SIZE": "4", "SLOW_INGEST_MS": "0"}
+    with patch.dict(os.environ, env), caplog.at_level(logging.INFO):
+        ingest_document("bucket", f"uploads/2024/01/01/{uuid.uuid4()}/doc.txt")
+
+    events = _events(caplog)
+    summary = events["ingest_completed"]
+    assert set(summary["stage_ms"]) == {"s3_download", "insert_document", "chunking", "embedding", "db_insert"}
+    assert summary["size_bytes"] == len(body.read.return_value)
+    assert summary["chunk_count"] == len(mock_insert_chunks.call_args.args[2])
+    assert summary["db_payload_bytes"] == 12345
+    assert summary["bytes_per_s"] > 0 and summary["chunks_per_s"] > 0
+    assert "ingest_slow" not in events
+
+
+@patch("worker.ingest.insert_chunks", return_value=10)
+@patch("worker.ingest.insert_document", return_value="doc1")
+@patch("worker.ingest.get_s3_client")
+def test_ingest_slow_warning(mock_get_s3_client, mock_insert_document, mock_insert_chunks, caplog):
+    """Test that exceeding SLOW_INGEST_MS logs a warning with the stage breakdown."""
+    body = MagicMock()
+    body.read.return_value = b"A short document."
+    mock_get_s3_client.return_value.get_object.return_value = {"Body": body}
+
+    env = {"EMBEDDING_MODE": "fake", "SLOW_INGEST_MS": "0.0001"}
+    with patch.dict(os.environ, env), caplog.at_level(logging.INFO):
+        ingest_document("bucket", f"uploads/2024/01/01/{uuid.uuid4()}/doc.txt")
+
+    slow = _events(caplog)["ingest_slow"]
+    assert slow["threshold_ms"] == 0.0001
+    assert slow["slowest_stage"] in slow["stage_ms"]
+
+
+def _http_error(code: int) -> urllib.error.HTTPError:
+    return urllib.error.HTTPError("https://api.openai.com", code, "error", {}, io.BytesIO(b"{}"))
+
+
+def test_openai_embeddings_retry_counted():
+    """Test that retryable errors are retried and counted, and others are not retried."""
+    response = MagicMock()
+    response.__enter__.return_value.read.return_value = json.dumps(
+        {"data": [{"index": 0, "embedding": [0.1, 0.2]}]}
+    ).encode()
+    env = {"OPENAI_API_KEY": "test", "EMBEDDING_MAX_RETRIES": "3", "EMBEDDING_RETRY_BASE_SECONDS": "0"}
+
+    stats = RequestStats()
+    with patch.dict(os.environ, env), \
+            patch("urllib.request.urlopen", side_effect=[_http_error(429), _http_error(503), response]):
+        assert get_openai_embeddings(["text"], stats=stats) == [[0.1, 0.2]]
+    assert (stats.requests, stats.retries) == (3, 2)
+
+    stats = RequestStats()
+    with patch.dict(os.environ, env), patch("urllib.request.urlopen", side_effect=[_http_error(400)]):
+        with pytest.raises(ValueError, match="400"):
+            get_openai_embeddings(["text"], stats=stats)
+    assert (stats.requests, stats.retries) == (1, 0)
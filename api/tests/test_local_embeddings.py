@@ -0,0 +1,47 @@
+"""Tests for the local hashing-trick embedding provider."""
+
+import math
+import os
+from unittest.mock import patch
+
+from worker.embeddings import get_embedding, get_embeddings, get_local_embedding
+
+
+def _cosine(a, b):
+    return sum(x * y for x, y in zip(a, b))
+
+
+def test_local_embedding_is_normalized_and_deterministic():
+    """Test dimension, unit norm and stable output."""
+    embedding = get_local_embedding("Embeddings are stored in pgvector.", dimension=256)
+
+    assert len(embedding) == 256
+    assert math.isclose(math.sqrt(sum(v * v for v in embedding)), 1.0)
+    assert embedding == get_local_embedding("embeddings ARE stored in pgvector", dimension=256)
+
+
+def test_local_embedding_ranks_related_text_higher():
+    """Test that shared vocabulary (including plural forms) gives higher similarity."""
+    question = get_local_embedding("How do I reset my password?")
+    related = get_local_embedding("To reset passwords, open account settings and choose reset password.")
+    unrelated = get_local_embedding("Our refund policy covers annual plans within 30 days.")
+
+    assert _cosine(question, related) > 0.5
+    assert abs(_cosine(question, unrelated)) < 0.2
+
+
+def test_local_embedding_of_stopwords_only():
+    """Test that text without content words still gets a unit vector."""
+    embedding = get_local_embedding("the and of", dimension=8)
+    assert embedding == [1.0] + [0.0] * 7
+
+
+def test_embedding_mode_local():
+    """Test that EMBEDDING_MODE=local is used for single and batch embeddings."""
+    env = {"EMBEDDING_MODE": "local", "EMBEDDING_DIMENSIONS": "64"}
+    with patch.dict(os.environ, env):
+        single = get_embedding("vector index")
+        batch = get_embeddings(["vector index", "other text"])
+
+    assert single == get_local_embedding("vector index", dimension=64)
+    assert batch[0] == single and len(batch) == 2
@@ -0,0 +1,64 @@
+"""Tests for Prometheus metrics."""
+
+import os
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from api import metrics
+
+os.environ.setdefault("S3_BUCKET_NAME", "test-bucket")
+
+from api.main import app  # noqa: E402
+
+
+def test_histogram_renders_cumulative_buckets():
+    """Test text exposition of a labelled histogram."""
+    histogram = metrics.Histogram("test_duration_seconds", "Test histogram", ("stage",), buckets=(0.1, 1.0))
+    histogram.labels("a").observe(0.05)
+    histogram.labels("a").observe(0.5)
+    histogram.labels("a").observe(5.0)
+
+    text = histogram.render()
+
+    assert "# TYPE test_duration_seconds histogram" in text
+    assert 'test_duration_seconds_bucket{stage="a",le="0.1"} 1' in text
+    assert 'test_duration_seconds_bucket{stage="a",le="1.0"} 2' in text
+    assert 'test_duration_seconds_bucket{stage="a",le="+Inf"} 3' in text
+    assert 'test_duration_seconds_count{stage="a"} 3' in text
+
+
+def test_gauge_function_evaluated_at_render():
+    """Test that callback gauges are computed at scrape time."""
+    gauge = metrics.Gauge("test_pool_connections", "Test gauge")
+    values = iter([3, 7])
+    gauge.set_function(lambda: next(values))
+
+    assert "test_pool_connections 3.0" in gauge.render()
+    assert "test_pool_connections 7.0" in gauge.render()
+
+
+@patch("api.rag.search_similar_chunks")
+@patch("api.rag.get_embedding")
+def test_ask_records_stage_metrics(mock_get_embedding, mock_search_chunks):
+    """Test that /ask records per-stage latencies exposed on /metrics."""
+    chunk = {
+        "chunk_id": "chunk1",
+        "doc_id": "doc1",
+        "content": "Artificial intelligence is a field of computer science.",
+        "trace_id": "trace1",
+        "chunk_index": 0,
+        "similarity": 0.85,
+    }
+    mock_get_embedding.return_value = [0.1] * 1536
+    mock_search_chunks.return_value = ([chunk], [chunk])
+    client = TestClient(app)
+
+    with patch.dict(os.environ, {"SIMILARITY_THRESHOLD": "0.7"}):
+        response = client.post("/ask", json={"question": "What is AI?"})
+    assert response.status_code == 200
+    assert response.json()["citations"][0]["score"] == 0.85
+
+    text = client.get("/metrics").text
+    for stage in ("embed_question", "answer_assembly", "serialization"):
+        assert f'rag_stage_duration_seconds_count{{stage="{stage}"}}' in text
@@ -0,0 +1,28 @@
+"""Tests for the microbenchmark runner."""
+
+from benchmarks.microbench import compare_to_baseline, time_case
+
+
+def test_time_case_reports_per_call_timings():
+    """Test that timing calibrates iterations and reports per-call seconds."""
+    result = time_case(lambda: sum(range(100)), min_time=0.001, repeats=3)
+
+    assert result["iterations"] >= 1
+    assert result["repeats"] == 3
+    assert 0 < result["min_s"] <= result["median_s"]
+
+
+def test_compare_to_baseline_flags_regressions():
+    """Test that only cases slower than baseline * (1 + threshold) regress."""
+    baseline = {"cases": {"fast": {"median_s": 1.0}, "slow": {"median_s": 1.0}}}
+    results = {"cases": {
+        "fast": {"median_s": 1.1},
+        "slow": {"median_s": 1.5},
+        "new": {"median_s": 9.0},
+    }}
+
+    comparisons = {c["case"]: c for c in compare_to_baseline(results, baseline, threshold=0.25)}
+
+    assert comparisons["fast"]["regressed"] is False
+    assert comparisons["slow"]["regressed"] is True
+    assert "new" not in comparisons
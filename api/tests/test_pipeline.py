@@ -0,0 +1,218 @@
+"""Tests for the bounded ingest pipeline (worker.pipeline) and pipelined ingest."""
+
+import json
+import os
+import threading
+import time
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from worker import connections
+from worker.ingest import ingest_document
+from worker.pipeline import run_pipeline
+from worker.replay import Replayer
+
+
+def test_items_keep_their_order_through_stages():
+    out = []
+    queues = run_pipeline(range(50), [("double", lambda x: x * 2), ("inc", lambda x: x + 1)], ("sink", out.append))
+    assert out == [x * 2 + 1 for x in range(50)]
+    assert set(queues) == {"double", "inc", "sink"}
+
+
+def test_depth_zero_runs_inline():
+    threads = []
+
+    def stage(x):
+        threads.append(threading.current_thread())
+        return x
+
+    out = []
+    assert run_pipeline(range(3), [("stage", stage)], ("sink", out.append), depth=0) == {}
+    assert out == [0, 1, 2]
+    assert threads == [threading.current_thread()] * 3
+
+
+def test_slow_sink_applies_backpressure():
+    def slow_sink(item):
+        time.sleep(0.01)
+
+    queues = run_pipeline(range(20), [("stage", lambda x: x)], ("sink", slow_sink), depth=2)
+    assert queues["sink"]["max_depth"] <= 2
+    assert queues["stage"]["max_depth"] <= 2
+    # The stage waited on the slow sink, not the other way round
+    assert queues["sink"]["producer_blocked_ms"] > queues["sink"]["consumer_idle_ms"]
+
+
+def test_stage_error_stops_pipeline_and_is_raised():
+    produced = []
+
+    def source():
+        for i in range(1000):
+            produced.append(i)
+            yield i
+
+    def stage(x):
+        if x == 3:
+            raise ValueError("boom")
+        return x
+
+    with pytest.raises(ValueError, match="boom"):
+        run_pipeline(source(), [("stage", stage)], ("sink", lambda x: None), depth=2)
+    assert len(produced) < 1000
+
+
+def test_sink_error_is_raised():
+    def sink(x):
+        raise RuntimeError("insert failed")
+
+    with pytest.raises(RuntimeError, match="insert failed"):
+        run_pipeline(range(10), [("stage", lambda x: x)], ("sink", sink), depth=2)
+
+
+def test_stages_overlap():
+    def stage(x):
+        time.sleep(0.02)
+        return x
+
+    def sink(x):
+        time.sleep(0.02)
+
+    start = time.perf_counter()
+    run_pipeline(range(10), [("stage", stage)], ("sink", sink), depth=2)
+    # Sequential would take 10 * (0.02 + 0.02) = 0.4 s
+    assert time.perf_counter() - start < 0.35
+
+
+ENV = {
+    "INGEST_CHECKPOINTS": "false",
+    "INGEST_CHECKPOINT_CHUNKS": "4",
+    "INGEST_PIPELINE_DEPTH": "2",
+    "EMBEDDING_MODE": "fake",
+    "EMBEDDING_BATCH_SIZE": "2",
+    "SLOW_INGEST_MS": "0",
+}
+
+
+def _s3(chunk_count: int):
+    paragraph = ("Retrieval pipelines embed document chunks and store them for vector search. " * 10).strip()
+    body = MagicMock()
+    body.read.return_value = "\n".join([paragraph] * chunk_count).encode()
+    s3 = MagicMock()
+    s3.get_object.return_value = {"Body": body, "ETag": '"etag"'}
+    return s3
+
+
+def _ingest(s3, insert_chunks, delete_document=None, env=None):
+    with patch.dict(os.environ, {**ENV, **(env or {})}), \
+            patch("worker.ingest.get_s3_client", return_value=s3), \
+            patch("worker.ingest.insert_document", return_value="doc1"), \
+            patch("worker.ingest.insert_chunks", side_effect=insert_chunks), \
+            patch("worker.ingest.delete_document", delete_document or MagicMock()):
+        return ingest_document("bucket", f"uploads/2024/01/01/{uuid.uuid4()}/big.txt")
+
+
+def test_pipelined_ingest_inserts_every_chunk_in_order():
+    inserts = []
+
+    def insert_chunks(doc_id, trace_id, chunks, embeddings, created_at=None, ignore_duplicates=False, chunk_indices=()):
+        assert len(chunks) == len(embeddings) == len(chunk_indices)
+        inserts.append(list(chunk_indices))
+        return 0
+
+    summary = _ingest(_s3(10), insert_chunks)
+    assert summary["chunk_count"] == 10
+    # Without checkpoints, all chunks go in one insert after the last batch
+    assert inserts == [list(range(10))]
+    assert set(summary["queues"]) == {"embed", "insert"}
+
+
+def test_failed_ingest_without_checkpoints_deletes_document():
+    def insert_chunks(doc_id, trace_id, chunks, embeddings, **kwargs):
+        raise RuntimeError("insert failed")
+
+    delete_document = MagicMock()
+    with pytest.raises(RuntimeError, match="insert failed"):
+        _ingest(_s3(10), insert_chunks, delete_document)
+    delete_document.assert_called_once_with("doc1")
+
+
+@pytest.mark.parametrize("dedup, batches", [(False, 5), (True, 1)])
+def test_killed_ingest_without_checkpoints_is_not_skipped_by_replay(dedup, batches):
+    store = {"documents": [], "chunks": [], "chunk_duplicates": []}
+    calls = []
+
+    def insert_document(*args, **kwargs):
+        store["documents"].append({"id": "doc1"})
+        return "doc1"
+
+    def get_embeddings(texts, stats=None):
+        calls.append(texts)
+        if len(calls) == batches:
+            # A kill (timeout, OOM): the except cleanup does not run
+            raise SystemExit(1)
+        time.sleep(0.02)
+        return [[0.0] * 8 for _ in texts]
+
+    def insert_chunks(doc_id, trace_id, chunks, embeddings, chunk_indices=(), **kwargs):
+        store["chunks"].extend({"document_id": doc_id, "chunk_index": index} for index in chunk_indices)
+        return 0
+
+    def make_request(method, url, data=None, body=None, prefer=None):
+        table = url.rsplit("/", 1)[1].split("?", 1)[0]
+        return store[table][:1]
+
+    env = {**ENV, "INGEST_DEDUP": str(dedup).lower(), "SUPABASE_URL": "https://db.test", "SUPABASE_SERVICE_ROLE_KEY": "key"}
+    key = f"uploads/2024/01/01/{uuid.uuid4()}/big.txt"
+    with patch.dict(os.environ, env), \
+            patch("worker.ingest.get_s3_client", return_value=_s3(10)), \
+            patch("worker.ingest.insert_document", side_effect=insert_document), \
+            patch("worker.ingest.get_embeddings", side_effect=get_embeddings), \
+            patch("worker.ingest.insert_chunks", side_effect=insert_chunks), \
+            patch("worker.ingest.find_chunk_near_duplicates", return_value=[]), \
+            patch("worker.ingest.insert_chunk_duplicates", side_effect=store["chunk_duplicates"].extend), \
+            patch("worker.ingest.insert_chunk_fingerprints"), \
+            patch("worker.supabase_db._make_request", side_effect=make_request):
+        with pytest.raises(SystemExit):
+            ingest_document("bucket", key)
+        assert store["documents"] and not store["chunks"] and not store["chunk_duplicates"]
+
+        with patch("worker.replay.ingest_document", return_value={"doc_id": "doc2", "chunk_count": 10}) as replayed:
+            assert Replayer().replay_object("bucket", key) == "ingested"
+        replayed.assert_called_once_with("bucket", key)
+
+
+class _FakeHTTPSConnection:
+    """Stands in for http.client.HTTPSConnection to the embeddings API."""
+
+    created = 0
+
+    def __init__(self, netloc):
+        _FakeHTTPSConnection.created += 1
+        self.sock = None
+        self.timeout = None
+
+    def request(self, method, path, body=None, headers=None):
+        self._inputs = json.loads(body)["input"]
+
+    def getresponse(self):
+        data = [{"index": i, "embedding": [0.0] * 8} for i in range(len(self._inputs))]
+        response = MagicMock(status=200, will_close=False, headers={})
+        response.read.return_value = json.dumps({"data": data}).encode()
+        return response
+
+    def close(self):
+        pass
+
+
+def test_keepalive_connection_is_reused_across_documents():
+    _FakeHTTPSConnection.created = 0
+    env = {"EMBEDDING_MODE": "openai", "OPENAI_API_KEY": "sk-test", "EMBEDDING_DIMENSIONS": "8", "HTTP_KEEPALIVE": "true"}
+    with patch.dict(connections._idle, clear=True), \
+            patch("http.client.HTTPSConnection", _FakeHTTPSConnection):
+        for _ in range(2):
+            # Each ingest runs its embed stage in a new pipeline thread
+            assert _ingest(_s3(10), lambda *args, **kwargs: 0, env=env)["chunk_count"] == 10
+    assert _FakeHTTPSConnection.created == 1
@@ -0,0 +1,113 @@
+"""Tests for the dead-letter replay tool and embedding rate limiting."""
+
+import json
+import threading
+import time
+from unittest.mock import MagicMock, patch
+
+from worker.queues import Message, SQSQueue, read_jsonl_messages
+from worker.ratelimit import RateLimiter
+from worker.replay import Replayer, receive_sqs_messages
+from worker.utils import s3_objects_from_message
+
+
+def _body(*keys: str, bucket: str = "bucket") -> str:
+    return json.dumps({"Records": [{"s3": {"bucket": {"name": bucket}, "object": {"key": k}}} for k in keys]})
+
+
+def test_s3_objects_from_message():
+    """Test that keys are URL-decoded and records without a key are skipped."""
+    body = json.dumps({"Records": [
+        {"s3": {"bucket": {"name": "b"}, "object": {"key": "uploads/my+file%281%29.txt"}}},
+        {"s3": {"bucket": {"name": "b"}, "object": {}}},
+    ]})
+    assert s3_objects_from_message(body) == [("b", "uploads/my file(1).txt")]
+    assert s3_objects_from_message(json.dumps({"Event": "s3:TestEvent"})) == []
+
+
+def test_read_jsonl_messages(tmp_path):
+    """Test that SQS messages and bare S3 events are both accepted."""
+    path = tmp_path / "dlq.jsonl"
+    path.write_text(json.dumps({"MessageId": "1", "Body": _body("a")}) + "\n\n" + _body("b") + "\n")
+
+    assert [s3_objects_from_message(m.body) for m in read_jsonl_messages(str(path))] == [
+        [("bucket", "a")],
+        [("bucket", "b")],
+    ]
+
+
+@patch("worker.replay.find_ingested_document")
+@patch("worker.replay.ingest_document")
+def test_replay_outcomes(mock_ingest, mock_find):
+    """Test that done and repeated objects are skipped and failures are reported."""
+    mock_find.side_effect = lambda bucket, key: "doc0" if key == "done" else None
+
+    def ingest(bucket, key):
+        if key == "bad":
+            raise ValueError("OpenAI API error (503)")
+        return {"doc_id": "doc1", "chunk_count": 3, "size_bytes": 100, "embedding_requests": 1}
+
+    mock_ingest.side_effect = ingest
+    succeeded, failed = [], []
+    replayer = Replayer(concurrency=4, on_success=succeeded.append, on_failure=failed.append)
+    messages = [Message(_body(k)) for k in ("a", "b", "done", "a", "bad")] + [Message("not json")]
+
+    summary = replayer.run(messages)
+
+    assert (summary["ingested"], summary["skipped"], summary["duplicate"], summary["failed"]) == (2, 1, 1, 1)
+    assert summary["messages"] == 6 and summary["invalid"] == 1
+    assert summary["chunk_count"] == 6 and summary["embedding_requests"] == 2
+    assert summary["failures"] == [{"bucket": "bucket", "key": "bad", "error": "OpenAI API error (503)"}]
+    assert len(succeeded) == 4 and len(failed) == 2
+    assert sorted(call.args[1] for call in mock_ingest.call_args_list) == ["a", "b", "bad"]
+
+
+@patch("worker.replay.find_ingested_document", return_value=None)
+@patch("worker.replay.ingest_document")
+def test_replay_runs_in_parallel(mock_ingest, mock_find):
+    """Test that up to `concurrency` documents are ingested at once."""
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def ingest(bucket, key):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return {}
+
+    mock_ingest.side_effect = ingest
+    summary = Replayer(concurrency=4).run(Message(_body(f"k{i}")) for i in range(16))
+
+    assert summary["ingested"] == 16
+    assert peak[0] == 4
+
+
+def test_receive_sqs_messages_stops_when_empty():
+    """Test that the SQS source drains batches until a receive returns nothing."""
+    client = MagicMock()
+    client.receive_message.side_effect = [
+        {"Messages": [{"Body": _body("a"), "ReceiptHandle": "r1"}]},
+        {"Messages": []},
+    ]
+
+    messages = list(receive_sqs_messages(SQSQueue("queue-url", client)))
+
+    assert [m.receipt_handle for m in messages] == ["r1"]
+    assert client.receive_message.call_args.kwargs["MaxNumberOfMessages"] == 10
+
+
+def test_rate_limiter_spaces_requests():
+    """Test that requests and tokens per minute are both enforced."""
+    limiter = RateLimiter(requests_per_minute=6000, burst_s=0)
+    start = time.monotonic()
+    for _ in range(6):
+        limiter.acquire()
+    assert time.monotonic() - start >= 0.045
+
+    tokens = RateLimiter(tokens_per_minute=60000, burst_s=0)
+    assert tokens.acquire(100)
+    assert not tokens.acquire(1000, timeout=0.01)
+    assert tokens.acquire(10, timeout=0.5)
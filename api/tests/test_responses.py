@@ -0,0 +1,79 @@
+"""Tests for fast JSON responses and compression negotiation."""
+
+import gzip
+import json
+import os
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from api.models import AskResponse
+from api.responses import ask_payload, choose_encoding, dumps, encode_body
+
+os.environ.setdefault("S3_BUCKET_NAME", "test-bucket")
+
+from api.main import app  # noqa: E402
+
+CHUNKS = [
+    {
+        "chunk_id": f"chunk{i}",
+        "doc_id": "doc1",
+        "content": f"Section {i}: artificial intelligence is a field of computer science. " * 10,
+        "trace_id": "trace1",
+        "chunk_index": i * 2,
+        "similarity": 0.9 - i * 0.01,
+    }
+    for i in range(20)
+]
+
+
+def test_ask_payload_matches_pydantic_serialization():
+    """Test that the fast path produces the same JSON as AskResponse."""
+    result = {
+        "trace_id": "t1",
+        "answer": "Answer with unicode: café",
+        "citations": [{"doc_id": "d", "chunk_id": "c", "score": 0.5, "excerpt": "e"}],
+        "refused": False,
+        "refusal_reason": None,
+        "debug": {"ignored": True},
+    }
+
+    assert json.loads(dumps(ask_payload(result))) == json.loads(AskResponse(**result).model_dump_json())
+
+
+def test_choose_encoding():
+    """Test Accept-Encoding negotiation, including q-values and wildcards."""
+    assert choose_encoding(None) is None
+    assert choose_encoding("gzip, deflate") == "gzip"
+    assert choose_encoding("gzip;q=0, deflate") is None
+    assert choose_encoding("identity") is None
+    assert choose_encoding("*") in ("br", "gzip")
+
+
+def test_encode_body_threshold():
+    """Test that small bodies and disabled compression are sent as-is."""
+    body = b'{"answer":"' + b"x" * 2000 + b'"}'
+
+    assert encode_body(b"{}", "gzip") == (b"{}", None)
+    compressed, encoding = encode_body(body, "gzip")
+    assert encoding == "gzip" and gzip.decompress(compressed) == body
+    with patch.dict(os.environ, {"RESPONSE_COMPRESSION_MIN_BYTES": "0"}):
+        assert encode_body(body, "gzip") == (body, None)
+
+
+@patch("api.rag.search_similar_chunks", return_value=(CHUNKS, CHUNKS))
+@patch("api.rag.get_embedding", return_value=[0.1] * 1536)
+def test_ask_compresses_when_accepted(mock_get_embedding, mock_search_chunks):
+    """Test that /ask is gzipped for clients that accept it and plain otherwise."""
+    client = TestClient(app)
+    question = {"question": "What is AI?", "top_k": 20}
+
+    compressed = client.post("/ask", json=question, headers={"Accept-Encoding": "gzip"})
+    plain = client.post("/ask", json=question, headers={"Accept-Encoding": "identity"})
+
+    assert compressed.headers["content-encoding"] == "gzip"
+    assert int(compressed.headers["content-length"]) < len(plain.content)
+    assert "content-encoding" not in plain.headers
+    assert compressed.headers["vary"] == "Accept-Encoding"
+    assert len(compressed.json()["citations"]) == 20
+    assert compressed.json()["answer"] == plain.json()["answer"]
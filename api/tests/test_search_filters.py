@@ -0,0 +1,88 @@
+"""Tests for metadata-filtered search."""
+
+import os
+import uuid
+from datetime import UTC, datetime
+from unittest.mock import MagicMock, patch
+
+import pytest
+from pydantic import ValidationError
+
+from api.models import AskRequest
+from api.supabase_db import build_filter_clause, build_vector_search_query, search_similar_chunks
+
+
+def test_no_filters():
+    """Test that no filters produce no SQL conditions."""
+    assert build_filter_clause(None) == ("", {})
+    assert build_filter_clause({}) == ("", {})
+
+
+def test_filter_clause_all_fields():
+    """Test that every filter becomes an indexed condition with a bound parameter."""
+    doc_id = uuid.uuid4()
+    after = datetime(2024, 1, 1, tzinfo=UTC)
+    sql, params = build_filter_clause({
+        "document_ids": [doc_id],
+        "trace_ids": ["trace1"],
+        "created_after": after,
+    })
+
+    assert "c.document_id = ANY(%(filter_document_ids)s::uuid[])" in sql
+    assert "c.trace_id = ANY(%(filter_trace_ids)s::text[])" in sql
+    assert "c.created_at >= %(filter_created_after)s" in sql
+    assert "created_before" not in sql
+    assert params["filter_document_ids"] == [str(doc_id)]
+    assert params["filter_created_after"] == after
+
+
+def test_filters_applied_inside_coarse_scan():
+    """Test that filters restrict the ANN candidate scan, not the re-ranked output."""
+    query, params = build_vector_search_query(
+        [0.1] * 1536, top_k=5, coarse_dimensions=256, filters={"trace_ids": ["t1"]}
+    )
+
+    candidates_cte = query.split("SELECT \n")[0]
+    assert "WHERE c.trace_id = ANY" in candidates_cte
+    assert params["filter_trace_ids"] == ["t1"]
+
+
+@patch("api.supabase_db.db_connection")
+def test_filtered_search_enables_iterative_scan(mock_db_connection):
+    """Test that filtered searches enable pgvector iterative scans in the same transaction."""
+    cursor = MagicMock()
+    cursor.fetchall.return_value = []
+    conn = mock_db_connection.return_value.__enter__.return_value
+    conn.cursor.return_value.__enter__.return_value = cursor
+
+    with patch.dict(os.environ, {"VECTOR_ITERATIVE_SCAN": "strict_order"}):
+        search_similar_chunks([0.1] * 1536, 5, filters={"trace_ids": ["t1"]})
+
+    statements = [c.args[0] for c in cursor.execute.call_args_list]
+    assert "hnsw.iterative_scan" in statements[0]
+    assert "trace_id = ANY" in statements[-1]
+
+
+def test_ask_request_filters_validation():
+    """Test AskRequest filter parsing and validation."""
+    request = AskRequest(
+        question="q",
+        filters={"document_ids": [str(uuid.uuid4())], "created_before": "2024-06-01T00:00:00Z"},
+    )
+    assert request.filters.model_dump(exclude_none=True).keys() == {"document_ids", "created_before"}
+
+    with pytest.raises(ValidationError):
+        AskRequest(question="q", filters={"document_ids": []})
+    with pytest.raises(ValidationError):
+        AskRequest(question="q", filters={"document_ids": ["not-a-uuid"]})
+
+
+def test_partition_pruning_bounds_from_documents():
+    """Test that document filters bound created_at by the documents' timestamps when partitioned."""
+    sql, _ = build_filter_clause({"document_ids": [uuid.uuid4()]}, prune_partitions=True)
+
+    assert "c.created_at >= (SELECT min(d.created_at) FROM documents d WHERE d.id = ANY" in sql
+    assert "c.created_at <= (SELECT max(d.created_at) FROM documents d WHERE d.id = ANY" in sql
+
+    sql, _ = build_filter_clause({"document_ids": [uuid.uuid4()]})
+    assert "min(d.created_at)" not in sql
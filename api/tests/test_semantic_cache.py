@@ -0,0 +1,132 @@
+"""Tests for the semantic retrieval cache."""
+
+import os
+import random
+import time
+from unittest.mock import patch
+
+from api import rag
+from api.semantic_cache import SemanticCache, VersionPoller
+
+DIM = 256
+
+
+def _vector(seed: int) -> list[float]:
+    rng = random.Random(seed)
+    return [rng.gauss(0, 1) for _ in range(DIM)]
+
+
+def _paraphrase(vector: list[float], noise: float = 0.1, seed: int = 99) -> list[float]:
+    rng = random.Random(seed)
+    return [v + rng.gauss(0, noise) for v in vector]
+
+
+def test_similar_embedding_hits_and_different_misses():
+    """Test that a near-identical embedding reuses the entry and an unrelated one does not."""
+    cache = SemanticCache(DIM)
+    cache.put(_vector(1), "scope", 1, "cached")
+
+    value, similarity = cache.get(_paraphrase(_vector(1)), "scope", 1)
+    assert value == "cached" and similarity >= 0.95
+
+    assert cache.get(_vector(2), "scope", 1)[0] is None
+
+
+def test_scope_and_version_separate_entries():
+    """Test that other search parameters miss and a new corpus version clears the cache."""
+    cache = SemanticCache(DIM)
+    cache.put(_vector(1), ("top_k", 5), 1, "cached")
+
+    assert cache.get(_vector(1), ("top_k", 10), 1)[0] is None
+    assert cache.get(_vector(1), ("top_k", 5), 1)[0] == "cached"
+    assert cache.get(_vector(1), ("top_k", 5), 2)[0] is None
+    assert len(cache) == 0
+
+
+def test_lru_eviction_and_ttl():
+    """Test that the least recently used entry is evicted and expired entries miss."""
+    cache = SemanticCache(DIM, max_entries=2)
+    for i in range(3):
+        cache.put(_vector(i), "scope", 1, i)
+    assert len(cache) == 2
+    assert cache.get(_vector(0), "scope", 1)[0] is None
+    assert cache.get(_vector(2), "scope", 1)[0] == 2
+
+    expiring = SemanticCache(DIM, ttl_s=0)
+    expiring.put(_vector(1), "scope", 1, "cached")
+    assert expiring.get(_vector(1), "scope", 1)[0] is None
+    assert len(expiring) == 0
+
+
+def test_version_poller_refresh_and_failure():
+    """Test that the version is re-read only after the TTL and a failed read returns None."""
+    versions = iter([1, 2])
+    poller = VersionPoller(lambda: next(versions), ttl_s=0.05)
+    assert poller.get() == 1
+    assert poller.get() == 1
+    time.sleep(0.06)
+    assert poller.get() == 2
+
+    def fail():
+        raise RuntimeError("relation corpus_state does not exist")
+
+    assert VersionPoller(fail, ttl_s=1).get() is None
+
+
+def test_search_vector_reuses_paraphrase_results():
+    """Test that a paraphrased question skips the vector search when the cache is enabled."""
+    result = ([{"chunk_id": "c1"}], [{"chunk_id": "c1"}])
+    cache = SemanticCache(DIM)
+    poller = VersionPoller(lambda: 7, ttl_s=60)
+
+    with patch.dict(os.environ, {"SEMANTIC_CACHE": "true"}), \
+            patch.object(rag, "get_semantic_cache", return_value=cache), \
+            patch.object(rag, "get_corpus_version_poller", return_value=poller), \
+            patch.object(rag, "search_similar_chunks", return_value=result) as search:
+        assert rag.search_vector(_vector(1), 5, 0.5) == result
+        assert rag.search_vector(_paraphrase(_vector(1)), 5, 0.5) == result
+        rag.search_vector(_vector(1), 5, 0.5, filters={"document_ids": ["d1"]})
+
+    assert search.call_count == 2
+
+
+def test_search_vector_bypasses_cache_without_version():
+    """Test that an unreadable corpus version falls back to a plain search."""
+    cache = SemanticCache(DIM)
+    poller = VersionPoller(lambda: None, ttl_s=60)
+
+    with patch.dict(os.environ, {"SEMANTIC_CACHE": "true"}), \
+            patch.object(rag, "get_semantic_cache", return_value=cache), \
+            patch.object(rag, "get_corpus_version_poller", return_value=poller), \
+            patch.object(rag, "search_similar_chunks", return_value=([], [])) as search:
+        rag.search_vector(_vector(1), 5, 0.5)
+        rag.search_vector(_vector(1), 5, 0.5)
+
+    assert search.call_count == 2
+    assert len(cache) == 0
+
+
+def test_hierarchical_results_are_cached_apart_and_invalidated_by_centroid_refresh():
+    """Test that hierarchical and flat searches do not share entries and a version bump drops them."""
+    flat = ([{"chunk_id": "flat"}], [])
+    hierarchical = ([{"chunk_id": "hierarchical"}], [])
+    version = {"value": 7}
+    cache = SemanticCache(DIM)
+    poller = VersionPoller(lambda: version["value"], ttl_s=0)
+
+    with patch.dict(os.environ, {"SEMANTIC_CACHE": "true"}), \
+            patch.object(rag, "get_semantic_cache", return_value=cache), \
+            patch.object(rag, "get_corpus_version_poller", return_value=poller), \
+            patch.object(rag, "search_similar_chunks", return_value=flat) as flat_search, \
+            patch.object(rag, "search_hierarchical_chunks", return_value=hierarchical) as hierarchical_search:
+        assert rag.search_vector(_vector(1), 5, 0.5) == flat
+        assert rag.search_vector(_vector(1), 5, 0.5, hierarchical=True) == hierarchical
+        assert rag.search_vector(_vector(1), 5, 0.5, hierarchical=True) == hierarchical
+        assert hierarchical_search.call_count == 1
+
+        # refresh_document_centroid bumps the version (011_document_centroids.sql trigger)
+        version["value"] = 8
+        rag.search_vector(_vector(1), 5, 0.5, hierarchical=True)
+
+    assert flat_search.call_count == 1
+    assert hierarchical_search.call_count == 2
@@ -0,0 +1,111 @@
+"""Tests for single-flight deduplication of identical /ask requests."""
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+import pytest
+
+from api import rag
+from api.admission import timeout_stage
+from api.singleflight import SingleFlight, SingleFlightTimeoutError, ask_key
+
+CHUNK = {
+    "chunk_id": "chunk1",
+    "doc_id": "doc1",
+    "content": "Refunds are available within 30 days for annual plans.",
+    "trace_id": "trace1",
+    "chunk_index": 0,
+    "similarity": 0.9,
+}
+
+
+def test_concurrent_calls_share_one_run():
+    """Test that overlapping calls with one key run fn once and all get the result."""
+    group = SingleFlight()
+    calls = []
+    release = threading.Event()
+
+    def work():
+        calls.append(1)
+        release.wait(1)
+        return "answer"
+
+    with ThreadPoolExecutor(max_workers=5) as pool:
+        futures = [pool.submit(group.do, "key", work, i) for i in range(5)]
+        time.sleep(0.05)
+        release.set()
+        results = [f.result() for f in futures]
+
+    assert len(calls) == 1
+    assert {r[0] for r in results} == {"answer"}
+    assert sum(1 for r in results if r[1]) == 4
+    assert group.in_flight() == 0
+
+
+def test_leader_error_reaches_followers():
+    """Test that followers receive the leader's exception and the key is released."""
+    group = SingleFlight()
+    started = threading.Event()
+
+    def fail():
+        started.set()
+        time.sleep(0.05)
+        raise ValueError("boom")
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(group.do, "key", fail)
+        started.wait(1)
+        follower = pool.submit(group.do, "key", fail)
+        for future in (leader, follower):
+            with pytest.raises(ValueError):
+                future.result()
+
+    assert group.do("key", lambda: "next") == ("next", False, None)
+
+
+def test_follower_stops_waiting_after_its_timeout():
+    """Test that a follower of a stuck leader raises SingleFlightTimeoutError at its timeout."""
+    group = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def stuck():
+        started.set()
+        release.wait(1)
+        return "late"
+
+    with ThreadPoolExecutor(max_workers=2) as pool:
+        leader = pool.submit(group.do, "key", stuck)
+        started.wait(1)
+        start = time.perf_counter()
+        with pytest.raises(SingleFlightTimeoutError):
+            group.do("key", stuck, timeout=0.05)
+        assert time.perf_counter() - start < 0.5
+        release.set()
+        assert leader.result() == ("late", False, None)
+
+    assert timeout_stage(SingleFlightTimeoutError()) == "single_flight"
+
+
+def test_ask_key_normalization():
+    """Test that case, whitespace and filter list order do not change the key."""
+    assert ask_key("What  is AI?", 5, None) == ask_key(" what is ai? ", 5, None)
+    assert ask_key("q", 5, {"document_ids": ["b", "a"]}) == ask_key("q", 5, {"document_ids": ["a", "b"]})
+    assert ask_key("q", 5, None) != ask_key("q", 10, None)
+
+
+def test_identical_questions_embed_once_with_own_trace_ids():
+    """Test that concurrent identical questions hit the provider and DB once."""
+    def slow_embedding(text, timeout=None):
+        time.sleep(0.1)
+        return [0.1] * 1536
+
+    with patch.object(rag, "get_embedding", side_effect=slow_embedding) as embed, \
+            patch.object(rag, "search_similar_chunks", return_value=([CHUNK], [CHUNK])) as search:
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            results = list(pool.map(lambda _: rag.answer_question("What is the refund policy?", 5), range(8)))
+
+    assert embed.call_count == 1 and search.call_count == 1
+    assert len({r["trace_id"] for r in results}) == 8
+    assert {r["answer"] for r in results} == {results[0]["answer"]}
@@ -0,0 +1,110 @@
+"""Tests for app startup, warm-up and the readiness probe."""
+
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+from fastapi.testclient import TestClient
+
+from api import startup
+from api.main import app
+
+ROOT = Path(__file__).resolve().parents[2]
+ENV = {"S3_BUCKET_NAME": "test-bucket", "AWS_REGION": "us-east-1"}
+
+
+def _components(**warm_functions):
+    return {name: startup.Component(name, warm) for name, warm in warm_functions.items()}
+
+
+def test_import_has_no_startup_side_effects():
+    """Test that importing the app needs no config and does not load boto3."""
+    env = {k: v for k, v in os.environ.items() if k != "S3_BUCKET_NAME"}
+    output = subprocess.run(
+        [sys.executable, "-c", "import sys, api.main; print('boto3' in sys.modules)"],
+        cwd=ROOT, env=env, capture_output=True, text=True, check=True,
+    ).stdout
+    assert output.strip() == "False"
+
+
+@patch("api.main.close_pool")
+def test_ready_after_blocking_warmup(mock_close_pool):
+    """Test that /ready returns 200 once every component is warm."""
+    components = _components(s3_client=lambda: None, db_pool=lambda: None)
+    with patch.dict(os.environ, {**ENV, "STARTUP_WARMUP": "blocking"}), \
+            patch.dict(startup._components, components, clear=True):
+        with TestClient(app) as client:
+            response = client.get("/ready")
+
+    assert response.status_code == 200
+    assert response.json()["ready"] is True
+    assert response.json()["components"]["db_pool"]["status"] == "ready"
+    mock_close_pool.assert_called_once()
+
+
+@patch("api.main.close_pool")
+def test_ready_reports_failed_component(mock_close_pool):
+    """Test that a failed warm-up makes /ready return 503 with the error."""
+    def broken():
+        raise ConnectionError("db unreachable")
+
+    components = _components(s3_client=lambda: None, db_pool=broken)
+    with patch.dict(os.environ, {**ENV, "STARTUP_WARMUP": "blocking"}), \
+            patch.dict(startup._components, components, clear=True):
+        with TestClient(app) as client:
+            response = client.get("/ready")
+            health = client.get("/health")
+
+    assert response.status_code == 503
+    assert response.json()["components"]["db_pool"] == {
+        "status": "failed",
+        "duration_ms": response.json()["components"]["db_pool"]["duration_ms"],
+        "error": "db unreachable",
+    }
+    assert health.status_code == 200
+
+
+@patch("api.main.close_pool")
+def test_failed_component_is_retried_by_ready_probe(mock_close_pool):
+    """Test that a component that failed warm-up becomes ready once its dependency recovers."""
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise ConnectionError("db unreachable")
+
+    components = _components(db_pool=flaky)
+    with patch.dict(os.environ, {**ENV, "STARTUP_WARMUP": "blocking"}), \
+            patch.dict(startup._components, components, clear=True), \
+            patch.object(startup, "RETRY_BASE_S", 0.0):
+        with TestClient(app) as client:
+            statuses = [client.get("/ready").status_code]
+            deadline = time.monotonic() + 2
+            while statuses[-1] != 200 and time.monotonic() < deadline:
+                time.sleep(0.01)
+                statuses.append(client.get("/ready").status_code)
+
+    assert statuses[0] == 503 and statuses[-1] == 200
+    assert len(attempts) == 2
+    assert components["db_pool"].failures == 0
+
+
+@patch("api.main.close_pool")
+def test_background_warmup_is_concurrent(mock_close_pool):
+    """Test that background warm-up serves immediately and warms components in parallel."""
+    components = _components(a=lambda: time.sleep(0.2), b=lambda: time.sleep(0.2), c=lambda: time.sleep(0.2))
+    with patch.dict(os.environ, {**ENV, "STARTUP_WARMUP": "background"}), \
+            patch.dict(startup._components, components, clear=True):
+        with TestClient(app) as client:
+            assert client.get("/ready").status_code == 503
+            start = time.perf_counter()
+            while client.get("/ready").status_code != 200:
+                assert time.perf_counter() - start < 2
+                time.sleep(0.02)
+            elapsed = time.perf_counter() - start
+
+    assert elapsed < 0.5
@@ -0,0 +1,80 @@
+"""Tests for trace_id-linked timing spans."""
+
+import os
+import uuid
+from unittest.mock import MagicMock, patch
+
+import pytest
+
+from worker.ingest import ingest_document
+from worker.tracing import otel_trace_id, read_spans, span, summarize_trace
+
+
+def test_otel_trace_id_from_uuid():
+    """Test that a UUID trace_id maps to the same 128-bit OTel trace ID."""
+    trace_id = str(uuid.uuid4())
+    assert otel_trace_id(trace_id) == uuid.UUID(trace_id).hex
+    assert len(otel_trace_id("not-a-uuid")) == 32
+
+
+def test_spans_disabled_by_default(tmp_path):
+    """Test that no spans are exported unless TRACE_EXPORTER is set."""
+    path = tmp_path / "spans.jsonl"
+    with patch.dict(os.environ, {"TRACE_FILE": str(path)}):
+        os.environ.pop("TRACE_EXPORTER", None)
+        with span("ask", trace_id=str(uuid.uuid4())):
+            pass
+    assert not path.exists()
+
+
+def test_nested_spans_exported_as_otlp(tmp_path):
+    """Test that child spans inherit the trace and link to their parent."""
+    path = tmp_path / "spans.jsonl"
+    trace_id = str(uuid.uuid4())
+
+    with patch.dict(os.environ, {"TRACE_EXPORTER": "file", "TRACE_FILE": str(path)}):
+        with span("ingest", trace_id=trace_id):
+            with span("chunking", chunk_count=3):
+                pass
+            with pytest.raises(RuntimeError):
+                with span("db_insert"):
+                    raise RuntimeError("boom")
+
+    spans = {s["name"]: s for s in read_spans(str(path))}
+    assert set(spans) == {"ingest", "chunking", "db_insert"}
+    assert spans["chunking"]["parent_span_id"] == spans["ingest"]["span_id"]
+    assert spans["chunking"]["attributes"]["chunk_count"] == "3"
+    assert spans["db_insert"]["error"] is True
+    assert all(s["trace_id"] == trace_id for s in spans.values())
+
+    summary = summarize_trace(list(spans.values()), trace_id)
+    assert summary["spans"][0]["name"] == "ingest"
+    assert summary["end_to_end_ms"] >= summary["spans"][1]["duration_ms"]
+
+
+@patch("worker.ingest.insert_chunks")
+@patch("worker.ingest.insert_document")
+@patch("worker.ingest.get_s3_client")
+def test_ingest_records_stage_spans(mock_get_s3_client, mock_insert_document, mock_insert_chunks, tmp_path):
+    """Test that ingest_document emits a span per stage and per embedding batch."""
+    path = tmp_path / "spans.jsonl"
+    trace_id = str(uuid.uuid4())
+    body = MagicMock()
+    body.read.return_value = ("Sentence about machine learning. " * 200).encode()
+    mock_get_s3_client.return_value.get_object.return_value = {"Body": body}
+    mock_insert_document.return_value = "doc1"
+    mock_insert_chunks.return_value = 0
+
+    env = {
+        "TRACE_EXPORTER": "file",
+        "TRACE_FILE": str(path),
+        "EMBEDDING_MODE": "fake",
+        "EMBEDDING_BATCH_SIZE": "4",
+    }
+    with patch.dict(os.environ, env):
+        ingest_document("bucket", f"uploads/2024/01/01/{trace_id}/doc.txt")
+
+    chunk_count = len(mock_insert_chunks.call_args.args[2])
+    names = [s["name"] for s in read_spans(str(path)) if s["trace_id"] == trace_id]
+    assert {"ingest", "s3_download", "insert_document", "chunking", "db_insert"} <= set(names)
+    assert names.count("embedding_batch") == -(-chunk_count // 4)
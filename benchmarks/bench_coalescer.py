@@ -0,0 +1,116 @@
+"""Benchmark question-embedding coalescing: provider round trips and added latency.
+
+Open-loop Poisson arrivals at each --qps call embed() from a thread pool, as
+/ask worker threads do. The provider is a stand-in that sleeps for a fixed
+round-trip latency plus a small per-text cost and counts calls. Reports
+provider calls per request and caller latency percentiles, for direct calls
+(window 0) and coalesced calls.
+
+Usage:
+    python -m benchmarks.bench_coalescer
+    python -m benchmarks.bench_coalescer --qps 10 100 1000 --window-ms 2 --provider-latency-ms 40
+"""
+
+import argparse
+import json
+import random
+import statistics
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from api.coalescer import EmbeddingCoalescer
+
+
+class StubProvider:
+    """Batch embedder that sleeps like a network round trip and counts calls."""
+
+    def __init__(self, latency_ms: float, per_text_ms: float):
+        self.latency_s = latency_ms / 1000
+        self.per_text_s = per_text_ms / 1000
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, texts: list[str], timeout: float | None = None) -> list[list[float]]:
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency_s + self.per_text_s * len(texts))
+        return [[float(len(text))] * 8 for text in texts]
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def run_step(qps: float, duration: float, window_ms: float, args) -> dict:
+    provider = StubProvider(args.provider_latency_ms, args.per_text_ms)
+    if window_ms > 0:
+        coalescer = EmbeddingCoalescer(provider, window_ms / 1000, args.max_batch, args.max_inflight)
+        embed = coalescer.embed
+    else:
+        def embed(text, timeout=None):
+            return provider([text], timeout)[0]
+
+    latencies: list[float] = []
+    lock = threading.Lock()
+
+    def one(i: int):
+        start = time.perf_counter()
+        embed(f"question {i % 50}")
+        with lock:
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    rng = random.Random(0)
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        start = time.perf_counter()
+        next_at = start
+        i = 0
+        while next_at < start + duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(one, i)
+            i += 1
+            next_at += rng.expovariate(qps)
+
+    latencies.sort()
+    return {
+        "qps": qps,
+        "window_ms": window_ms,
+        "requests": len(latencies),
+        "provider_calls": provider.calls,
+        "calls_per_request": provider.calls / len(latencies),
+        "p50_ms": statistics.median(latencies),
+        "p99_ms": _percentile(latencies, 99),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark question-embedding coalescing")
+    parser.add_argument("--qps", type=float, nargs="+", default=[10, 100, 500])
+    parser.add_argument("--duration", type=float, default=3.0, help="Seconds per step")
+    parser.add_argument("--window-ms", type=float, default=2.0)
+    parser.add_argument("--max-batch", type=int, default=32)
+    parser.add_argument("--max-inflight", type=int, default=4)
+    parser.add_argument("--provider-latency-ms", type=float, default=40.0)
+    parser.add_argument("--per-text-ms", type=float, default=0.2)
+    parser.add_argument("--threads", type=int, default=256, help="Caller threads (like the /ask executor)")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    steps = [run_step(qps, args.duration, window, args) for qps in args.qps for window in (0, args.window_ms)]
+    if args.json:
+        print(json.dumps(steps, indent=2))
+        return
+
+    print(f"provider latency {args.provider_latency_ms} ms + {args.per_text_ms} ms/text")
+    print(f"{'qps':>8}{'window':>8}{'reqs':>8}{'calls':>8}{'calls/req':>11}{'p50ms':>9}{'p99ms':>9}")
+    for s in steps:
+        print(
+            f"{s['qps']:>8.0f}{s['window_ms']:>8.1f}{s['requests']:>8}{s['provider_calls']:>8}"
+            f"{s['calls_per_request']:>11.3f}{s['p50_ms']:>9.1f}{s['p99_ms']:>9.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
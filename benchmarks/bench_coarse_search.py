@@ -0,0 +1,146 @@
+"""Latency vs recall benchmark for two-stage (coarse + re-rank) vector search.
+
+Samples existing chunk embeddings from the configured Supabase database as query
+vectors, computes exact top_k results with a sequential scan over the full
+embedding, and compares them against the two-stage query for several candidate
+multipliers.
+
+Usage:
+    python -m benchmarks.bench_coarse_search --queries 50 --top-k 10 --multipliers 1 2 4 8
+
+Requires migration 003_coarse_embedding.sql and EMBEDDING_COARSE_DIMENSIONS
+matching the column size.
+"""
+
+import argparse
+import json
+import statistics
+import time
+
+from api.deps import load_env
+from api.supabase_db import build_vector_search_query, get_db_connection
+from worker.embeddings import get_coarse_dimensions
+
+
+def _sample_query_embeddings(conn, count: int) -> list[list[float]]:
+    """Sample random chunk embeddings to use as query vectors."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT embedding::text FROM chunks ORDER BY random() LIMIT %s", (count,))
+        # pgvector text format '[v1,v2,...]' is valid JSON
+        return [json.loads(row[0]) for row in cur.fetchall()]
+
+
+def _run_query(conn, query: str, params: dict, exact: bool = False) -> tuple[list[str], float]:
+    """Run a search query and return (chunk_ids, elapsed_ms)."""
+    with conn.cursor() as cur:
+        if exact:
+            # Force a sequential scan so the baseline is exact, not ANN
+            cur.execute("SET LOCAL enable_indexscan = off")
+        start = time.perf_counter()
+        cur.execute(query, params)
+        rows = cur.fetchall()
+        elapsed_ms = (time.perf_counter() - start) * 1000
+    conn.rollback()
+    return [str(row[0]) for row in rows], elapsed_ms
+
+
+def _percentile(values: list[float], pct: float) -> float:
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def run_benchmark(queries: int, top_k: int, multipliers: list[int]) -> dict:
+    """Run the benchmark and return results as a dict."""
+    coarse_dimensions = get_coarse_dimensions()
+    if not coarse_dimensions:
+        raise ValueError("EMBEDDING_COARSE_DIMENSIONS must be set to benchmark two-stage search")
+
+    conn = get_db_connection()
+    try:
+        embeddings = _sample_query_embeddings(conn, queries)
+        if not embeddings:
+            raise ValueError("No chunks found; ingest documents before benchmarking")
+
+        # Exact baseline over the full embedding
+        truth = []
+        exact_latencies = []
+        for embedding in embeddings:
+            query, params = build_vector_search_query(embedding, top_k)
+            ids, elapsed_ms = _run_query(conn, query, params, exact=True)
+            truth.append(set(ids))
+            exact_latencies.append(elapsed_ms)
+
+        results = {
+            "queries": len(embeddings),
+            "top_k": top_k,
+            "coarse_dimensions": coarse_dimensions,
+            "exact": {
+                "p50_ms": statistics.median(exact_latencies),
+                "p95_ms": _percentile(exact_latencies, 95),
+            },
+            "two_stage": [],
+        }
+
+        for multiplier in multipliers:
+            latencies = []
+            recalls = []
+            for embedding, expected in zip(embeddings, truth):
+                query, params = build_vector_search_query(
+                    embedding,
+                    top_k,
+                    coarse_dimensions=coarse_dimensions,
+                    candidate_multiplier=multiplier,
+                )
+                ids, elapsed_ms = _run_query(conn, query, params)
+                latencies.append(elapsed_ms)
+                if expected:
+                    recalls.append(len(expected.intersection(ids)) / len(expected))
+
+            results["two_stage"].append({
+                "candidate_multiplier": multiplier,
+                "p50_ms": statistics.median(latencies),
+                "p95_ms": _percentile(latencies, 95),
+                "recall_at_k": statistics.mean(recalls) if recalls else 0.0,
+            })
+
+        return results
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark two-stage vector search")
+    parser.add_argument("--queries", type=int, default=50, help="Number of sampled queries")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query")
+    parser.add_argument(
+        "--multipliers",
+        type=int,
+        nargs="+",
+        default=[1, 2, 4, 8],
+        help="Coarse candidate multipliers to compare",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    load_env()
+
+    results = run_benchmark(args.queries, args.top_k, args.multipliers)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"queries={results['queries']} top_k={results['top_k']} "
+        f"coarse_dimensions={results['coarse_dimensions']}"
+    )
+    print(f"{'mode':<16}{'p50 ms':>10}{'p95 ms':>10}{'recall@k':>10}")
+    exact = results["exact"]
+    print(f"{'exact (seqscan)':<16}{exact['p50_ms']:>10.2f}{exact['p95_ms']:>10.2f}{1.0:>10.3f}")
+    for row in results["two_stage"]:
+        label = f"coarse x{row['candidate_multiplier']}"
+        print(f"{label:<16}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['recall_at_k']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
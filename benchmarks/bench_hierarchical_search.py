@@ -0,0 +1,139 @@
+"""Latency vs recall benchmark for hierarchical (document centroid) retrieval.
+
+Samples existing chunk embeddings from the configured Supabase database as query
+vectors, computes exact top_k results with a sequential scan over all chunks,
+and compares them against the default ANN query and the hierarchical query
+(documents by centroid, then their chunks) for several top-document counts.
+Hierarchical latency should follow the number of chunks in the selected
+documents rather than the total number of chunks.
+
+Usage:
+    python -m benchmarks.bench_hierarchical_search --queries 50 --top-k 10 --top-documents 5 10 20 50
+
+Requires migration 011_document_centroids.sql (centroids backfilled or
+maintained with DOCUMENT_CENTROIDS=true).
+"""
+
+import argparse
+import json
+import statistics
+
+from api.deps import load_env
+from api.supabase_db import (
+    build_hierarchical_search_query,
+    build_vector_search_query,
+    chunks_partitioned,
+    get_db_connection,
+)
+from benchmarks.bench_coarse_search import _percentile, _run_query, _sample_query_embeddings
+
+
+def run_benchmark(queries: int, top_k: int, top_documents: list[int]) -> dict:
+    """Run the benchmark and return results as a dict."""
+    conn = get_db_connection()
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT count(*), count(centroid) FROM documents")
+            documents, with_centroid = cur.fetchone()
+            cur.execute("SELECT count(*) FROM chunks")
+            chunks = cur.fetchone()[0]
+        conn.rollback()
+        if not with_centroid:
+            raise ValueError("No document centroids; run 011_document_centroids.sql before benchmarking")
+
+        embeddings = _sample_query_embeddings(conn, queries)
+
+        # Exact baseline over every chunk
+        truth = []
+        exact_latencies = []
+        ann_latencies = []
+        ann_recalls = []
+        for embedding in embeddings:
+            query, params = build_vector_search_query(embedding, top_k)
+            ids, elapsed_ms = _run_query(conn, query, params, exact=True)
+            truth.append(set(ids))
+            exact_latencies.append(elapsed_ms)
+            ids, elapsed_ms = _run_query(conn, query, params)
+            ann_latencies.append(elapsed_ms)
+            if truth[-1]:
+                ann_recalls.append(len(truth[-1].intersection(ids)) / len(truth[-1]))
+
+        results = {
+            "queries": len(embeddings),
+            "top_k": top_k,
+            "documents": documents,
+            "documents_with_centroid": with_centroid,
+            "chunks": chunks,
+            "exact": {
+                "p50_ms": statistics.median(exact_latencies),
+                "p95_ms": _percentile(exact_latencies, 95),
+            },
+            "ann": {
+                "p50_ms": statistics.median(ann_latencies),
+                "p95_ms": _percentile(ann_latencies, 95),
+                "recall_at_k": statistics.mean(ann_recalls) if ann_recalls else 0.0,
+            },
+            "hierarchical": [],
+        }
+
+        for count in top_documents:
+            latencies = []
+            recalls = []
+            for embedding, expected in zip(embeddings, truth):
+                query, params = build_hierarchical_search_query(
+                    embedding, top_k, top_documents=count, prune_partitions=chunks_partitioned()
+                )
+                ids, elapsed_ms = _run_query(conn, query, params)
+                latencies.append(elapsed_ms)
+                if expected:
+                    recalls.append(len(expected.intersection(ids)) / len(expected))
+
+            results["hierarchical"].append({
+                "top_documents": count,
+                "p50_ms": statistics.median(latencies),
+                "p95_ms": _percentile(latencies, 95),
+                "recall_at_k": statistics.mean(recalls) if recalls else 0.0,
+            })
+
+        return results
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark hierarchical (document centroid) retrieval")
+    parser.add_argument("--queries", type=int, default=50, help="Number of sampled queries")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query")
+    parser.add_argument(
+        "--top-documents",
+        type=int,
+        nargs="+",
+        default=[5, 10, 20, 50],
+        help="Documents kept by the centroid stage",
+    )
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+    load_env()
+
+    results = run_benchmark(args.queries, args.top_k, args.top_documents)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(
+        f"queries={results['queries']} top_k={results['top_k']} documents={results['documents']} "
+        f"(with centroid {results['documents_with_centroid']}) chunks={results['chunks']}"
+    )
+    print(f"{'mode':<18}{'p50 ms':>10}{'p95 ms':>10}{'recall@k':>10}")
+    exact = results["exact"]
+    print(f"{'exact (seqscan)':<18}{exact['p50_ms']:>10.2f}{exact['p95_ms']:>10.2f}{1.0:>10.3f}")
+    ann = results["ann"]
+    print(f"{'ann (chunks)':<18}{ann['p50_ms']:>10.2f}{ann['p95_ms']:>10.2f}{ann['recall_at_k']:>10.3f}")
+    for row in results["hierarchical"]:
+        label = f"top {row['top_documents']} docs"
+        print(f"{label:<18}{row['p50_ms']:>10.2f}{row['p95_ms']:>10.2f}{row['recall_at_k']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
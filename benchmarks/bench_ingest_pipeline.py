@@ -0,0 +1,110 @@
+"""Benchmark pipelined vs sequential ingest of one large document.
+
+Runs the real ingest_document with S3, the document insert, the embedding
+provider and the chunk inserts replaced by stand-ins that sleep like network
+round trips: --embed-ms per embedding request and --insert-ms plus
+--insert-ms-per-chunk per chunk insert. Checkpoints are on (with the
+ingest_jobs calls stubbed out), since only then are chunks inserted while
+later batches are embedded. Compares INGEST_PIPELINE_DEPTH=0
+(embed, then insert, one after the other) with pipelined depths, and reports
+end-to-end time against the sum and the slowest of the stage times, plus the
+pipeline queue stats. No database, S3 or network access is needed.
+
+Usage:
+    python -m benchmarks.bench_ingest_pipeline
+    python -m benchmarks.bench_ingest_pipeline --chunks 2000 --embed-ms 150 --insert-ms 80 --depths 0 1 2 4
+"""
+
+import argparse
+import json
+import os
+import time
+import uuid
+from unittest.mock import MagicMock, patch
+
+from worker.ingest import ingest_document
+
+
+def _document(chunks: int) -> bytes:
+    # One ~800-character paragraph per line; chunk_text yields about one chunk per paragraph
+    paragraph = ("Retrieval pipelines embed document chunks and store them for vector search. " * 10).strip()
+    return ("\n".join([paragraph] * chunks)).encode()
+
+
+def run(depth: int, body: bytes, args) -> dict:
+    def embed(texts, stats=None):
+        time.sleep(args.embed_ms / 1000)
+        return [[0.0] * 8 for _ in texts]
+
+    def insert(doc_id, trace_id, chunks, embeddings, **kwargs):
+        time.sleep((args.insert_ms + args.insert_ms_per_chunk * len(chunks)) / 1000)
+        return 0
+
+    s3_body = MagicMock()
+    s3_body.read.return_value = body
+    s3 = MagicMock()
+    s3.get_object.return_value = {"Body": s3_body, "ETag": '"bench"'}
+    env = {
+        "INGEST_PIPELINE_DEPTH": str(depth),
+        "INGEST_CHECKPOINT_CHUNKS": str(args.insert_chunks),
+        "EMBEDDING_BATCH_SIZE": str(args.batch_size),
+        "INGEST_CHECKPOINTS": "true",
+        "SLOW_INGEST_MS": "0",
+        "TRACE_EXPORTER": "none",
+    }
+    with patch.dict(os.environ, env), \
+            patch("worker.ingest.get_s3_client", return_value=s3), \
+            patch("worker.ingest.insert_document", return_value="doc1"), \
+            patch("worker.ingest.get_ingest_job", return_value=None), \
+            patch("worker.ingest.save_ingest_job"), \
+            patch("worker.ingest.update_ingest_job"), \
+            patch("worker.ingest.get_embeddings", side_effect=embed), \
+            patch("worker.ingest.insert_chunks", side_effect=insert):
+        summary = ingest_document("bucket", f"uploads/2024/01/01/{uuid.uuid4()}/big.txt")
+
+    stage_ms = summary["stage_ms"]
+    return {
+        "depth": depth,
+        "chunks": summary["chunk_count"],
+        "total_ms": summary["total_ms"],
+        "embedding_ms": stage_ms.get("embedding", 0.0),
+        "db_insert_ms": stage_ms.get("db_insert", 0.0),
+        "queues": summary["queues"],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark pipelined vs sequential ingest")
+    parser.add_argument("--chunks", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=64, help="EMBEDDING_BATCH_SIZE")
+    parser.add_argument("--insert-chunks", type=int, default=128, help="INGEST_CHECKPOINT_CHUNKS (chunks per insert)")
+    parser.add_argument("--embed-ms", type=float, default=100.0, help="Latency of one embedding request")
+    parser.add_argument("--insert-ms", type=float, default=60.0, help="Fixed latency of one chunk insert")
+    parser.add_argument("--insert-ms-per-chunk", type=float, default=0.3)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 2])
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    body = _document(args.chunks)
+    results = [run(depth, body, args) for depth in args.depths]
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{'depth':>6}{'chunks':>8}{'total ms':>10}{'embed ms':>10}{'insert ms':>11}{'sum ms':>9}{'max ms':>9}")
+    for r in results:
+        stage_sum = r["embedding_ms"] + r["db_insert_ms"]
+        stage_max = max(r["embedding_ms"], r["db_insert_ms"])
+        print(
+            f"{r['depth']:>6}{r['chunks']:>8}{r['total_ms']:>10.0f}{r['embedding_ms']:>10.0f}"
+            f"{r['db_insert_ms']:>11.0f}{stage_sum:>9.0f}{stage_max:>9.0f}"
+        )
+        for name, queue in r["queues"].items():
+            print(
+                f"{'':>6}  {name} queue: max depth {queue['max_depth']}, mean {queue['mean_depth']}, "
+                f"producer blocked {queue['producer_blocked_ms']:.0f} ms, consumer idle {queue['consumer_idle_ms']:.0f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
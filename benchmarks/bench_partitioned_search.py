@@ -0,0 +1,171 @@
+"""Monolithic vs monthly-partitioned chunks table benchmark.
+
+Seeds synthetic chunks (random vectors spread over N months) into a scratch
+schema, builds HNSW indexes on a monolithic table and on a partitioned copy, and
+times date-scoped and unscoped similarity queries against both. Index build time
+is reported too, since per-partition builds are what keep reindexing from
+locking the whole table.
+
+Usage:
+    python -m benchmarks.bench_partitioned_search --rows 1000000 --months 12 --dimensions 128
+
+The scratch schema (bench_partitioning) is dropped and recreated on every run.
+Seeding 1M rows takes several minutes and a few GB of disk at 128 dimensions.
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from datetime import date
+
+from api.deps import load_env
+from api.supabase_db import get_db_connection
+
+SCHEMA = "bench_partitioning"
+
+
+def _month_start(months_back: int) -> date:
+    today = date.today().replace(day=1)
+    year, month = divmod(today.year * 12 + today.month - 1 - months_back, 12)
+    return date(year, month + 1, 1)
+
+
+def _timed_execute(conn, sql: str, params: tuple | None = None) -> float:
+    start = time.perf_counter()
+    with conn.cursor() as cur:
+        cur.execute(sql, params)
+    conn.commit()
+    return time.perf_counter() - start
+
+
+def setup(conn, rows: int, months: int, dimensions: int) -> dict:
+    """Create and seed the monolithic and partitioned tables. Returns setup timings."""
+    timings = {}
+    _timed_execute(conn, f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    _timed_execute(conn, f"CREATE SCHEMA {SCHEMA}")
+
+    columns = f"""
+        id BIGINT NOT NULL,
+        created_at TIMESTAMPTZ NOT NULL,
+        embedding vector({dimensions}) NOT NULL
+    """
+    _timed_execute(conn, f"CREATE TABLE {SCHEMA}.mono ({columns})")
+    _timed_execute(
+        conn,
+        f"CREATE TABLE {SCHEMA}.parted ({columns}) PARTITION BY RANGE (created_at)",
+    )
+    for m in range(months):
+        start = _month_start(m)
+        end = _month_start(m - 1)
+        _timed_execute(
+            conn,
+            f"CREATE TABLE {SCHEMA}.parted_{m} PARTITION OF {SCHEMA}.parted "
+            f"FOR VALUES FROM (%s) TO (%s)",
+            (start, end),
+        )
+
+    # Random unit-ish vectors; the inner generate_series references g so it is
+    # evaluated per row instead of once
+    timings["seed_s"] = _timed_execute(
+        conn,
+        f"""
+        INSERT INTO {SCHEMA}.mono (id, created_at, embedding)
+        SELECT
+            g,
+            date_trunc('month', NOW()) - (g %% %s) * INTERVAL '1 month' + INTERVAL '1 day',
+            (SELECT array_agg(random() - 0.5 + g * 0) FROM generate_series(1, %s))::vector
+        FROM generate_series(1, %s) g
+        """,
+        (months, dimensions, rows),
+    )
+    timings["copy_s"] = _timed_execute(
+        conn, f"INSERT INTO {SCHEMA}.parted SELECT * FROM {SCHEMA}.mono"
+    )
+    for table in ("mono", "parted"):
+        _timed_execute(conn, f"CREATE INDEX ON {SCHEMA}.{table} (created_at)")
+        timings[f"{table}_hnsw_build_s"] = _timed_execute(
+            conn,
+            f"CREATE INDEX ON {SCHEMA}.{table} USING hnsw (embedding vector_cosine_ops)",
+        )
+    # Rebuilding a single month is what a per-partition index buys
+    timings["one_partition_reindex_s"] = _timed_execute(
+        conn, f"REINDEX TABLE {SCHEMA}.parted_0"
+    )
+    _timed_execute(conn, f"ANALYZE {SCHEMA}.mono")
+    _timed_execute(conn, f"ANALYZE {SCHEMA}.parted")
+    return timings
+
+
+def _query_latencies(conn, table: str, vectors: list[str], top_k: int, month_scoped: bool) -> list[float]:
+    where = ""
+    params_extra: tuple = ()
+    if month_scoped:
+        where = "WHERE created_at >= %s AND created_at < %s"
+        params_extra = (_month_start(0), _month_start(-1))
+
+    sql = f"""
+        SELECT id FROM {SCHEMA}.{table}
+        {where}
+        ORDER BY embedding <=> %s::vector
+        LIMIT %s
+    """
+    latencies = []
+    with conn.cursor() as cur:
+        # Keep filtered ANN scans from returning short result sets (pgvector >= 0.8)
+        cur.execute("SET hnsw.iterative_scan = strict_order")
+        for vector in vectors:
+            start = time.perf_counter()
+            cur.execute(sql, (*params_extra, vector, top_k))
+            cur.fetchall()
+            latencies.append((time.perf_counter() - start) * 1000)
+    conn.rollback()
+    return latencies
+
+
+def run_benchmark(rows: int, months: int, dimensions: int, queries: int, top_k: int, skip_setup: bool) -> dict:
+    conn = get_db_connection()
+    try:
+        results: dict = {"rows": rows, "months": months, "dimensions": dimensions, "top_k": top_k}
+        if not skip_setup:
+            results["setup"] = setup(conn, rows, months, dimensions)
+
+        vectors = [
+            "[" + ",".join(str(random.random() - 0.5) for _ in range(dimensions)) + "]"
+            for _ in range(queries)
+        ]
+        results["queries"] = {}
+        for table in ("mono", "parted"):
+            for month_scoped in (False, True):
+                latencies = _query_latencies(conn, table, vectors, top_k, month_scoped)
+                label = f"{table}_{'current_month' if month_scoped else 'all_months'}"
+                ordered = sorted(latencies)
+                results["queries"][label] = {
+                    "p50_ms": statistics.median(latencies),
+                    "p95_ms": ordered[min(len(ordered) - 1, int(0.95 * (len(ordered) - 1)))],
+                }
+        return results
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark partitioned vs monolithic chunks tables")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic chunks to seed")
+    parser.add_argument("--months", type=int, default=12, help="Monthly partitions to spread rows over")
+    parser.add_argument("--dimensions", type=int, default=128, help="Vector dimensions")
+    parser.add_argument("--queries", type=int, default=50, help="Queries per scenario")
+    parser.add_argument("--top-k", type=int, default=10, help="Results per query")
+    parser.add_argument("--skip-setup", action="store_true", help="Reuse the existing scratch schema")
+    args = parser.parse_args()
+    load_env()
+
+    results = run_benchmark(
+        args.rows, args.months, args.dimensions, args.queries, args.top_k, args.skip_setup
+    )
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,109 @@
+"""Benchmark /ask response encoding: serialization CPU and bytes on the wire.
+
+Builds a top_k answer with answer_question (retrieval and embedding stubbed)
+over text with a realistic vocabulary, then times each encoding path and
+reports the encoded size. No database, S3 or network access is needed.
+
+Usage:
+    python -m benchmarks.bench_responses
+    python -m benchmarks.bench_responses --top-k 20 --json
+"""
+
+import argparse
+import json
+import random
+import sys
+from unittest.mock import patch
+
+from api.models import AskResponse
+from api.responses import ask_payload, brotli, compress, dumps, orjson
+from benchmarks.microbench import time_case
+from worker.chunking import chunk_text
+
+WORDS = (
+    "the of and to in is that for it as with was on be by this are from or an at which not have "
+    "retrieval embedding vector index query document chunk score latency throughput cache memory "
+    "model token context answer citation database storage upload request response pipeline worker "
+    "system data value result process performance network server client batch stream buffer"
+).split()
+
+
+def _corpus_text(size_chars: int, seed: int = 0) -> str:
+    """Pseudo-English text (Zipf-ish word choice, sentences) that compresses like prose."""
+    rng = random.Random(seed)
+    weights = [1 / (rank + 1) for rank in range(len(WORDS))]
+    sentences = []
+    length = 0
+    while length < size_chars:
+        words = rng.choices(WORDS, weights=weights, k=rng.randint(8, 20))
+        sentence = " ".join(words).capitalize() + ". "
+        sentences.append(sentence)
+        length += len(sentence)
+    return "".join(sentences)[:size_chars]
+
+
+def build_result(top_k: int) -> dict:
+    """answer_question output for top_k adjacent chunks of one document."""
+    from api import rag
+
+    chunks = chunk_text(_corpus_text(top_k * 1000))[:top_k]
+    rows = [
+        {
+            "chunk_id": f"00000000-0000-0000-0000-{i:012d}",
+            "doc_id": "11111111-1111-1111-1111-111111111111",
+            "content": content,
+            "trace_id": "22222222-2222-2222-2222-222222222222",
+            "chunk_index": i,
+            "similarity": 0.9 - i * 0.001,
+        }
+        for i, content in enumerate(chunks)
+    ]
+    with patch.object(rag, "search_similar_chunks", return_value=(rows, rows)), \
+            patch.object(rag, "get_embedding", return_value=[0.1] * 1536):
+        return rag.answer_question("What is machine learning?", top_k=top_k)
+
+
+def encoders(result: dict) -> dict:
+    """name -> zero-argument callable returning the bytes sent for result."""
+    cases = {
+        "pydantic_json": lambda: AskResponse(**result).model_dump_json().encode("utf-8"),
+        "fast_json": lambda: dumps(ask_payload(result)),
+        "fast_json+gzip": lambda: compress(dumps(ask_payload(result)), "gzip"),
+    }
+    if brotli is not None:
+        cases["fast_json+br"] = lambda: compress(dumps(ask_payload(result)), "br")
+    return cases
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /ask response serialization and compression")
+    parser.add_argument("--top-k", type=int, default=20)
+    parser.add_argument("--min-time", type=float, default=0.2)
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    result = build_result(args.top_k)
+    rows = []
+    for name, fn in encoders(result).items():
+        timing = time_case(fn, min_time=args.min_time, repeats=args.repeats)
+        rows.append({"encoding": name, "cpu_us": timing["median_s"] * 1e6, "bytes": len(fn())})
+
+    report = {
+        "top_k": args.top_k,
+        "citations": len(result["citations"]),
+        "json_encoder": "orjson" if orjson is not None else "json",
+        "results": rows,
+    }
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+
+    print(f"top_k={args.top_k} citations={report['citations']} encoder={report['json_encoder']}", file=sys.stderr)
+    print(f"{'encoding':<18}{'cpu/response':>14}{'bytes':>10}")
+    for row in rows:
+        print(f"{row['encoding']:<18}{row['cpu_us']:>11.1f} us{row['bytes']:>10}")
+
+
+if __name__ == "__main__":
+    main()
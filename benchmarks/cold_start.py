@@ -0,0 +1,152 @@
+"""Cold-start profile for the worker Lambda.
+
+Each run starts a fresh interpreter (like a new Lambda container) and measures
+the init phase: importing the handler module, which also creates the S3 client
+when AWS_LAMBDA_FUNCTION_NAME is set. A separate `-X importtime` run gives the
+import-time breakdown per top-level package and the slowest modules.
+
+No AWS access is needed: dummy credentials are set so client creation does not
+go to the instance metadata service.
+
+Usage:
+    python -m benchmarks.cold_start                      # 10 runs, table output
+    python -m benchmarks.cold_start --runs 20 --top 25 --json
+    python -m benchmarks.cold_start --path build/slim    # profile an unpacked slim build
+    python -m benchmarks.cold_start --no-client          # imports only, as outside Lambda
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from collections import defaultdict
+
+HANDLER_MODULE = "worker.lambda_handler"
+
+# Runs inside the child interpreter; prints the init duration in ms as JSON
+_INIT_SNIPPET = """
+import json, time
+start = time.perf_counter()
+import {module}
+print(json.dumps({{"init_ms": (time.perf_counter() - start) * 1000}}))
+"""
+
+
+def _child_env(path: str | None, with_client: bool) -> dict:
+    env = dict(os.environ)
+    env.setdefault("AWS_ACCESS_KEY_ID", "cold-start-profile")
+    env.setdefault("AWS_SECRET_ACCESS_KEY", "cold-start-profile")
+    env.setdefault("AWS_REGION", "us-east-1")
+    if with_client:
+        env["AWS_LAMBDA_FUNCTION_NAME"] = "cold-start-profile"
+    else:
+        env.pop("AWS_LAMBDA_FUNCTION_NAME", None)
+    paths = [p for p in (path, os.getcwd(), env.get("PYTHONPATH")) if p]
+    env["PYTHONPATH"] = os.pathsep.join(paths)
+    return env
+
+
+def measure_init(module: str, runs: int, path: str | None = None, with_client: bool = True) -> dict:
+    """Init duration of `module` over `runs` fresh interpreters (ms)."""
+    env = _child_env(path, with_client)
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", _INIT_SNIPPET.format(module=module)],
+            env=env, capture_output=True, text=True, check=True,
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1])["init_ms"])
+    return {
+        "runs": runs,
+        "median_ms": statistics.median(samples),
+        "min_ms": min(samples),
+        "max_ms": max(samples),
+    }
+
+
+def parse_importtime(stderr: str) -> list[dict]:
+    """Parse `-X importtime` output into {module, self_us, cumulative_us, depth} rows."""
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            rows.append({
+                "module": name.strip(),
+                "self_us": int(self_us),
+                "cumulative_us": int(cumulative_us),
+                "depth": (len(name) - len(name.lstrip())) // 2,
+            })
+        except ValueError:
+            continue
+    return rows
+
+
+def import_profile(module: str, path: str | None = None, with_client: bool = True, top: int = 15) -> dict:
+    """Import-time breakdown for `module` from one fresh interpreter."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        env=_child_env(path, with_client), capture_output=True, text=True, check=True,
+    )
+    rows = parse_importtime(result.stderr)
+    by_package: dict[str, int] = defaultdict(int)
+    for row in rows:
+        by_package[row["module"].split(".")[0]] += row["self_us"]
+    target = next((r for r in rows if r["module"] == module), None)
+    return {
+        "module": module,
+        "total_ms": target["cumulative_us"] / 1000 if target else sum(r["self_us"] for r in rows) / 1000,
+        "modules_imported": len(rows),
+        "by_package_ms": {
+            name: us / 1000 for name, us in sorted(by_package.items(), key=lambda item: -item[1])[:top]
+        },
+        "slowest_modules": [
+            {"module": r["module"], "cumulative_ms": r["cumulative_us"] / 1000, "self_ms": r["self_us"] / 1000}
+            for r in sorted(rows, key=lambda r: -r["cumulative_us"])[:top]
+        ],
+    }
+
+
+def print_report(results: dict) -> None:
+    init = results["init"]
+    profile = results["imports"]
+    print(f"module={profile['module']} path={results['path'] or '.'} s3_client={results['with_client']}")
+    print(f"init: median {init['median_ms']:.1f} ms  min {init['min_ms']:.1f} ms  max {init['max_ms']:.1f} ms"
+          f"  ({init['runs']} runs)")
+    print(f"imports: {profile['total_ms']:.1f} ms across {profile['modules_imported']} modules")
+    print("\nself time by top-level package:")
+    for name, ms in profile["by_package_ms"].items():
+        print(f"  {ms:>10.2f} ms  {name}")
+    print("\nslowest modules (cumulative):")
+    for row in profile["slowest_modules"]:
+        print(f"  {row['cumulative_ms']:>10.2f} ms  {row['module']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Profile worker Lambda cold-start init")
+    parser.add_argument("--module", default=HANDLER_MODULE, help="Module to import (default: the handler)")
+    parser.add_argument("--runs", type=int, default=10, help="Fresh interpreters for the init timing")
+    parser.add_argument("--top", type=int, default=15, help="Rows in the import breakdown")
+    parser.add_argument("--path", help="Directory put first on PYTHONPATH (e.g. an unpacked slim build)")
+    parser.add_argument("--no-client", action="store_true", help="Do not create the S3 client during init")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    with_client = not args.no_client
+    results = {
+        "path": args.path,
+        "with_client": with_client,
+        "init": measure_init(args.module, args.runs, args.path, with_client),
+        "imports": import_profile(args.module, args.path, with_client, args.top),
+    }
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,317 @@
+"""Concurrent load test for the FastAPI app (/ask and /presign).
+
+Drives one `api.main:app` process either in-process over ASGI (no sockets) or
+through a local uvicorn server started by the harness, with stand-ins for AWS credentials,
+the embedding provider and the vector store so results reflect the app itself.
+Stand-in latencies are injectable to model a slow provider or database.
+
+Usage:
+    python -m benchmarks.loadtest --concurrency 16 --duration 10
+    python -m benchmarks.loadtest --rate 200 --concurrency 64 --duration 10 --embedding-latency-ms 30
+    python -m benchmarks.loadtest --sweep 1 2 4 8 16 32 64 --duration 5 --json
+    python -m benchmarks.loadtest --transport uvicorn --concurrency 32
+    python -m benchmarks.loadtest --url http://my-host:8000 --concurrency 8   # real dependencies
+
+Reports p50/p95/p99 latency, throughput, error rate and the share of requests
+shed by admission control (503) per endpoint. --sweep runs one step per
+concurrency level and prints the saturation curve; with --db-latency-ms high
+and concurrency above ASK_MAX_CONCURRENCY it shows overload behaviour.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import random
+import socket
+import statistics
+import threading
+import time
+from contextlib import ExitStack
+from unittest.mock import patch
+
+import httpx
+
+QUESTIONS = [
+    "What is machine learning?",
+    "How do I reset my password?",
+    "What is the refund policy for annual plans?",
+    "Which regions is the service available in?",
+    "How are embeddings stored?",
+]
+
+
+def stub_presigner():
+    """Real local SigV4 presigner with static dummy credentials (no credential chain lookups)."""
+    from api.presign import S3Presigner
+
+    return S3Presigner("AKIALOADTEST", "loadtest-secret", "us-east-1")
+
+
+class StubVectorStore:
+    """In-memory stand-in for search_similar_chunks with injectable latency."""
+
+    def __init__(self, chunk_count: int, latency_ms: float):
+        self.latency_s = latency_ms / 1000
+        content = "Machine learning is a subset of artificial intelligence. " * 15
+        self.chunks = [
+            {
+                "chunk_id": f"00000000-0000-0000-0000-{i:012d}",
+                "doc_id": f"11111111-1111-1111-1111-{i // 10:012d}",
+                "content": content,
+                "trace_id": "22222222-2222-2222-2222-222222222222",
+                "chunk_index": i % 10,
+                "similarity": 0.95 - (i % 50) * 0.005,
+            }
+            for i in range(chunk_count)
+        ]
+
+    def search(self, question_embedding, top_k, similarity_threshold=0.48, filters=None):
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        # Deterministic per-question slice so different questions touch different rows
+        offset = int(abs(question_embedding[0]) * 1000) % max(1, len(self.chunks) - top_k)
+        results = sorted(self.chunks[offset:offset + top_k], key=lambda c: c["similarity"], reverse=True)
+        filtered = [r for r in results if r["similarity"] >= similarity_threshold]
+        return filtered, results
+
+
+def stub_embedding_provider(latency_ms: float):
+    """Stand-in for get_embedding: deterministic vector after a blocking sleep, like urllib."""
+    latency_s = latency_ms / 1000
+
+    def get_embedding(text: str, timeout: float | None = None) -> list[float]:
+        if latency_s:
+            time.sleep(latency_s)
+        digest = hashlib.sha256(text.encode()).digest()
+        return [(digest[i % len(digest)] / 255.0) * 2 - 1 for i in range(1536)]
+
+    return get_embedding
+
+
+def install_stand_ins(stack: ExitStack, embedding_latency_ms: float, db_latency_ms: float, chunk_count: int):
+    """Patch S3, embedding and vector store dependencies of the app for the lifetime of stack."""
+    os.environ.setdefault("S3_BUCKET_NAME", "loadtest-bucket")
+    os.environ.setdefault("AWS_REGION", "us-east-1")
+    # Stand-ins replace the real dependencies, so there is nothing to warm at startup
+    os.environ.setdefault("STARTUP_WARMUP", "off")
+
+    import api.main
+    import api.rag
+
+    store = StubVectorStore(chunk_count, db_latency_ms)
+    stack.enter_context(patch.object(api.main, "get_presigner", stub_presigner))
+    stack.enter_context(patch.object(api.rag, "get_embedding", stub_embedding_provider(embedding_latency_ms)))
+    stack.enter_context(patch.object(api.rag, "search_similar_chunks", store.search))
+    stack.enter_context(patch.object(api.rag, "search_lexical_chunks", lambda *a, **k: store.search(a[1], a[2])[1]))
+    return api.main.app
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def start_uvicorn(app) -> tuple[str, object]:
+    """Start uvicorn serving app on a free local port in a background thread."""
+    import uvicorn
+
+    port = _free_port()
+    config = uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning", access_log=False)
+    server = uvicorn.Server(config)
+    thread = threading.Thread(target=server.run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + 10
+    while not server.started:
+        if time.monotonic() > deadline:
+            raise RuntimeError("uvicorn did not start within 10s")
+        time.sleep(0.05)
+    return f"http://127.0.0.1:{port}", server
+
+
+def _request_for(endpoint: str, rng: random.Random) -> tuple[str, dict]:
+    if endpoint == "ask":
+        return "/ask", {"question": rng.choice(QUESTIONS), "top_k": rng.choice([5, 10, 20])}
+    return "/presign", {"filename": f"doc-{rng.randrange(1_000_000)}.txt"}
+
+
+async def run_step(
+    client: httpx.AsyncClient,
+    concurrency: int,
+    duration: float,
+    rate: float | None,
+    ask_fraction: float,
+    timeout: float,
+    seed: int = 0,
+) -> dict:
+    """
+    Run load for `duration` seconds.
+
+    Closed loop (rate=None): `concurrency` workers send back-to-back requests.
+    Open loop (rate set): Poisson arrivals at `rate` req/s, at most `concurrency`
+    in flight; arrivals that find no free slot are counted as dropped.
+    """
+    rng = random.Random(seed)
+    samples: dict[str, list[tuple[float, int]]] = {"ask": [], "presign": []}
+    dropped = 0
+
+    async def one_request():
+        endpoint = "ask" if rng.random() < ask_fraction else "presign"
+        path, body = _request_for(endpoint, rng)
+        start = time.perf_counter()
+        try:
+            response = await client.post(path, json=body, timeout=timeout)
+            status = response.status_code
+        except Exception:
+            status = 0
+        samples[endpoint].append(((time.perf_counter() - start) * 1000, status))
+
+    started = time.perf_counter()
+    end_at = started + duration
+
+    if rate is None:
+        async def worker():
+            while time.perf_counter() < end_at:
+                await one_request()
+                # Over in-process ASGI a fast response (e.g. a shed 503) never
+                # suspends; yield so other workers and the app's callbacks run
+                await asyncio.sleep(0)
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    else:
+        slots = asyncio.Semaphore(concurrency)
+        tasks = []
+
+        async def guarded():
+            try:
+                await one_request()
+            finally:
+                slots.release()
+
+        next_arrival = started
+        while next_arrival < end_at:
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            if slots.locked():
+                dropped += 1
+            else:
+                await slots.acquire()
+                tasks.append(asyncio.create_task(guarded()))
+            next_arrival += rng.expovariate(rate)
+        await asyncio.gather(*tasks)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "concurrency": concurrency,
+        "rate": rate,
+        "elapsed_s": elapsed,
+        "dropped": dropped,
+        "endpoints": {name: summarize(values, elapsed) for name, values in samples.items() if values},
+    }
+
+
+def _percentile(ordered: list[float], pct: float) -> float:
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def summarize(values: list[tuple[float, int]], elapsed: float) -> dict:
+    """Summarize (latency_ms, status) samples for one endpoint (status 0 = transport error).
+
+    Shed requests (503 from admission control) are errors too, but are also
+    reported separately with their own p50, since fast rejection is the point.
+    """
+    latencies = sorted(latency for latency, _ in values)
+    errors = sum(1 for _, status in values if not 200 <= status < 400)
+    shed = sorted(latency for latency, status in values if status == 503)
+    return {
+        "requests": len(values),
+        "throughput_rps": len(values) / elapsed if elapsed else 0.0,
+        "error_rate": errors / len(values),
+        "shed_rate": len(shed) / len(values),
+        "shed_p50_ms": statistics.median(shed) if shed else None,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": _percentile(latencies, 95),
+        "p99_ms": _percentile(latencies, 99),
+    }
+
+
+async def run_load(args) -> dict:
+    with ExitStack() as stack:
+        server = None
+        if args.url:
+            base_url, transport = args.url, None
+        else:
+            app = install_stand_ins(stack, args.embedding_latency_ms, args.db_latency_ms, args.chunks)
+            if args.transport == "uvicorn":
+                base_url, server = start_uvicorn(app)
+                transport = None
+            else:
+                base_url, transport = "http://loadtest", httpx.ASGITransport(app=app)
+
+        limits = httpx.Limits(max_connections=max(args.sweep or [args.concurrency]))
+        try:
+            async with httpx.AsyncClient(base_url=base_url, transport=transport, limits=limits) as client:
+                levels = args.sweep or [args.concurrency]
+                steps = []
+                for level in levels:
+                    steps.append(await run_step(
+                        client, level, args.duration, args.rate, args.ask_fraction, args.timeout
+                    ))
+        finally:
+            if server is not None:
+                server.should_exit = True
+
+    return {
+        "target": args.url or args.transport,
+        "stand_ins": None if args.url else {
+            "embedding_latency_ms": args.embedding_latency_ms,
+            "db_latency_ms": args.db_latency_ms,
+            "chunks": args.chunks,
+        },
+        "steps": steps,
+    }
+
+
+def print_report(results: dict) -> None:
+    print(f"target={results['target']} stand_ins={results['stand_ins']}")
+    header = (
+        f"{'conc':>6}{'endpoint':>10}{'reqs':>8}{'rps':>10}{'err%':>8}{'shed%':>8}"
+        f"{'p50ms':>10}{'p95ms':>10}{'p99ms':>10}"
+    )
+    print(header)
+    for step in results["steps"]:
+        for name, s in step["endpoints"].items():
+            print(
+                f"{step['concurrency']:>6}{name:>10}{s['requests']:>8}{s['throughput_rps']:>10.1f}"
+                f"{s['error_rate'] * 100:>8.2f}{s['shed_rate'] * 100:>8.2f}{s['p50_ms']:>10.2f}{s['p95_ms']:>10.2f}{s['p99_ms']:>10.2f}"
+            )
+        if step["dropped"]:
+            print(f"{'':>6}{'dropped':>10}{step['dropped']:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /ask and /presign")
+    parser.add_argument("--transport", choices=["asgi", "uvicorn"], default="asgi",
+                        help="In-process ASGI or a local uvicorn server (ignored with --url)")
+    parser.add_argument("--url", help="Target an already running server with its real dependencies")
+    parser.add_argument("--concurrency", type=int, default=8, help="Max in-flight requests")
+    parser.add_argument("--rate", type=float, help="Open-loop arrival rate in req/s (default: closed loop)")
+    parser.add_argument("--sweep", type=int, nargs="+", help="Concurrency levels for a saturation curve")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per step")
+    parser.add_argument("--ask-fraction", type=float, default=0.8, help="Share of requests sent to /ask")
+    parser.add_argument("--timeout", type=float, default=30.0, help="Per-request timeout in seconds")
+    parser.add_argument("--embedding-latency-ms", type=float, default=20.0, help="Stand-in provider latency")
+    parser.add_argument("--db-latency-ms", type=float, default=10.0, help="Stand-in vector store latency")
+    parser.add_argument("--chunks", type=int, default=1000, help="Chunks in the stand-in vector store")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_load(args))
+    if args.json:
+        print(json.dumps(results, indent=2))
+    else:
+        print_report(results)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,341 @@
+"""Microbenchmarks for the ingest and retrieval hot paths.
+
+Runs each case enough times to get stable timings, prints a table, and
+optionally writes machine-readable JSON and compares against a stored baseline.
+No database, S3 or network access is needed; retrieval is stubbed.
+
+Usage:
+    python -m benchmarks.microbench                              # run all cases
+    python -m benchmarks.microbench --quick                      # skip the largest inputs
+    python -m benchmarks.microbench --save-baseline benchmarks/baseline.json
+    python -m benchmarks.microbench --baseline benchmarks/baseline.json --threshold 0.25
+    python -m benchmarks.microbench --output results.json --filter chunk_text
+
+Exit status is 1 if any case is slower than baseline * (1 + threshold).
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections.abc import Callable
+from unittest.mock import patch
+
+from api.models import AskResponse
+from api.supabase_db import _vector_literal
+from worker.chunking import chunk_text
+from worker.embeddings import get_fake_embedding, get_local_embedding
+
+# (name, setup) pairs; setup() returns the zero-argument callable to time
+Case = tuple[str, Callable[[], Callable[[], object]]]
+
+SENTENCE = "The quick brown fox jumps over the lazy dog near the riverbank. "
+
+
+def _text_of_size(size_bytes: int) -> str:
+    repeats = size_bytes // len(SENTENCE) + 1
+    return (SENTENCE * repeats)[:size_bytes]
+
+
+def _chunk_case(size_bytes: int) -> Callable[[], Callable[[], object]]:
+    def setup():
+        text = _text_of_size(size_bytes)
+        return lambda: chunk_text(text)
+    return setup
+
+
+def _fake_embedding_single():
+    return lambda: get_fake_embedding("What is machine learning?")
+
+
+def _fake_embedding_batch():
+    texts = [f"chunk number {i} {SENTENCE}" for i in range(100)]
+    return lambda: [get_fake_embedding(t) for t in texts]
+
+
+def _local_embedding_batch():
+    """Local hashing-trick embeddings for 100 chunk_text chunks (~1 KB each)."""
+    words = [f"{SENTENCE.split()[i % 12]}{i % 997}" for i in range(20_000)]
+    texts = chunk_text(" ".join(words))[:100]
+    return lambda: [get_local_embedding(t) for t in texts]
+
+
+def _vector_literal_case():
+    embedding = get_fake_embedding("What is machine learning?")
+    return lambda: _vector_literal(embedding)
+
+
+def _stub_chunks(top_k: int) -> list[dict]:
+    content = _text_of_size(1000)
+    return [
+        {
+            "chunk_id": f"00000000-0000-0000-0000-{i:012d}",
+            "doc_id": "11111111-1111-1111-1111-111111111111",
+            "content": content,
+            "trace_id": "22222222-2222-2222-2222-222222222222",
+            "chunk_index": i,
+            "similarity": 0.9 - i * 0.001,
+        }
+        for i in range(top_k)
+    ]
+
+
+def _assemble_context_case():
+    """Merge 20 adjacent chunk_text chunks (real 200-char overlaps) into one budgeted context."""
+    from api.context import assemble_context
+
+    chunks = chunk_text(_text_of_size(20_000))[:20]
+    rows = [
+        {"chunk_id": str(i), "doc_id": "doc", "content": c, "chunk_index": i, "similarity": 0.9}
+        for i, c in enumerate(chunks)
+    ]
+    return lambda: assemble_context(rows, max_bytes=16000, excerpt_chars=200)
+
+
+def _semantic_cache_lookup_case():
+    """Look up a paraphrase (cosine ~0.97) among 1024 cached 1536-dim question embeddings."""
+    import random
+
+    from api.semantic_cache import SemanticCache
+
+    rng = random.Random(0)
+    cache = SemanticCache(1536)
+    vectors = [[rng.gauss(0, 1) for _ in range(1536)] for _ in range(1024)]
+    for i, vector in enumerate(vectors):
+        cache.put(vector, "scope", 1, i)
+    query = [v + rng.gauss(0, 0.25) for v in vectors[7]]
+    return lambda: cache.get(query, "scope", 1)
+
+
+def _answer_question_case():
+    from api import rag
+
+    chunks = _stub_chunks(20)
+    embedding = [0.1] * 1536
+
+    def run():
+        with patch.object(rag, "search_similar_chunks", return_value=(chunks, chunks)), \
+                patch.object(rag, "get_embedding", return_value=embedding):
+            return rag.answer_question("What is machine learning?", top_k=20)
+
+    return run
+
+
+def _ask_result(chunks: list[dict]) -> dict:
+    from api import rag
+
+    with patch.object(rag, "search_similar_chunks", return_value=(chunks, chunks)), \
+            patch.object(rag, "get_embedding", return_value=[0.1] * 1536):
+        return rag.answer_question("What is machine learning?", top_k=20)
+
+
+def _ask_response_json_case():
+    """Previous /ask serialization: build AskResponse (validates) and dump via Pydantic."""
+    result = _ask_result(_stub_chunks(20))
+    return lambda: AskResponse(**result).model_dump_json()
+
+
+def _ask_response_fast_json_case():
+    """Current /ask serialization: plain dict to JSON bytes, no model validation."""
+    from api.responses import ask_payload, dumps
+
+    result = _ask_result(_stub_chunks(20))
+    return lambda: dumps(ask_payload(result))
+
+
+def _ask_response_gzip_case():
+    """Fast serialization plus gzip at RESPONSE_GZIP_LEVEL (Accept-Encoding: gzip)."""
+    from api.responses import ask_payload, compress, dumps
+
+    result = _ask_result(_stub_chunks(20))
+    return lambda: compress(dumps(ask_payload(result)), "gzip")
+
+
+def _presign_batch_case():
+    """Sign 1000 PUT URLs with the local SigV4 presigner, as /presign/batch does."""
+    from api.presign import S3Presigner
+    from api.utils import build_s3_key
+
+    keys = [build_s3_key("0b7c6d1e-2f3a-4b5c-8d9e-0f1a2b3c4d5e", f"doc{i}.txt") for i in range(1000)]
+
+    def run():
+        presigner = S3Presigner("AKIABENCH", "bench-secret", "us-east-1")
+        return [presigner.put_url("bench-bucket", key, "text/plain", 3600) for key in keys]
+
+    return run
+
+
+def _api_import_case():
+    """Import api.main in a fresh interpreter (what every worker process and test run pays)."""
+    env = {**os.environ, "PYTHONDONTWRITEBYTECODE": "1"}
+    command = [sys.executable, "-c", "import api.main"]
+    return lambda: subprocess.run(command, env=env, check=True)
+
+
+def _api_lifespan_case():
+    """Run the app lifespan (config checks + blocking warm-up) with no-op components."""
+    from api import main, startup
+
+    os.environ.setdefault("S3_BUCKET_NAME", "bench-bucket")
+    logging.getLogger("api.startup").setLevel(logging.WARNING)
+    components = {name: startup.Component(name, lambda: None) for name in startup._components}
+
+    async def run_lifespan():
+        async with main.lifespan(main.app):
+            pass
+
+    def run():
+        with patch.dict(os.environ, {"STARTUP_WARMUP": "blocking"}), \
+                patch.dict(startup._components, components), \
+                patch.object(main, "close_pool"):
+            asyncio.run(run_lifespan())
+
+    return run
+
+
+def build_cases(quick: bool = False) -> list[Case]:
+    """Return all benchmark cases; quick skips the 10 MB / 50 MB chunking inputs and the
+    fresh-interpreter import case."""
+    sizes = [("1kb", 1_000), ("100kb", 100_000), ("1mb", 1_000_000)]
+    if not quick:
+        sizes += [("10mb", 10_000_000), ("50mb", 50_000_000)]
+
+    cases: list[Case] = [(f"chunk_text_{label}", _chunk_case(size)) for label, size in sizes]
+    cases += [
+        ("fake_embedding_single", _fake_embedding_single),
+        ("fake_embedding_batch_100", _fake_embedding_batch),
+        ("local_embedding_batch_100", _local_embedding_batch),
+        ("vector_literal_1536", _vector_literal_case),
+        ("assemble_context_top20", _assemble_context_case),
+        ("semantic_cache_lookup_1024", _semantic_cache_lookup_case),
+        ("answer_question_top20_stubbed", _answer_question_case),
+        ("ask_response_json_top20", _ask_response_json_case),
+        ("ask_response_fast_json_top20", _ask_response_fast_json_case),
+        ("ask_response_gzip_top20", _ask_response_gzip_case),
+        ("presign_batch_1000", _presign_batch_case),
+        ("api_lifespan_startup", _api_lifespan_case),
+    ]
+    if not quick:
+        cases.append(("api_import_fresh_process", _api_import_case))
+    return cases
+
+
+def time_case(fn: Callable[[], object], min_time: float = 0.2, repeats: int = 5) -> dict:
+    """
+    Time fn: calibrate iterations so one round takes >= min_time, then run
+    `repeats` rounds. Returns per-call seconds (median and min across rounds).
+    """
+    iterations = 1
+    while True:
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or iterations >= 1_000_000:
+            break
+        iterations *= 2 if elapsed == 0 else max(2, min(10, int(min_time / elapsed) + 1))
+
+    rounds = [elapsed / iterations]
+    for _ in range(repeats - 1):
+        start = time.perf_counter()
+        for _ in range(iterations):
+            fn()
+        rounds.append((time.perf_counter() - start) / iterations)
+
+    return {
+        "median_s": statistics.median(rounds),
+        "min_s": min(rounds),
+        "iterations": iterations,
+        "repeats": len(rounds),
+    }
+
+
+def compare_to_baseline(results: dict, baseline: dict, threshold: float) -> list[dict]:
+    """
+    Compare median timings to a baseline.
+
+    Returns one entry per case present in both, with `ratio` (current / baseline)
+    and `regressed` set when ratio > 1 + threshold.
+    """
+    comparisons = []
+    for name, current in results["cases"].items():
+        previous = baseline.get("cases", {}).get(name)
+        if not previous or not previous.get("median_s"):
+            continue
+        ratio = current["median_s"] / previous["median_s"]
+        comparisons.append({
+            "case": name,
+            "baseline_s": previous["median_s"],
+            "current_s": current["median_s"],
+            "ratio": ratio,
+            "regressed": ratio > 1 + threshold,
+        })
+    return comparisons
+
+
+def run(cases: list[Case], min_time: float, repeats: int, name_filter: str | None = None) -> dict:
+    results = {
+        "meta": {
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        },
+        "cases": {},
+    }
+    for name, setup in cases:
+        if name_filter and name_filter not in name:
+            continue
+        results["cases"][name] = time_case(setup(), min_time=min_time, repeats=repeats)
+        timing = results["cases"][name]
+        print(f"{name:<34}{timing['median_s'] * 1000:>12.4f} ms{timing['iterations']:>10} it", file=sys.stderr)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Microbenchmarks for ingest and retrieval hot paths")
+    parser.add_argument("--quick", action="store_true", help="Skip 10 MB / 50 MB chunking inputs")
+    parser.add_argument("--filter", help="Only run cases whose name contains this string")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per round")
+    parser.add_argument("--repeats", type=int, default=5, help="Rounds per case")
+    parser.add_argument("--output", help="Write results JSON to this path")
+    parser.add_argument("--save-baseline", help="Write results JSON as the new baseline")
+    parser.add_argument("--baseline", help="Compare against this baseline JSON")
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=float(os.getenv("BENCH_REGRESSION_THRESHOLD", "0.25")),
+        help="Allowed slowdown vs baseline (0.25 = 25%%)",
+    )
+    args = parser.parse_args()
+
+    results = run(build_cases(args.quick), args.min_time, args.repeats, args.filter)
+
+    for path in filter(None, [args.output, args.save_baseline]):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if not args.baseline:
+        print(json.dumps(results, indent=2))
+        return
+
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    comparisons = compare_to_baseline(results, baseline, args.threshold)
+    results["comparison"] = {"threshold": args.threshold, "cases": comparisons}
+    print(json.dumps(results, indent=2))
+
+    regressions = [c for c in comparisons if c["regressed"]]
+    for c in regressions:
+        print(f"REGRESSION {c['case']}: {c['ratio']:.2f}x baseline", file=sys.stderr)
+    if regressions:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,22 @@
+-- Two-stage retrieval: a short (coarse) embedding stored alongside the full one
+-- Run after 002_tables.sql. Requires pgvector >= 0.7 (subvector, l2_normalize).
+--
+-- The coarse dimension below (256) must match EMBEDDING_COARSE_DIMENSIONS used by
+-- the worker and the API. To use a different size (e.g. 512), replace 256 in every
+-- statement of this file before running it.
+--
+-- The full dimension is EMBEDDING_DIMENSIONS (default 1536, matching vector(1536) in
+-- 002_tables.sql). If you change it, the chunks table must be empty or re-embedded:
+-- ALTER TABLE chunks ALTER COLUMN embedding TYPE vector(1024);
+
+ALTER TABLE chunks ADD COLUMN IF NOT EXISTS embedding_coarse vector(256);
+
+-- Backfill existing rows: prefix of the full embedding, re-normalized
+-- (the same transformation as worker.embeddings.shorten_embedding)
+UPDATE chunks
+SET embedding_coarse = l2_normalize(subvector(embedding, 1, 256))
+WHERE embedding_coarse IS NULL;
+
+-- ANN index on the coarse vector only; the full vector is used for exact re-ranking
+CREATE INDEX IF NOT EXISTS idx_chunks_embedding_coarse
+    ON chunks USING hnsw (embedding_coarse vector_cosine_ops);
@@ -0,0 +1,12 @@
+-- Hybrid retrieval: full-text search column on chunk content
+-- Run after 002_tables.sql.
+--
+-- The generated column is maintained by Postgres on insert/update, so the worker
+-- does not need to send it. The text search configuration ('english') must match
+-- the one used by api.supabase_db.build_lexical_search_query.
+
+ALTER TABLE chunks
+    ADD COLUMN IF NOT EXISTS content_tsv tsvector
+    GENERATED ALWAYS AS (to_tsvector('english', content)) STORED;
+
+CREATE INDEX IF NOT EXISTS idx_chunks_content_tsv ON chunks USING gin (content_tsv);
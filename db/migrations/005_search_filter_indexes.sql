@@ -0,0 +1,11 @@
+-- Indexes for metadata-filtered search (document_ids, trace_ids, created_at range)
+-- Run after 002_tables.sql.
+--
+-- idx_chunks_document_id and idx_chunks_trace_id already exist (002_tables.sql);
+-- this adds the created_at range index.
+--
+-- Filtered vector queries use pgvector iterative index scans (pgvector >= 0.8, see
+-- VECTOR_ITERATIVE_SCAN) so a selective filter still returns top_k rows instead of
+-- whatever survives the filter out of the first ef_search ANN candidates.
+
+CREATE INDEX IF NOT EXISTS idx_chunks_created_at ON chunks(created_at);
@@ -0,0 +1,115 @@
+-- Partitioned chunks table (monthly RANGE partitions on created_at)
+-- Run after 003_coarse_embedding.sql, 004_content_tsvector.sql and 005_search_filter_indexes.sql.
+--
+-- Every partition gets its own indexes (including the vector indexes), so a query
+-- with a created_at condition only scans the matching months and a reindex only
+-- locks one month. After this migration, chunks.created_at is the ingest time of the
+-- parent document (the worker sets it on insert), so all chunks of a document live
+-- in one partition and the API can prune by documents.created_at.
+--
+-- Set CHUNKS_PARTITIONED=true for the worker and the API once this has run.
+--
+-- Migration path from the 002_tables.sql layout:
+--   1. Create the partitioned table and its indexes (below)
+--   2. Create partitions for every month present in the old table
+--   3. Copy rows (single statement below; for very large tables copy month by month)
+--   4. Swap table names in one transaction
+--   5. Drop chunks_unpartitioned after verifying counts
+
+-- 1. Partitioned table (same columns as chunks, created_at is part of the primary key)
+CREATE TABLE IF NOT EXISTS chunks_partitioned (
+    id UUID NOT NULL DEFAULT gen_random_uuid(),
+    document_id UUID NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    trace_id TEXT NOT NULL,
+    chunk_index INTEGER NOT NULL,
+    content TEXT NOT NULL,
+    embedding vector(1536) NOT NULL,
+    embedding_coarse vector(256),
+    content_tsv tsvector GENERATED ALWAYS AS (to_tsvector('english', content)) STORED,
+    PRIMARY KEY (id, created_at)
+) PARTITION BY RANGE (created_at);
+
+-- Indexes on the parent are created on every partition, including future ones
+CREATE INDEX IF NOT EXISTS idx_chunks_p_document_id ON chunks_partitioned(document_id);
+CREATE INDEX IF NOT EXISTS idx_chunks_p_trace_id ON chunks_partitioned(trace_id);
+CREATE INDEX IF NOT EXISTS idx_chunks_p_created_at ON chunks_partitioned(created_at);
+CREATE INDEX IF NOT EXISTS idx_chunks_p_content_tsv ON chunks_partitioned USING gin (content_tsv);
+CREATE INDEX IF NOT EXISTS idx_chunks_p_embedding
+    ON chunks_partitioned USING hnsw (embedding vector_cosine_ops);
+CREATE INDEX IF NOT EXISTS idx_chunks_p_embedding_coarse
+    ON chunks_partitioned USING hnsw (embedding_coarse vector_cosine_ops);
+
+-- Rows outside any monthly partition land here instead of failing the insert
+CREATE TABLE IF NOT EXISTS chunks_default PARTITION OF chunks_partitioned DEFAULT;
+
+-- Create the partition for the month containing p_month (idempotent).
+-- Called by the worker through PostgREST (/rest/v1/rpc/ensure_chunks_partition).
+-- Note: rows already in chunks_default for that month must be moved out first,
+-- otherwise attaching the new partition fails; the worker calls this before inserting.
+CREATE OR REPLACE FUNCTION ensure_chunks_partition(p_month DATE)
+RETURNS TEXT
+LANGUAGE plpgsql
+AS $$
+DECLARE
+    month_start DATE := date_trunc('month', p_month)::date;
+    partition_name TEXT := format('chunks_y%sm%s', to_char(month_start, 'YYYY'), to_char(month_start, 'MM'));
+    parent_name TEXT;
+BEGIN
+    -- Works both before (chunks_partitioned) and after (chunks) the table swap
+    SELECT c.relname INTO parent_name
+    FROM pg_partitioned_table p
+    JOIN pg_class c ON c.oid = p.partrelid
+    WHERE c.relname IN ('chunks', 'chunks_partitioned')
+    LIMIT 1;
+
+    IF to_regclass(partition_name) IS NULL THEN
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF %I FOR VALUES FROM (%L) TO (%L)',
+            partition_name,
+            parent_name,
+            month_start,
+            (month_start + INTERVAL '1 month')::date
+        );
+    END IF;
+    RETURN partition_name;
+END;
+$$;
+
+-- 2. Partitions for existing data (plus the current month)
+DO $$
+DECLARE
+    m DATE;
+BEGIN
+    FOR m IN
+        SELECT DISTINCT date_trunc('month', created_at)::date FROM documents
+        UNION
+        SELECT date_trunc('month', NOW())::date
+    LOOP
+        PERFORM ensure_chunks_partition(m);
+    END LOOP;
+END;
+$$;
+
+-- 3. Copy rows, normalizing created_at to the parent document's created_at
+-- For very large tables, add "WHERE d.created_at >= '2024-01-01' AND d.created_at < '2024-02-01'"
+-- and run once per month to keep each transaction short.
+INSERT INTO chunks_partitioned (
+    id, document_id, created_at, trace_id, chunk_index, content, embedding, embedding_coarse
+)
+SELECT c.id, c.document_id, d.created_at, c.trace_id, c.chunk_index, c.content, c.embedding, c.embedding_coarse
+FROM chunks c
+JOIN documents d ON d.id = c.document_id
+ON CONFLICT DO NOTHING;
+
+-- 4. Swap names (brief exclusive lock on both tables)
+BEGIN;
+ALTER TABLE chunks RENAME TO chunks_unpartitioned;
+ALTER TABLE chunks_partitioned RENAME TO chunks;
+COMMIT;
+
+-- 5. After verifying row counts match:
+-- DROP TABLE chunks_unpartitioned;
+
+-- Rebuilding one month's vector index without blocking the others:
+-- REINDEX INDEX CONCURRENTLY chunks_y2024m01_embedding_idx;
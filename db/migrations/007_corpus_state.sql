@@ -0,0 +1,34 @@
+-- Corpus version counter for the API's semantic retrieval cache
+-- Run after 002_tables.sql (and after 006_partition_chunks.sql if you use it: the
+-- partition swap replaces the chunks table, which would drop the trigger).
+--
+-- Every statement that inserts, updates, deletes or truncates chunks bumps
+-- corpus_state.version once (statement-level trigger, so a batch insert of a
+-- document's chunks is one bump). The API caches retrieval results per version
+-- and drops them when the version changes (SEMANTIC_CACHE=true).
+
+CREATE TABLE IF NOT EXISTS corpus_state (
+    id SMALLINT PRIMARY KEY DEFAULT 1 CHECK (id = 1),
+    version BIGINT NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW()
+);
+
+INSERT INTO corpus_state (id) VALUES (1) ON CONFLICT (id) DO NOTHING;
+
+CREATE OR REPLACE FUNCTION bump_corpus_version() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE corpus_state SET version = version + 1, updated_at = NOW() WHERE id = 1;
+    RETURN NULL;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS chunks_bump_corpus_version ON chunks;
+CREATE TRIGGER chunks_bump_corpus_version
+    AFTER INSERT OR UPDATE OR DELETE ON chunks
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_version();
+
+DROP TRIGGER IF EXISTS chunks_truncate_bump_corpus_version ON chunks;
+CREATE TRIGGER chunks_truncate_bump_corpus_version
+    AFTER TRUNCATE ON chunks
+    FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_version();
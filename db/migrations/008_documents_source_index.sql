@@ -0,0 +1,7 @@
+-- Index for looking up documents by their S3 object
+-- Run after 002_tables.sql.
+--
+-- The DLQ replay tool (python -m worker.replay) checks whether each object was
+-- already ingested (find_ingested_document) before re-running it.
+
+CREATE INDEX IF NOT EXISTS idx_documents_source ON documents(source_bucket, source_key);
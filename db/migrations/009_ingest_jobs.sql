@@ -0,0 +1,34 @@
+-- Checkpointed ingestion: per-object ingest progress, resumable on redelivery
+-- Run after 002_tables.sql (and after 006_partition_chunks.sql if you use it).
+-- Used by the worker when INGEST_CHECKPOINTS=true.
+--
+-- The worker commits a document's chunks in batches of INGEST_CHECKPOINT_CHUNKS
+-- and records next_chunk_index after each one. A redelivered message resumes
+-- from there instead of re-embedding the whole document. A job is reused only
+-- while the object's ETag and chunk count match; otherwise its document (and,
+-- by cascade, its chunks and the job) is deleted and ingest starts over.
+
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    source_bucket TEXT NOT NULL,
+    source_key TEXT NOT NULL,
+    etag TEXT,
+    document_id UUID NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    document_created_at TIMESTAMPTZ NOT NULL,
+    trace_id TEXT NOT NULL,
+    chunk_count INTEGER NOT NULL,
+    next_chunk_index INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'running' CHECK (status IN ('running', 'completed')),
+    attempts INTEGER NOT NULL DEFAULT 1,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    updated_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (source_bucket, source_key)
+);
+
+CREATE INDEX IF NOT EXISTS idx_ingest_jobs_document_id ON ingest_jobs(document_id);
+
+-- A batch re-sent after its response was lost must not duplicate chunks: the
+-- worker inserts with ON CONFLICT DO NOTHING on this key. created_at is part of
+-- it because unique indexes on the partitioned layout must include the
+-- partition key; all chunks of a document share the document's created_at.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_chunks_document_chunk
+    ON chunks(document_id, chunk_index, created_at);
@@ -0,0 +1,174 @@
+-- Near-duplicate chunk suppression at ingest
+-- Run after 002_tables.sql (and after 006_partition_chunks.sql if you use it).
+-- Used by the worker when INGEST_DEDUP=true (see worker/dedup.py).
+--
+-- The worker fingerprints every chunk with a 64-value MinHash signature. Stored
+-- chunks keep their fingerprint in chunk_fingerprints; a chunk whose estimated
+-- Jaccard similarity with a stored chunk reaches INGEST_DEDUP_MIN_SIMILARITY is
+-- not embedded or stored, and chunk_duplicates links it to that canonical chunk
+-- instead. Deleting a canonical chunk's document does not lose the linked
+-- content: promote_chunk_duplicates hands each of its canonical chunks to the
+-- first document linking to it (see below).
+
+CREATE TABLE IF NOT EXISTS chunk_fingerprints (
+    document_id UUID NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    bands BIGINT[] NOT NULL,
+    signature BIGINT[] NOT NULL,
+    PRIMARY KEY (document_id, chunk_index)
+);
+
+-- LSH candidate lookup: chunks sharing any band hash
+CREATE INDEX IF NOT EXISTS idx_chunk_fingerprints_bands ON chunk_fingerprints USING gin (bands);
+
+CREATE TABLE IF NOT EXISTS chunk_duplicates (
+    document_id UUID NOT NULL REFERENCES documents(id) ON DELETE CASCADE,
+    chunk_index INTEGER NOT NULL,
+    -- RESTRICT: the promote_chunk_duplicates trigger repoints these links first
+    canonical_document_id UUID NOT NULL REFERENCES documents(id) ON DELETE RESTRICT,
+    canonical_chunk_index INTEGER NOT NULL,
+    similarity REAL NOT NULL,
+    content_bytes INTEGER NOT NULL,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (document_id, chunk_index)
+);
+
+CREATE INDEX IF NOT EXISTS idx_chunk_duplicates_canonical
+    ON chunk_duplicates(canonical_document_id, canonical_chunk_index);
+
+-- Before a document is deleted, each of its chunks that others link to is
+-- copied (content, vectors) into the earliest linking document as that
+-- document's own chunk, along with its fingerprint; the remaining links are
+-- repointed to the copy. The copies update the heirs' centroids when
+-- 011_document_centroids.sql is installed.
+CREATE OR REPLACE FUNCTION promote_chunk_duplicates() RETURNS trigger
+LANGUAGE plpgsql AS $$
+DECLARE
+    canonical RECORD;
+    heir RECORD;
+    heirs UUID[] := '{}';
+    copy_columns TEXT;
+    copy_values TEXT;
+BEGIN
+    -- The document's own links go with it
+    DELETE FROM chunk_duplicates WHERE document_id = OLD.id;
+
+    -- Chunk columns to copy as they are (not the key, the heir-specific ones or generated ones)
+    SELECT
+        string_agg(quote_ident(attname), ', ' ORDER BY attnum),
+        string_agg('c.' || quote_ident(attname), ', ' ORDER BY attnum)
+    INTO copy_columns, copy_values
+    FROM pg_attribute
+    WHERE attrelid = 'chunks'::regclass AND attnum > 0 AND NOT attisdropped AND attgenerated = ''
+      AND attname NOT IN ('id', 'document_id', 'chunk_index', 'created_at', 'trace_id');
+
+    FOR canonical IN
+        SELECT DISTINCT canonical_chunk_index AS chunk_index
+        FROM chunk_duplicates
+        WHERE canonical_document_id = OLD.id
+    LOOP
+        SELECT dup.document_id, dup.chunk_index, d.created_at, d.trace_id INTO heir
+        FROM chunk_duplicates dup
+        JOIN documents d ON d.id = dup.document_id
+        WHERE dup.canonical_document_id = OLD.id AND dup.canonical_chunk_index = canonical.chunk_index
+        ORDER BY dup.created_at, dup.document_id, dup.chunk_index
+        LIMIT 1;
+
+        EXECUTE format(
+            'INSERT INTO chunks (document_id, chunk_index, created_at, trace_id, %s) '
+            'SELECT $1, $2, $3, $4, %s FROM chunks c WHERE c.document_id = $5 AND c.chunk_index = $6',
+            copy_columns, copy_values
+        ) USING heir.document_id, heir.chunk_index, heir.created_at, heir.trace_id, OLD.id, canonical.chunk_index;
+
+        INSERT INTO chunk_fingerprints (document_id, chunk_index, bands, signature)
+        SELECT heir.document_id, heir.chunk_index, f.bands, f.signature
+        FROM chunk_fingerprints f
+        WHERE f.document_id = OLD.id AND f.chunk_index = canonical.chunk_index
+        ON CONFLICT DO NOTHING;
+
+        DELETE FROM chunk_duplicates
+        WHERE document_id = heir.document_id AND chunk_index = heir.chunk_index;
+        UPDATE chunk_duplicates
+        SET canonical_document_id = heir.document_id, canonical_chunk_index = heir.chunk_index
+        WHERE canonical_document_id = OLD.id AND canonical_chunk_index = canonical.chunk_index;
+
+        heirs := array_append(heirs, heir.document_id);
+    END LOOP;
+
+    -- Documents without a centroid are still ingesting and get one when they finish
+    IF to_regproc('refresh_document_centroid') IS NOT NULL THEN
+        PERFORM refresh_document_centroid(d.id, d.created_at)
+        FROM documents d
+        WHERE d.id = ANY(heirs) AND d.centroid IS NOT NULL;
+    END IF;
+    RETURN OLD;
+END;
+$$;
+
+DROP TRIGGER IF EXISTS documents_promote_chunk_duplicates ON documents;
+CREATE TRIGGER documents_promote_chunk_duplicates
+    BEFORE DELETE ON documents
+    FOR EACH ROW EXECUTE FUNCTION promote_chunk_duplicates();
+
+-- Best stored match (similarity >= p_min_similarity) for each fingerprint in
+-- p_chunks, a JSON array of {"chunk_index", "bands", "signature"} objects.
+-- Fingerprints of p_exclude_document_id (the document being ingested) are
+-- ignored; the worker handles duplicates within a document itself. So are
+-- those of documents whose checkpointed ingest (009_ingest_jobs.sql) has not
+-- completed: an ingest that is never finished should not hold canonical chunks.
+-- Called by the worker through PostgREST (/rest/v1/rpc/find_chunk_near_duplicates).
+CREATE OR REPLACE FUNCTION find_chunk_near_duplicates(
+    p_chunks JSONB,
+    p_min_similarity REAL,
+    p_exclude_document_id UUID DEFAULT NULL
+)
+RETURNS TABLE (
+    chunk_index INTEGER,
+    canonical_document_id UUID,
+    canonical_chunk_index INTEGER,
+    similarity REAL
+)
+LANGUAGE plpgsql STABLE
+AS $$
+DECLARE
+    running_filter TEXT := '';
+BEGIN
+    IF to_regclass('ingest_jobs') IS NOT NULL THEN
+        running_filter := 'AND NOT EXISTS (SELECT 1 FROM ingest_jobs j '
+            'WHERE j.document_id = f.document_id AND j.status <> ''completed'')';
+    END IF;
+    RETURN QUERY EXECUTE format($query$
+        WITH query AS (
+            SELECT
+                (c->>'chunk_index')::INTEGER AS chunk_index,
+                ARRAY(SELECT jsonb_array_elements_text(c->'bands')::BIGINT) AS bands,
+                ARRAY(SELECT jsonb_array_elements_text(c->'signature')::BIGINT) AS signature
+            FROM jsonb_array_elements($1) AS c
+        ),
+        scored AS (
+            SELECT
+                q.chunk_index,
+                f.document_id,
+                f.chunk_index AS stored_chunk_index,
+                ((SELECT count(*) FROM unnest(q.signature, f.signature) AS s(a, b) WHERE a = b)::REAL
+                    / cardinality(q.signature))::REAL AS similarity
+            FROM query q
+            JOIN chunk_fingerprints f ON f.bands && q.bands
+            WHERE f.document_id IS DISTINCT FROM $3 %s
+        )
+        SELECT DISTINCT ON (s.chunk_index) s.chunk_index, s.document_id, s.stored_chunk_index, s.similarity
+        FROM scored s
+        WHERE s.similarity >= $2
+        ORDER BY s.chunk_index, s.similarity DESC, s.document_id, s.stored_chunk_index
+    $query$, running_filter) USING p_chunks, p_min_similarity, p_exclude_document_id;
+END;
+$$;
+
+-- Corpus-wide savings: chunks (and their vectors) never stored
+CREATE OR REPLACE VIEW chunk_dedup_stats AS
+SELECT
+    count(*) AS duplicate_chunks,
+    COALESCE(sum(content_bytes), 0) AS duplicate_content_bytes,
+    count(DISTINCT document_id) AS documents_with_duplicates,
+    count(DISTINCT (canonical_document_id, canonical_chunk_index)) AS canonical_chunks
+FROM chunk_duplicates;
@@ -0,0 +1,63 @@
+-- Hierarchical retrieval: a centroid embedding per document
+-- Run after 002_tables.sql (and after 006_partition_chunks.sql if you use it).
+-- Used by the API when RETRIEVAL_MODE=hierarchical.
+--
+-- documents.centroid is the mean of the document's chunk embeddings. /ask first
+-- ranks documents by centroid similarity, then ranks only the chunks of the top
+-- HIERARCHICAL_TOP_DOCUMENTS documents. The worker refreshes the centroid at the
+-- end of every ingest (refresh_document_centroid); documents without one (still
+-- ingesting) are not searched in this mode.
+--
+-- The dimension must match chunks.embedding (EMBEDDING_DIMENSIONS, default 1536).
+-- With 007_corpus_state.sql, run this after it: a centroid refresh changes
+-- hierarchical results, so it bumps the corpus version like a chunk write does.
+
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS centroid vector(1536);
+ALTER TABLE documents ADD COLUMN IF NOT EXISTS centroid_chunks INTEGER NOT NULL DEFAULT 0;
+
+-- Recompute a document's centroid from its stored chunks. p_created_at (the
+-- document's created_at) lets Postgres scan only the matching chunks partition.
+-- Called by the worker through PostgREST (/rest/v1/rpc/refresh_document_centroid).
+CREATE OR REPLACE FUNCTION refresh_document_centroid(p_document_id UUID, p_created_at TIMESTAMPTZ DEFAULT NULL)
+RETURNS INTEGER
+LANGUAGE sql
+AS $$
+    WITH stats AS (
+        SELECT avg(c.embedding) AS centroid, count(*)::INTEGER AS chunk_count
+        FROM chunks c
+        WHERE c.document_id = p_document_id
+          AND (p_created_at IS NULL OR c.created_at = p_created_at)
+    )
+    UPDATE documents d
+    SET centroid = stats.centroid, centroid_chunks = stats.chunk_count
+    FROM stats
+    WHERE d.id = p_document_id
+    RETURNING d.centroid_chunks;
+$$;
+
+-- Invalidate the API's semantic cache when a centroid changes (only if
+-- 007_corpus_state.sql is installed)
+DO $$
+BEGIN
+    IF to_regproc('bump_corpus_version') IS NOT NULL THEN
+        DROP TRIGGER IF EXISTS documents_centroid_bump_corpus_version ON documents;
+        CREATE TRIGGER documents_centroid_bump_corpus_version
+            AFTER UPDATE OF centroid ON documents
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_corpus_version();
+    END IF;
+END;
+$$;
+
+-- Backfill documents ingested before this migration
+UPDATE documents d
+SET centroid = s.centroid, centroid_chunks = s.chunk_count
+FROM (
+    SELECT document_id, avg(embedding) AS centroid, count(*)::INTEGER AS chunk_count
+    FROM chunks
+    GROUP BY document_id
+) s
+WHERE d.id = s.document_id AND d.centroid IS NULL;
+
+-- ANN index for the document stage; one entry per document, so it stays small
+CREATE INDEX IF NOT EXISTS idx_documents_centroid
+    ON documents USING hnsw (centroid vector_cosine_ops);
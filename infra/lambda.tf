@@ -20,6 +20,7 @@ data "archive_file" "lambda_zip" {
     "db",
     "infra",
     "scripts",
+    "benchmarks",
     "tests",
     "test",
     "deployed_lambda",
@@ -45,9 +46,15 @@ data "archive_file" "lambda_zip" {
   ]
 }
 
+# Use the slim, precompiled package from scripts/build_slim_worker.py when given
+locals {
+  lambda_package_path = var.lambda_package_path != "" ? var.lambda_package_path : data.archive_file.lambda_zip.output_path
+  lambda_package_hash = var.lambda_package_path != "" ? filebase64sha256(var.lambda_package_path) : data.archive_file.lambda_zip.output_base64sha256
+}
+
 # Lambda function
 resource "aws_lambda_function" "processor" {
-  filename         = data.archive_file.lambda_zip.output_path
+  filename         = local.lambda_package_path
   function_name    = "${var.project_name}-processor"
   role            = aws_iam_role.lambda.arn
   handler         = "worker.lambda_handler.lambda_handler"
@@ -55,7 +62,7 @@ resource "aws_lambda_function" "processor" {
   timeout         = var.lambda_timeout
   memory_size     = var.lambda_memory_size
 
-  source_code_hash = data.archive_file.lambda_zip.output_base64sha256
+  source_code_hash = local.lambda_package_hash
 
   environment {
     variables = {
@@ -77,7 +84,7 @@ resource "aws_lambda_event_source_mapping" "sqs" {
   event_source_arn = aws_sqs_queue.processing.arn
   function_name    = aws_lambda_function.processor.arn
   batch_size       = 1
-  enabled          = true
+  enabled          = var.sqs_lambda_trigger_enabled
 }
 
 # CloudWatch log group
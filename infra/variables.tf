@@ -22,6 +22,18 @@ variable "lambda_memory_size" {
   default     = 512
 }
 
+variable "lambda_package_path" {
+  description = "Optional path to a prebuilt worker zip (scripts/build_slim_worker.py); empty uses the source archive"
+  type        = string
+  default     = ""
+}
+
+variable "sqs_lambda_trigger_enabled" {
+  description = "Whether the Lambda consumes the processing queue; disable while running python -m worker.consumer instead"
+  type        = bool
+  default     = true
+}
+
 variable "sqs_visibility_timeout" {
   description = "SQS visibility timeout in seconds (should be >= lambda timeout)"
   type        = number
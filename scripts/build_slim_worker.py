@@ -0,0 +1,153 @@
+"""Build a slim worker Lambda package with precompiled bytecode.
+
+The default Terraform package ships worker/ as source and relies on the boto3
+bundled with the Lambda runtime. That has two cold-start costs: /var/task is
+read-only, so the worker modules are recompiled on every cold start, and the
+runtime's boto3 version is not pinned. This script builds a zip that:
+
+- contains worker/ plus a pinned boto3/botocore (unless --no-vendor)
+- removes botocore service models except the services the worker calls
+  (S3, SQS, STS by default), plus docs-only example files, which cuts the
+  package from roughly 25 MB to a few MB and makes it faster to fetch and unpack
+- ships .pyc files compiled with unchecked-hash invalidation, so Python loads
+  them without stat-ing or recompiling sources
+
+Build with the same Python minor version as the Lambda runtime (3.11), since
+bytecode is version specific.
+
+Usage:
+    python scripts/build_slim_worker.py                       # build/worker-slim.zip
+    python scripts/build_slim_worker.py --keep-service s3 --keep-service sqs
+    python scripts/build_slim_worker.py --no-vendor           # worker/ only, precompiled
+
+Deploy with `terraform apply -var lambda_package_path=../build/worker-slim.zip`,
+and profile with `python -m benchmarks.cold_start --path build/slim`.
+"""
+
+import argparse
+import compileall
+import py_compile
+import shutil
+import subprocess
+import sys
+import zipfile
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_SERVICES = ("s3", "sqs", "sts")
+LAMBDA_PYTHON = (3, 11)
+
+
+def _boto3_requirement() -> str:
+    """Pin the vendored boto3 to the version installed locally, if any."""
+    try:
+        import boto3
+        return f"boto3=={boto3.__version__}"
+    except ImportError:
+        return "boto3"
+
+
+def vendor_boto3(target: Path, requirement: str) -> None:
+    """pip-install boto3 and its dependencies into target (all pure Python)."""
+    subprocess.run(
+        [sys.executable, "-m", "pip", "install", "--quiet", "--no-compile", "--target", str(target), requirement],
+        check=True,
+    )
+
+
+def prune_botocore_data(target: Path, keep_services: set[str]) -> int:
+    """
+    Delete botocore service models not in keep_services, and example files
+    (used only for docs). Top-level files such as endpoints.json are kept.
+    Returns the number of bytes removed.
+    """
+    data_dir = target / "botocore" / "data"
+    if not data_dir.is_dir():
+        return 0
+    removed = 0
+    for entry in data_dir.iterdir():
+        if entry.is_dir() and entry.name not in keep_services:
+            removed += sum(f.stat().st_size for f in entry.rglob("*") if f.is_file())
+            shutil.rmtree(entry)
+    for example in data_dir.rglob("examples-*.json"):
+        removed += example.stat().st_size
+        example.unlink()
+    return removed
+
+
+def strip_tree(target: Path) -> None:
+    """Remove caches and metadata that are not needed at runtime."""
+    for pattern in ("__pycache__", "*.dist-info", "tests"):
+        for path in list(target.rglob(pattern)):
+            if path.is_dir():
+                shutil.rmtree(path, ignore_errors=True)
+
+
+def compile_tree(target: Path) -> None:
+    """Compile every module into __pycache__ with unchecked-hash .pyc files, which are
+    loaded without stat-ing or hashing the source."""
+    ok = compileall.compile_dir(
+        str(target),
+        quiet=1,
+        invalidation_mode=py_compile.PycInvalidationMode.UNCHECKED_HASH,
+    )
+    if not ok:
+        raise RuntimeError("Bytecode compilation failed")
+
+
+def write_zip(source: Path, zip_path: Path) -> None:
+    zip_path.parent.mkdir(parents=True, exist_ok=True)
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for path in sorted(source.rglob("*")):
+            if path.is_file():
+                zf.write(path, path.relative_to(source))
+
+
+def build(out_dir: Path, zip_path: Path, keep_services: set[str], vendor: bool) -> dict:
+    if sys.version_info[:2] != LAMBDA_PYTHON:
+        print(
+            f"warning: building with Python {sys.version_info[0]}.{sys.version_info[1]}, "
+            f"the Lambda runtime is {LAMBDA_PYTHON[0]}.{LAMBDA_PYTHON[1]}; bytecode will be ignored",
+            file=sys.stderr,
+        )
+    if out_dir.exists():
+        shutil.rmtree(out_dir)
+    out_dir.mkdir(parents=True)
+
+    shutil.copytree(ROOT / "worker", out_dir / "worker", ignore=shutil.ignore_patterns("__pycache__", "*.pyc"))
+    pruned = 0
+    if vendor:
+        vendor_boto3(out_dir, _boto3_requirement())
+        pruned = prune_botocore_data(out_dir, keep_services)
+    strip_tree(out_dir)
+    compile_tree(out_dir)
+    write_zip(out_dir, zip_path)
+
+    return {
+        "zip": str(zip_path),
+        "zip_bytes": zip_path.stat().st_size,
+        "pruned_model_bytes": pruned,
+        "services": sorted(keep_services) if vendor else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build a slim, precompiled worker Lambda package")
+    parser.add_argument("--out-dir", default=str(ROOT / "build" / "slim"), help="Staging directory")
+    parser.add_argument("--zip", default=str(ROOT / "build" / "worker-slim.zip"), help="Output zip path")
+    parser.add_argument(
+        "--keep-service", action="append", dest="services",
+        help=f"botocore service model to keep (repeatable, default: {', '.join(DEFAULT_SERVICES)})",
+    )
+    parser.add_argument("--no-vendor", action="store_true", help="Use the runtime's boto3; ship worker/ only")
+    args = parser.parse_args()
+
+    result = build(Path(args.out_dir), Path(args.zip), set(args.services or DEFAULT_SERVICES), not args.no_vendor)
+    print(
+        f"{result['zip']}: {result['zip_bytes'] / 1e6:.1f} MB"
+        + (f", pruned {result['pruned_model_bytes'] / 1e6:.1f} MB of service models" if result["services"] else "")
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""HTTP transport for the Supabase REST and OpenAI clients.
+
+urllib opens a new TCP (and TLS) connection for every request. That is fine
+for a Lambda invocation that makes a handful of calls, but a long-running
+consumer (worker.consumer) pays a handshake per embedding batch and per
+insert. With HTTP_KEEPALIVE=true, urlopen keeps persistent connections per
+host instead and retries once on a fresh connection if the server closed an
+idle one. The retry happens only if the request was not written yet or its
+method is idempotent, so a POST the server may already have applied is not
+sent twice; that error is left to the caller's retry logic.
+
+Idle connections are shared by all threads of the process: a request takes
+one (or opens one if none is idle) and puts it back when the response has
+been read, so the short-lived threads of an ingest pipeline (worker.pipeline)
+reuse the connections of earlier documents. Errors are raised as urllib's
+(HTTPError, URLError, TimeoutError), so callers handle both transports the
+same way.
+"""
+
+import http.client
+import io
+import os
+import threading
+import urllib.error
+import urllib.parse
+import urllib.request
+
+# Raised when a reused connection turns out to have been closed by the server
+_STALE_CONNECTION_ERRORS = (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError)
+
+# Methods a stale-connection retry may resend after the request was written
+_IDEMPOTENT_METHODS = frozenset({"GET", "HEAD", "PUT", "DELETE", "OPTIONS"})
+
+# Idle persistent connections by (scheme, netloc), most recently used last
+_idle: dict[tuple[str, str], list[http.client.HTTPConnection]] = {}
+_idle_lock = threading.Lock()
+
+
+def keepalive_enabled() -> bool:
+    return os.getenv("HTTP_KEEPALIVE", "false").lower() == "true"
+
+
+class _Response:
+    """The parts of urllib's response object the clients use."""
+
+    def __init__(self, status: int, headers, body: bytes):
+        self.status = status
+        self.headers = headers
+        self._body = body
+
+    def read(self) -> bytes:
+        return self._body
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+def _checkout(scheme: str, netloc: str) -> tuple[http.client.HTTPConnection, bool]:
+    """An idle connection to the host (reused=True), or a new one."""
+    with _idle_lock:
+        idle = _idle.get((scheme, netloc))
+        if idle:
+            return idle.pop(), True
+    cls = http.client.HTTPSConnection if scheme == "https" else http.client.HTTPConnection
+    return cls(netloc), False
+
+
+def _checkin(scheme: str, netloc: str, connection: http.client.HTTPConnection) -> None:
+    with _idle_lock:
+        _idle.setdefault((scheme, netloc), []).append(connection)
+
+
+def urlopen(request: urllib.request.Request, timeout: float | None = None):
+    """urllib.request.urlopen, over a persistent connection when HTTP_KEEPALIVE=true."""
+    if not keepalive_enabled():
+        return urllib.request.urlopen(request, timeout=timeout)
+
+    url = urllib.parse.urlsplit(request.full_url)
+    path = url.path or "/"
+    if url.query:
+        path = f"{path}?{url.query}"
+    headers = dict(request.header_items())
+    method = request.get_method()
+    for attempt in range(2):
+        connection, reused = _checkout(url.scheme, url.netloc)
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        sent = False
+        try:
+            connection.request(method, path, body=request.data, headers=headers)
+            sent = True
+            response = connection.getresponse()
+            body = response.read()
+        except _STALE_CONNECTION_ERRORS as e:
+            connection.close()
+            # Once the request is out the server may have acted on it; resend
+            # only what is safe to repeat and leave the rest to the caller
+            if reused and attempt == 0 and (not sent or method in _IDEMPOTENT_METHODS):
+                continue
+            raise urllib.error.URLError(e) from e
+        except TimeoutError:
+            connection.close()
+            raise
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            raise urllib.error.URLError(e) from e
+        break
+
+    if response.will_close:
+        connection.close()
+    else:
+        _checkin(url.scheme, url.netloc, connection)
+    if response.status >= 400:
+        raise urllib.error.HTTPError(request.full_url, response.status, response.reason, response.headers, io.BytesIO(body))
+    return _Response(response.status, response.headers, body)
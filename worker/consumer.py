@@ -0,0 +1,273 @@
+"""Long-running queue consumer, an alternative to the Lambda trigger.
+
+For sustained bulk loads, a Lambda invocation per message (batch_size = 1)
+pays invocation overhead and fresh clients and connections again and again.
+This consumer long-polls the processing queue and runs ingest_message (the
+same code path as lambda_handler) on a pool of worker processes that keep
+their clients across messages: the S3 client is created once per process and
+HTTP_KEEPALIVE defaults to true, so Supabase and OpenAI requests reuse
+connections (see worker.connections).
+
+- at most --processes messages are in flight; more are received only when a
+  process is free, so nothing sits invisible in a local backlog
+- messages in flight are kept hidden by extending their visibility timeout
+  every --visibility-timeout / 2 seconds, so long documents are not
+  redelivered to another consumer mid-ingest
+- a message is deleted when its ingest succeeds; a failed one becomes visible
+  again after --retry-delay seconds and, as with Lambda, moves to the DLQ
+  after the queue's maxReceiveCount
+- SIGTERM / SIGINT stop receiving and wait up to --drain-timeout for messages
+  in flight; the rest are made visible again for other consumers
+
+Disable the Lambda trigger (sqs_lambda_trigger_enabled = false in Terraform)
+while the consumer runs, or both will take messages from the queue.
+
+Usage:
+    python -m worker.consumer --queue-url https://sqs.us-east-1.amazonaws.com/123456789012/rag-pipeline-processing --processes 8
+    python -m worker.consumer --jsonl messages.jsonl --processes 2    # local stand-in queue; exits when drained
+"""
+
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Executor, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from dataclasses import dataclass
+
+from .ingest import get_s3_client, ingest_message
+from .queues import LocalQueue, Message, SQSQueue
+
+logger = logging.getLogger(__name__)
+
+# Seconds between progress log lines
+PROGRESS_INTERVAL_S = 60.0
+
+
+def _init_process() -> None:
+    """Worker process setup: the parent handles Ctrl-C; clients are created once."""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    get_s3_client()
+
+
+def _process(body: str) -> tuple[bool, list[dict] | str]:
+    """
+    Ingest one message body in a worker process.
+
+    Returns (True, summaries) or (False, error); exceptions are not pickled
+    back because some (e.g. HTTP errors holding a socket) cannot be.
+    """
+    try:
+        return True, ingest_message(body)
+    except Exception as e:
+        return False, f"{type(e).__name__}: {e}"
+
+
+@dataclass
+class _InFlight:
+    message: Message
+    hidden_until: float
+
+
+class Consumer:
+    """Receives messages from a queue and ingests them on an executor."""
+
+    def __init__(
+        self,
+        queue,
+        processes: int = 4,
+        visibility_timeout: int = 300,
+        wait_s: int = 20,
+        retry_delay: int = 30,
+        drain_timeout: float = 60.0,
+        exit_when_empty: bool = False,
+        executor_factory: Callable[[int], Executor] | None = None,
+    ):
+        self.queue = queue
+        self.processes = max(1, processes)
+        self.visibility_timeout = visibility_timeout
+        self.wait_s = wait_s
+        self.retry_delay = retry_delay
+        self.drain_timeout = drain_timeout
+        self.exit_when_empty = exit_when_empty
+        self.executor_factory = executor_factory or self._process_pool
+        self.stats = {"received": 0, "succeeded": 0, "failed": 0, "released": 0, "documents": 0, "chunks": 0}
+        self._stopping = threading.Event()
+        self._in_flight: dict[Future, _InFlight] = {}
+
+    @staticmethod
+    def _process_pool(processes: int) -> Executor:
+        # spawn: the parent runs threads (boto3, signal handling), which fork does not copy safely
+        return ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn"), initializer=_init_process)
+
+    def stop(self) -> None:
+        """Stop receiving; run() drains messages in flight and returns."""
+        self._stopping.set()
+
+    def _tick(self) -> float:
+        return min(1.0, self.visibility_timeout / 4)
+
+    def _extend_visibility(self) -> None:
+        now = time.monotonic()
+        for entry in self._in_flight.values():
+            if entry.hidden_until - now < self.visibility_timeout / 2:
+                try:
+                    self.queue.change_visibility(entry.message, self.visibility_timeout)
+                    entry.hidden_until = now + self.visibility_timeout
+                except Exception as e:
+                    logger.warning(f"Could not extend message visibility: {e}")
+
+    def _finish(self, future: Future) -> None:
+        try:
+            ok, result = future.result()
+        except BrokenProcessPool:
+            # Left in flight for _release_all
+            raise
+        except Exception as e:
+            ok, result = False, f"{type(e).__name__}: {e}"
+        entry = self._in_flight.pop(future)
+
+        try:
+            if ok:
+                self.queue.delete(entry.message)
+                self.stats["succeeded"] += 1
+                self.stats["documents"] += len(result)
+                self.stats["chunks"] += sum(summary.get("chunk_count", 0) for summary in result)
+            else:
+                logger.warning(f"Ingest failed, retrying in {self.retry_delay}s: {result}")
+                self.queue.change_visibility(entry.message, self.retry_delay)
+                self.stats["failed"] += 1
+        except Exception as e:
+            logger.warning(f"Could not settle message: {e}")
+
+    def _release_all(self) -> None:
+        """Make unfinished messages visible again for another consumer."""
+        for entry in self._in_flight.values():
+            try:
+                self.queue.change_visibility(entry.message, 0)
+                self.stats["released"] += 1
+            except Exception as e:
+                logger.warning(f"Could not release message: {e}")
+        self._in_flight.clear()
+
+    def _collect(self, timeout: float) -> None:
+        if not self._in_flight:
+            return
+        done, _ = wait(list(self._in_flight), timeout=timeout, return_when=FIRST_COMPLETED)
+        # Settle every future that has a result before reporting a broken pool,
+        # so _release_all does not hand finished messages to another consumer
+        broken = None
+        for future in done:
+            try:
+                self._finish(future)
+            except BrokenProcessPool as e:
+                broken = e
+        if broken is not None:
+            raise broken
+
+    def _log_progress(self, started_at: float) -> None:
+        elapsed_s = time.monotonic() - started_at
+        rate = self.stats["documents"] / elapsed_s if elapsed_s else 0.0
+        logger.info(f"Consumer progress: {json.dumps(self.stats)}, in_flight={len(self._in_flight)}, docs_per_s={rate:.2f}")
+
+    def run(self) -> dict:
+        """Consume until stop() (or, with exit_when_empty, until the queue is drained)."""
+        started_at = last_progress = time.monotonic()
+        executor = self.executor_factory(self.processes)
+        try:
+            while not self._stopping.is_set():
+                free = self.processes - len(self._in_flight)
+                if free > 0:
+                    # Poll briefly while messages are in flight so they are settled promptly
+                    wait_s = min(self.wait_s, 1) if self._in_flight else self.wait_s
+                    messages = self.queue.receive(free, wait_s, self.visibility_timeout)
+                    now = time.monotonic()
+                    for message in messages:
+                        future = executor.submit(_process, message.body)
+                        self._in_flight[future] = _InFlight(message, now + self.visibility_timeout)
+                    self.stats["received"] += len(messages)
+                    if not messages and not self._in_flight and self.exit_when_empty:
+                        break
+                try:
+                    self._collect(0 if free > 0 else self._tick())
+                except BrokenProcessPool:
+                    logger.error("Worker process died; restarting the pool")
+                    self._release_all()
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    executor = self.executor_factory(self.processes)
+                self._extend_visibility()
+                if time.monotonic() - last_progress >= PROGRESS_INTERVAL_S:
+                    self._log_progress(started_at)
+                    last_progress = time.monotonic()
+
+            # Drain: finish what is in flight, keeping it hidden meanwhile
+            deadline = time.monotonic() + self.drain_timeout
+            while self._in_flight and time.monotonic() < deadline:
+                try:
+                    self._collect(min(self._tick(), max(0.0, deadline - time.monotonic())))
+                except BrokenProcessPool:
+                    break
+                self._extend_visibility()
+        finally:
+            unfinished = bool(self._in_flight)
+            self._release_all()
+            executor.shutdown(wait=False, cancel_futures=True)
+            if unfinished and isinstance(executor, ProcessPoolExecutor):
+                # Workers still busy after the drain timeout would delay exit
+                for child in multiprocessing.active_children():
+                    child.terminate()
+        self._log_progress(started_at)
+        return dict(self.stats, elapsed_s=round(time.monotonic() - started_at, 2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Long-running ingest consumer")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--queue-url", help="SQS processing queue")
+    source.add_argument("--jsonl", help="Consume a local queue loaded from this file (one message per line) and exit")
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1, help="Worker processes")
+    parser.add_argument("--visibility-timeout", type=int, default=300, help="Seconds a message stays hidden per extension")
+    parser.add_argument("--wait-seconds", type=int, default=20, help="SQS long-poll wait")
+    parser.add_argument("--retry-delay", type=int, default=30, help="Seconds before a failed message is retried")
+    parser.add_argument("--drain-timeout", type=float, default=60.0, help="Seconds to finish messages in flight on shutdown")
+    parser.add_argument("--exit-when-empty", action="store_true", help="Exit once the queue is empty and nothing is in flight")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    # Inherited by the worker processes
+    os.environ.setdefault("HTTP_KEEPALIVE", "true")
+
+    if args.queue_url:
+        queue = SQSQueue(args.queue_url)
+    else:
+        queue = LocalQueue.from_jsonl(args.jsonl, visibility_timeout=args.visibility_timeout)
+    consumer = Consumer(
+        queue,
+        processes=args.processes,
+        visibility_timeout=args.visibility_timeout,
+        wait_s=args.wait_seconds if args.queue_url else 1,
+        retry_delay=args.retry_delay,
+        drain_timeout=args.drain_timeout,
+        exit_when_empty=args.exit_when_empty or bool(args.jsonl),
+    )
+
+    def shutdown(signum, frame):
+        logger.info(f"Received signal {signum}, draining")
+        consumer.stop()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    stats = consumer.run()
+    if isinstance(queue, LocalQueue):
+        stats["dead_lettered"] = len(queue.dead)
+    print(json.dumps(stats, indent=2))
+
+
+if __name__ == "__main__":
+    main()
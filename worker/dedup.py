@@ -0,0 +1,198 @@
+"""Near-duplicate chunk detection at ingest (INGEST_DEDUP=true).
+
+Boilerplate (footers, disclaimers, license text) repeats across and within
+documents and produces many near-identical chunks that bloat the chunks table
+and the vector index and crowd out useful search results. With dedup enabled,
+each chunk is fingerprinted with MinHash over its word 3-grams; a chunk whose
+estimated Jaccard similarity with an already stored chunk is at least
+INGEST_DEDUP_MIN_SIMILARITY (default 0.9) is neither embedded nor stored, but
+recorded in chunk_duplicates with a link to that canonical chunk.
+
+Candidates are found with banded LSH: the MINHASH_BINS signature values
+are hashed in MINHASH_BANDS bands, and chunks sharing any band hash are
+compared on their full signatures. Fingerprints of stored chunks are kept in
+chunk_fingerprints (GIN index on the band hashes, see
+db/migrations/010_chunk_dedup.sql); duplicates within the document being
+ingested are found with a local index before anything is stored. Similar
+pairs below the threshold can be missed as candidates (stored, never wrongly
+skipped): at 0.9 similarity a pair shares a band with probability > 0.999.
+
+Changing MINHASH_BINS, MINHASH_BANDS or the shingling invalidates
+stored fingerprints (truncate chunk_fingerprints and re-ingest).
+"""
+
+import hashlib
+import os
+import re
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+MINHASH_BINS = 64
+MINHASH_BANDS = 16
+SHINGLE_WORDS = 3
+
+# Bin values are the top 52 hash bits; densified values add the distance above
+# them, so signatures fit in Postgres BIGINT
+_VALUE_BITS = 52
+_EMPTY = 1 << 63
+_WORD_RE = re.compile(r"\w+")
+
+# (document_id, chunk_index) of a fingerprinted chunk
+ChunkRef = tuple[str, int]
+
+
+def dedup_enabled() -> bool:
+    """Whether ingest skips near-duplicate chunks (INGEST_DEDUP, needs 010_chunk_dedup.sql)."""
+    return os.getenv("INGEST_DEDUP", "false").lower() == "true"
+
+
+def get_dedup_min_similarity() -> float:
+    """Estimated Jaccard similarity at which a chunk counts as a duplicate (INGEST_DEDUP_MIN_SIMILARITY, default 0.9)."""
+    return float(os.getenv("INGEST_DEDUP_MIN_SIMILARITY", "0.9"))
+
+
+def minhash_signature(text: str) -> list[int] | None:
+    """
+    MinHash signature of the text's word 3-grams (lowercased), or None if it has no words.
+
+    One-permutation hashing: each shingle is hashed once; the low bits pick
+    one of MINHASH_BINS bins and the rest is the value whose minimum the bin
+    keeps. An empty bin takes the next non-empty bin's value, offset by the
+    distance, so short texts still get a full signature. Two signatures agree
+    in a position with probability close to the Jaccard similarity of the
+    shingle sets, at the cost of one hash per shingle instead of one per
+    shingle and position.
+    """
+    words = _WORD_RE.findall(text.lower())
+    if not words:
+        return None
+    signature = [_EMPTY] * MINHASH_BINS
+    for i in range(max(1, len(words) - SHINGLE_WORDS + 1)):
+        h = int.from_bytes(hashlib.blake2b(" ".join(words[i:i + SHINGLE_WORDS]).encode("utf-8"), digest_size=8).digest(), "big")
+        bin_index, value = h & (MINHASH_BINS - 1), h >> (64 - _VALUE_BITS)
+        if value < signature[bin_index]:
+            signature[bin_index] = value
+    filled = list(signature)
+    for bin_index in range(MINHASH_BINS):
+        if signature[bin_index] == _EMPTY:
+            distance = 1
+            while signature[(bin_index + distance) % MINHASH_BINS] == _EMPTY:
+                distance += 1
+            filled[bin_index] = signature[(bin_index + distance) % MINHASH_BINS] + (distance << _VALUE_BITS)
+    return filled
+
+
+def signature_bands(signature: list[int]) -> list[int]:
+    """LSH band hashes of a signature, as signed 64-bit ints (Postgres BIGINT)."""
+    rows = len(signature) // MINHASH_BANDS
+    bands = []
+    for band in range(MINHASH_BANDS):
+        values = signature[band * rows:(band + 1) * rows]
+        digest = hashlib.blake2b(b"".join(v.to_bytes(8, "big") for v in values), digest_size=8).digest()
+        # Band number is mixed in so equal values in different bands do not collide
+        bands.append(int.from_bytes(digest, "big", signed=True) ^ band)
+    return bands
+
+
+def signature_similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity: the fraction of signature positions that agree."""
+    return sum(x == y for x, y in zip(a, b)) / len(a)
+
+
+class MinHashIndex:
+    """In-memory LSH index of signatures, for duplicates within one document."""
+
+    def __init__(self):
+        self._buckets: dict[int, list[tuple[ChunkRef, list[int]]]] = {}
+
+    def add(self, ref: ChunkRef, signature: list[int], bands: list[int] | None = None) -> None:
+        for band in bands or signature_bands(signature):
+            self._buckets.setdefault(band, []).append((ref, signature))
+
+    def find(self, signature: list[int], min_similarity: float, bands: list[int] | None = None) -> tuple[ChunkRef, float] | None:
+        """Most similar indexed ref with similarity >= min_similarity, as (ref, similarity)."""
+        best = None
+        seen = set()
+        for band in bands or signature_bands(signature):
+            for ref, candidate in self._buckets.get(band, ()):
+                if ref in seen:
+                    continue
+                seen.add(ref)
+                similarity = signature_similarity(signature, candidate)
+                if similarity >= min_similarity and (best is None or similarity > best[1]):
+                    best = (ref, similarity)
+        return best
+
+
+@dataclass
+class DedupPlan:
+    """
+    Outcome of fingerprinting a document's chunks.
+
+    `duplicates` maps chunk_index to a chunk_duplicates row for each chunk to
+    skip; `fingerprints` maps chunk_index to a chunk_fingerprints row for each
+    chunk to store.
+    """
+
+    duplicates: dict[int, dict] = field(default_factory=dict)
+    fingerprints: dict[int, dict] = field(default_factory=dict)
+
+
+def fingerprint_chunks(chunks: list[str], start_index: int = 0) -> list[dict]:
+    """Fingerprint rows (chunk_index, bands, signature) for chunks[start_index:] that have words."""
+    rows = []
+    for index in range(start_index, len(chunks)):
+        signature = minhash_signature(chunks[index])
+        if signature is not None:
+            rows.append({"chunk_index": index, "bands": signature_bands(signature), "signature": signature})
+    return rows
+
+
+def plan_dedup(
+    document_id: str,
+    chunks: list[str],
+    rows: list[dict],
+    stored_matches: list[dict],
+    own_fingerprints: Sequence[dict] = (),
+    min_similarity: float | None = None,
+) -> DedupPlan:
+    """
+    Decide which fingerprinted chunks are near-duplicates of a stored chunk or
+    of an earlier chunk of the same document (the first occurrence is kept).
+
+    Args:
+        rows: fingerprint_chunks() output
+        stored_matches: find_chunk_near_duplicates() output for rows
+        own_fingerprints: This document's stored fingerprints (chunks an
+            earlier attempt already committed)
+    """
+    if min_similarity is None:
+        min_similarity = get_dedup_min_similarity()
+    plan = DedupPlan()
+    local = MinHashIndex()
+    for row in own_fingerprints:
+        local.add((document_id, row["chunk_index"]), row["signature"], row["bands"])
+    stored = {match["chunk_index"]: match for match in stored_matches}
+
+    for row in rows:
+        index = row["chunk_index"]
+        match = stored.get(index)
+        if match is not None:
+            canonical = (match["canonical_document_id"], match["canonical_chunk_index"])
+            similarity = match["similarity"]
+        else:
+            found = local.find(row["signature"], min_similarity, row["bands"])
+            if found is None:
+                local.add((document_id, index), row["signature"], row["bands"])
+                plan.fingerprints[index] = {"document_id": document_id, **row}
+                continue
+            canonical, similarity = found
+        plan.duplicates[index] = {
+            "document_id": document_id,
+            "chunk_index": index,
+            "canonical_document_id": canonical[0],
+            "canonical_chunk_index": canonical[1],
+            "similarity": round(similarity, 4),
+            "content_bytes": len(chunks[index].encode("utf-8")),
+        }
+    return plan
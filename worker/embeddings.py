@@ -2,11 +2,61 @@
 
 import hashlib
 import json
+import math
 import os
+import random
+import re
+import time
 import urllib.error
 import urllib.request
+import zlib
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
 from typing import List
 
+from .connections import urlopen
+from .ratelimit import RateLimiter
+
+# HTTP statuses worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+@dataclass
+class RequestStats:
+    """Counts of provider requests issued and retried (for ingest reporting)."""
+
+    requests: int = 0
+    retries: int = 0
+
+
+def get_embedding_dimensions() -> int:
+    """Get full embedding dimension from EMBEDDING_DIMENSIONS env var (default 1536)."""
+    return int(os.getenv("EMBEDDING_DIMENSIONS", "1536"))
+
+
+def get_coarse_dimensions() -> int:
+    """Get coarse embedding dimension from EMBEDDING_COARSE_DIMENSIONS env var.
+    
+    0 (the default) disables the coarse vector and two-stage search.
+    """
+    return int(os.getenv("EMBEDDING_COARSE_DIMENSIONS", "0"))
+
+
+def shorten_embedding(embedding: List[float], dimensions: int) -> List[float]:
+    """
+    Shorten an embedding to its first `dimensions` values and L2-normalize it.
+    
+    This is what the OpenAI `dimensions` parameter does server-side for
+    text-embedding-3 models, so the coarse vector can be derived from the
+    full one without a second API call.
+    """
+    prefix = embedding[:dimensions]
+    norm = math.sqrt(sum(v * v for v in prefix))
+    if norm == 0:
+        return list(prefix)
+    return [v / norm for v in prefix]
+
 
 def get_fake_embedding(text: str, dimension: int = 1536) -> List[float]:
     """
@@ -30,8 +80,114 @@ def get_fake_embedding(text: str, dimension: int = 1536) -> List[float]:
     return vector
 
 
-def get_openai_embedding(text: str, model: str = "text-embedding-3-small") -> List[float]:
-    """Generate embedding using OpenAI API via raw HTTPS (stdlib only)."""
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# Very common English words carry little retrieval signal; the local embedder
+# drops them (a fixed stand-in for IDF, which needs corpus statistics)
+STOPWORDS = frozenset(
+    "a an and are as at be been but by can could did do does for from had has have how i if in "
+    "into is it its me my no not of on or our so than that the their them then there these they "
+    "this to was we were what when where which who why will with would you your".split()
+)
+
+# Weight of word-bigram features relative to unigrams
+LOCAL_BIGRAM_WEIGHT = 0.5
+
+
+@lru_cache(maxsize=65536)
+def _token_hash(token: str) -> int | None:
+    """crc32 of a lowercased token (plural 's' stripped), or None for stopwords."""
+    if token in STOPWORDS:
+        return None
+    if len(token) > 3 and token[-1] == "s" and token[-2] != "s":
+        token = token[:-1]
+    return zlib.crc32(token.encode("utf-8"))
+
+
+def get_local_embedding(text: str, dimension: int = 1536) -> List[float]:
+    """
+    Embed text locally with the hashing trick (stdlib only, no network).
+    
+    Unigrams and word bigrams are hashed (crc32) to one of `dimension` buckets
+    with a hash-derived sign, i.e. a sparse random projection of the
+    bag-of-words vector, weighted by sublinear term frequency (1 + ln tf).
+    The result is L2-normalized, so cosine similarity reflects shared
+    vocabulary: texts about the same things score high, unrelated texts near 0.
+    Deterministic across processes and machines.
+    """
+    hashes = [h for h in map(_token_hash, _TOKEN_RE.findall(text.lower())) if h is not None]
+    vector = [0.0] * dimension
+    if not hashes:
+        # No content words: fixed unit vector rather than zeros (cosine of a
+        # zero vector is undefined in pgvector)
+        vector[0] = 1.0
+        return vector
+    
+    buckets: dict[int, float] = {}
+    features = [(Counter(hashes), 1.0)]
+    if len(hashes) > 1:
+        bigrams = Counter(((a * 0x9E3779B1) ^ b) & 0xFFFFFFFF for a, b in zip(hashes, hashes[1:]))
+        features.append((bigrams, LOCAL_BIGRAM_WEIGHT))
+    for counts, scale in features:
+        for h, count in counts.items():
+            weight = scale * (1.0 + math.log(count))
+            index = h % dimension
+            buckets[index] = buckets.get(index, 0.0) + (-weight if h >> 31 else weight)
+    
+    norm = math.sqrt(sum(v * v for v in buckets.values())) or 1.0
+    for index, value in buckets.items():
+        vector[index] = value / norm
+    return vector
+
+
+@lru_cache(maxsize=1)
+def get_embedding_rate_limiter() -> RateLimiter | None:
+    """
+    Per-process limiter for OpenAI requests, or None when unlimited.
+    
+    EMBEDDING_REQUESTS_PER_MINUTE and EMBEDDING_TOKENS_PER_MINUTE (tokens
+    estimated as UTF-8 bytes / 4) default to 0, i.e. no limit.
+    """
+    requests_per_minute = float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "0"))
+    tokens_per_minute = float(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "0"))
+    if not requests_per_minute and not tokens_per_minute:
+        return None
+    return RateLimiter(requests_per_minute, tokens_per_minute)
+
+
+def _retry_delay(attempt: int, error: urllib.error.HTTPError | None = None) -> float:
+    """Seconds to wait before retry `attempt` (1-based): Retry-After if given, else backoff with jitter."""
+    if error is not None and error.headers is not None:
+        retry_after = error.headers.get("Retry-After")
+        if retry_after:
+            try:
+                return min(float(retry_after), 30.0)
+            except ValueError:
+                pass
+    base = float(os.getenv("EMBEDDING_RETRY_BASE_SECONDS", "0.5"))
+    return base * (2 ** (attempt - 1)) * (0.5 + random.random())
+
+
+def get_openai_embeddings(
+    texts: List[str],
+    model: str = "text-embedding-3-small",
+    dimensions: int | None = None,
+    stats: RequestStats | None = None,
+    timeout: float | None = None,
+) -> List[List[float]]:
+    """Generate embeddings for several texts in one OpenAI API request (stdlib only).
+    
+    If `dimensions` is given, the API returns shortened embeddings of that size.
+    Rate limits (429), transient server errors and network errors (including
+    timeouts) are retried up to EMBEDDING_MAX_RETRIES times (default 3) with
+    exponential backoff. Each attempt times out after EMBEDDING_TIMEOUT_SECONDS
+    (default 30) and first waits for the rate limiter, if configured (see
+    get_embedding_rate_limiter); `timeout`, if given, bounds all attempts,
+    rate-limit waits and backoff together and TimeoutError is raised when it
+    runs out.
+    Requests and retries are counted in `stats` if given.
+    Embeddings are returned in input order.
+    """
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OPENAI_API_KEY is required for OpenAI embeddings")
@@ -42,52 +198,161 @@ def get_openai_embedding(text: str, model: str = "text-embedding-3-small") -> Li
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
-    data = json.dumps({
+    payload = {
         "model": model,
-        "input": text,
-    }).encode("utf-8")
+        "input": texts,
+    }
+    if dimensions:
+        payload["dimensions"] = dimensions
+    data = json.dumps(payload).encode("utf-8")
     
-    # Make HTTPS request
+    max_retries = int(os.getenv("EMBEDDING_MAX_RETRIES", "3"))
+    attempt_timeout = float(os.getenv("EMBEDDING_TIMEOUT_SECONDS", "30"))
+    deadline = time.monotonic() + timeout if timeout is not None else None
+    limiter = get_embedding_rate_limiter()
+    estimated_tokens = sum(len(text.encode("utf-8")) for text in texts) // 4
+    attempt = 0
+    while True:
+        if limiter is not None:
+            remaining = deadline - time.monotonic() if deadline is not None else None
+            if not limiter.acquire(estimated_tokens, timeout=remaining):
+                raise TimeoutError(f"OpenAI embedding request exceeded {timeout:.2f}s waiting for the rate limit")
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise TimeoutError(f"OpenAI embedding request exceeded {timeout:.2f}s")
+            attempt_timeout = min(attempt_timeout, remaining)
+        if stats is not None:
+            stats.requests += 1
+        try:
+            return _request_openai_embeddings(url, data, headers, len(texts), attempt_timeout)
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRYABLE_STATUS_CODES or attempt >= max_retries:
+                raise _openai_error(e) from e
+            delay = _retry_delay(attempt + 1, e)
+        except (urllib.error.URLError, TimeoutError) as e:
+            if attempt >= max_retries:
+                if deadline is not None and isinstance(e, TimeoutError):
+                    raise
+                raise ValueError(f"Error generating OpenAI embedding: {e}") from e
+            delay = _retry_delay(attempt + 1)
+        if deadline is not None and time.monotonic() + delay >= deadline:
+            raise TimeoutError(f"OpenAI embedding request exceeded {timeout:.2f}s")
+        attempt += 1
+        if stats is not None:
+            stats.retries += 1
+        time.sleep(delay)
+
+
+def _openai_error(e: urllib.error.HTTPError) -> ValueError:
+    """Convert an OpenAI HTTP error to a ValueError with the API's message."""
+    error_body = e.read().decode("utf-8") if e.fp else ""
+    try:
+        error_data = json.loads(error_body)
+        error_msg = error_data.get("error", {}).get("message", error_body)
+    except Exception:
+        error_msg = error_body
+    return ValueError(f"OpenAI API error ({e.code}): {error_msg}")
+
+
+def _request_openai_embeddings(
+    url: str,
+    data: bytes,
+    headers: dict,
+    expected: int,
+    timeout: float,
+) -> List[List[float]]:
+    """Send one embeddings request; HTTP, network and timeout errors propagate for retry handling."""
     request = urllib.request.Request(url, data=data, headers=headers, method="POST")
     
     try:
-        with urllib.request.urlopen(request) as response:
+        with urlopen(request, timeout=timeout) as response:
             response_data = json.loads(response.read().decode("utf-8"))
             
-            # Extract embedding from response
-            if "data" in response_data and len(response_data["data"]) > 0:
-                embedding = response_data["data"][0]["embedding"]
-                if isinstance(embedding, list):
-                    return [float(x) for x in embedding]
-                else:
-                    raise ValueError(f"Unexpected embedding format: {type(embedding)}")
-            else:
+            # Extract embeddings from response (one item per input, with its index)
+            items = response_data.get("data") if isinstance(response_data, dict) else None
+            if not items or len(items) != expected:
                 raise ValueError(f"Invalid response format: {response_data}")
+            
+            embeddings: List[List[float]] = [[] for _ in range(expected)]
+            for item in items:
+                embedding = item["embedding"]
+                if not isinstance(embedding, list):
+                    raise ValueError(f"Unexpected embedding format: {type(embedding)}")
+                embeddings[item.get("index", 0)] = [float(x) for x in embedding]
+            return embeddings
                 
-    except urllib.error.HTTPError as e:
-        error_body = e.read().decode("utf-8") if e.fp else ""
-        try:
-            error_data = json.loads(error_body)
-            error_msg = error_data.get("error", {}).get("message", error_body)
-        except Exception:
-            error_msg = error_body
-        raise ValueError(f"OpenAI API error ({e.code}): {error_msg}") from e
+    except (urllib.error.URLError, TimeoutError):
+        raise
     except Exception as e:
         raise ValueError(f"Error generating OpenAI embedding: {e}") from e
 
 
-def get_embedding(text: str) -> List[float]:
+def get_openai_embedding(
+    text: str,
+    model: str = "text-embedding-3-small",
+    dimensions: int | None = None,
+    timeout: float | None = None,
+) -> List[float]:
+    """Generate embedding using OpenAI API via raw HTTPS (stdlib only).
+    
+    If `dimensions` is given, the API returns a shortened embedding of that size.
+    `timeout` bounds the request including retries (see get_openai_embeddings).
+    """
+    return get_openai_embeddings([text], model=model, dimensions=dimensions, timeout=timeout)[0]
+
+
+def get_embedding(text: str, timeout: float | None = None) -> List[float]:
     """
     Get embedding for text based on EMBEDDING_MODE env var.
     
     Modes:
-    - 'fake': Deterministic hash-based embedding (default, 1536 dimensions)
-    - 'openai': OpenAI text-embedding-3-small (1536 dimensions, uses raw HTTPS)
+    - 'fake': Deterministic hash-based embedding (default)
+    - 'local': Hashing-trick bag-of-words embedding, computed in-process
+      (semantically meaningful for keyword overlap; see get_local_embedding)
+    - 'openai': OpenAI text-embedding-3-small (uses raw HTTPS)
+    
+    All produce EMBEDDING_DIMENSIONS values (default 1536). `timeout` is the
+    overall time budget for a provider request, retries included.
+    """
+    mode = os.getenv("EMBEDDING_MODE", "fake").lower()
+    dimensions = get_embedding_dimensions()
+    
+    if mode == "openai":
+        return get_openai_embedding(text, dimensions=dimensions, timeout=timeout)
+    elif mode == "local":
+        return get_local_embedding(text, dimension=dimensions)
+    else:
+        return get_fake_embedding(text, dimension=dimensions)
+
+
+def get_embeddings(
+    texts: List[str],
+    stats: RequestStats | None = None,
+    timeout: float | None = None,
+) -> List[List[float]]:
     """
+    Get embeddings for several texts based on EMBEDDING_MODE env var.
+    
+    Same modes as get_embedding; 'openai' sends all texts in one request, so
+    callers should keep batches within the API limits (see EMBEDDING_BATCH_SIZE).
+    Provider requests and retries are counted in `stats` if given; `timeout`
+    bounds the provider request, retries included.
+    """
+    if not texts:
+        return []
+    
     mode = os.getenv("EMBEDDING_MODE", "fake").lower()
+    dimensions = get_embedding_dimensions()
     
     if mode == "openai":
-        return get_openai_embedding(text)
+        return get_openai_embeddings(texts, dimensions=dimensions, stats=stats, timeout=timeout)
+    elif mode == "local":
+        return [get_local_embedding(text, dimension=dimensions) for text in texts]
     else:
-        return get_fake_embedding(text)
+        return [get_fake_embedding(text, dimension=dimensions) for text in texts]
+
 
+def get_embedding_batch_size() -> int:
+    """Get texts per embedding request from EMBEDDING_BATCH_SIZE env var (default 64)."""
+    return max(1, int(os.getenv("EMBEDDING_BATCH_SIZE", "64")))
@@ -1,26 +1,222 @@
 """Document ingestion logic."""
 
-import json
 import logging
 import os
-
-import boto3
+import time
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import UTC, datetime
+from functools import lru_cache
 
 from .chunking import chunk_text
-from .embeddings import get_embedding
-from .supabase_db import insert_chunks, insert_document
-from .utils import extract_trace_id_from_key, generate_trace_id, log_structured
+from .dedup import dedup_enabled, fingerprint_chunks, get_dedup_min_similarity, plan_dedup
+from .embeddings import (
+    RequestStats,
+    get_coarse_dimensions,
+    get_embedding_batch_size,
+    get_embedding_dimensions,
+    get_embeddings,
+)
+from .pipeline import run_pipeline
+from .supabase_db import (
+    centroids_enabled,
+    checkpoints_enabled,
+    delete_document,
+    find_chunk_near_duplicates,
+    get_chunk_fingerprints,
+    get_ingest_job,
+    insert_chunk_duplicates,
+    insert_chunk_fingerprints,
+    insert_chunks,
+    insert_document,
+    refresh_document_centroid,
+    save_ingest_job,
+    update_ingest_job,
+)
+from .tracing import span
+from .utils import (
+    extract_trace_id_from_key,
+    generate_trace_id,
+    log_structured,
+    s3_objects_from_message,
+)
 
 logger = logging.getLogger(__name__)
 
+# Stage names in pipeline order; embedding time is summed over all batches
+INGEST_STAGES = ("s3_download", "chunking", "insert_document", "dedup", "embedding", "db_insert", "centroid")
+
+
+@lru_cache(maxsize=1)
+def get_s3_client():
+    """
+    S3 client, created once per container.
+    
+    boto3 is imported here rather than at module level so importing the worker
+    (tests, tools) stays cheap; lambda_handler calls this during the init phase.
+    """
+    import boto3
+    
+    return boto3.client("s3", region_name=os.getenv("AWS_REGION", "us-east-1"))
+
+
+def get_checkpoint_chunks() -> int:
+    """
+    Chunks per insert and durable commit with INGEST_CHECKPOINTS=true
+    (INGEST_CHECKPOINT_CHUNKS, default 512).
+    
+    Rounded up to a multiple of EMBEDDING_BATCH_SIZE so every embedding
+    request but the last is full.
+    """
+    batch_size = get_embedding_batch_size()
+    chunks = max(1, int(os.getenv("INGEST_CHECKPOINT_CHUNKS", "512")))
+    return -(-chunks // batch_size) * batch_size
+
+
+def get_pipeline_depth() -> int:
+    """
+    Embedding batches each ingest pipeline queue holds (INGEST_PIPELINE_DEPTH, default 2).
+    
+    0 runs embedding and inserts one after the other in one thread.
+    """
+    return max(0, int(os.getenv("INGEST_PIPELINE_DEPTH", "2")))
+
+
+def get_slow_ingest_ms() -> float:
+    """Total ingest time above which an ingest_slow warning is logged (SLOW_INGEST_MS, 0 disables)."""
+    return float(os.getenv("SLOW_INGEST_MS", "30000"))
+
+
+@dataclass
+class IngestStats:
+    """Per-stage timings and throughput counters for one ingest."""
+
+    stage_ms: dict[str, float] = field(default_factory=dict)
+    size_bytes: int = 0
+    chunk_count: int = 0
+    embedding: RequestStats = field(default_factory=RequestStats)
+    db_payload_bytes: int = 0
+    resumed_from_chunk: int = 0
+    duplicate_chunks: int = 0
+    dedup_saved_bytes: int = 0
+    queues: dict[str, dict] = field(default_factory=dict)
+    started_at: float = field(default_factory=time.perf_counter)
+
+    @contextmanager
+    def stage(self, name: str, span_name: str | None = None, **attributes) -> Iterator:
+        """Time a block into stage_ms[name] (accumulating) and record it as a span."""
+        start = time.perf_counter()
+        try:
+            with span(span_name or name, **attributes) as stage_span:
+                yield stage_span
+        finally:
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            self.stage_ms[name] = self.stage_ms.get(name, 0.0) + elapsed_ms
+
+    def summary(self) -> dict:
+        """Fields for the ingest_completed / ingest_slow events."""
+        total_ms = (time.perf_counter() - self.started_at) * 1000
+        total_s = total_ms / 1000
+        return {
+            "total_ms": round(total_ms, 1),
+            "stage_ms": {name: round(self.stage_ms[name], 1) for name in INGEST_STAGES if name in self.stage_ms},
+            "size_bytes": self.size_bytes,
+            "chunk_count": self.chunk_count,
+            "bytes_per_s": round(self.size_bytes / total_s, 1) if total_s else 0.0,
+            "chunks_per_s": round(self.chunk_count / total_s, 2) if total_s else 0.0,
+            "embedding_requests": self.embedding.requests,
+            "embedding_retries": self.embedding.retries,
+            "db_payload_bytes": self.db_payload_bytes,
+            "resumed_from_chunk": self.resumed_from_chunk,
+            "duplicate_chunks": self.duplicate_chunks,
+            "dedup_saved_bytes": self.dedup_saved_bytes,
+            "queues": self.queues,
+        }
+
 
-def ingest_document(bucket: str, key: str) -> None:
+@dataclass
+class _Target:
+    """Where an ingest writes: the document, its timestamp and the first chunk still to store."""
+
+    doc_id: str
+    created_at: datetime
+    trace_id: str
+    start_index: int = 0
+    completed: bool = False
+
+
+def _open_document(bucket: str, key: str, trace_id: str, etag: str | None, chunk_count: int) -> _Target:
+    """
+    Create the document record, or with INGEST_CHECKPOINTS=true resume the one
+    an earlier attempt left.
+    
+    A job is resumed only if the object's ETag and chunk count still match;
+    otherwise the stale document is deleted and ingest starts over.
+    """
+    filename = key.split("/")[-1]
+    if not checkpoints_enabled():
+        created_at = datetime.now(UTC)
+        return _Target(insert_document(trace_id, bucket, key, filename, created_at=created_at), created_at, trace_id)
+    
+    job = get_ingest_job(bucket, key)
+    if job is not None:
+        if job["etag"] == etag and job["chunk_count"] == chunk_count:
+            update_ingest_job(bucket, key, attempts=job["attempts"] + 1)
+            return _Target(
+                str(job["document_id"]),
+                datetime.fromisoformat(job["document_created_at"]),
+                job["trace_id"],
+                start_index=job["next_chunk_index"],
+                completed=job["status"] == "completed",
+            )
+        delete_document(str(job["document_id"]))
+    
+    created_at = datetime.now(UTC)
+    doc_id = insert_document(trace_id, bucket, key, filename, created_at=created_at)
+    save_ingest_job({
+        "source_bucket": bucket,
+        "source_key": key,
+        "etag": etag,
+        "document_id": doc_id,
+        "document_created_at": created_at.isoformat(),
+        "trace_id": trace_id,
+        "chunk_count": chunk_count,
+    })
+    return _Target(doc_id, created_at, trace_id)
+
+
+def ingest_document(bucket: str, key: str) -> dict:
     """
     Ingest a document from S3: download, chunk, embed, store.
     
+    Each stage is recorded as a span under the document's trace_id
+    (see worker.tracing) and timed into the ingest_completed summary event.
+    Ingests slower than SLOW_INGEST_MS also log an ingest_slow warning.
+    
+    Embedding and inserts are pipelined (see worker.pipeline): embedding
+    batches flow through a bounded queue to the insert stage. With
+    INGEST_CHECKPOINTS=true it writes INGEST_CHECKPOINT_CHUNKS chunks at a
+    time while later batches are still being embedded, records each insert in
+    the object's ingest_jobs row, and a retry of the same object resumes after
+    the last committed insert (a completed object is skipped). Otherwise all
+    chunks are inserted in one request once the last batch is embedded, so a
+    killed ingest never leaves a partial document for a retry or replay to
+    mistake for a finished one. Queue depths and wait times are reported as
+    `queues`.
+    
+    With INGEST_DEDUP=true, near-duplicates of stored chunks or of earlier
+    chunks of the document are linked in chunk_duplicates instead of being
+    embedded and stored (see worker.dedup). With DOCUMENT_CENTROIDS=true, the
+    document's centroid embedding (for hierarchical retrieval) is recomputed
+    from its stored chunks once all of them are in.
+    
     Args:
         bucket: S3 bucket name
         key: S3 object key
+    
+    Returns:
+        The ingest_completed fields: doc_id plus IngestStats.summary()
     """
     # Extract or generate trace_id
     trace_id = extract_trace_id_from_key(key)
@@ -29,43 +225,157 @@ def ingest_document(bucket: str, key: str) -> None:
         log_structured("warning", "trace_id_not_in_key", trace_id, key=key)
     
     log_structured("info", "ingest_started", trace_id, bucket=bucket, key=key)
+    stats = IngestStats()
+    target = None
     
     try:
-        # Download from S3
-        s3_client = boto3.client("s3", region_name=os.getenv("AWS_REGION", "us-east-1"))
-        response = s3_client.get_object(Bucket=bucket, Key=key)
-        text = response["Body"].read().decode("utf-8")
-        
-        log_structured("info", "document_downloaded", trace_id, size_bytes=len(text))
-        
-        # Extract filename from key
-        filename = key.split("/")[-1]
-        
-        # Insert document record
-        doc_id = insert_document(trace_id, bucket, key, filename)
-        log_structured("info", "document_inserted", trace_id, doc_id=doc_id)
-        
-        # Chunk text
-        chunks = chunk_text(text)
-        log_structured("info", "text_chunked", trace_id, chunk_count=len(chunks))
-        
-        # Generate embeddings
-        embeddings = []
-        for i, chunk in enumerate(chunks):
-            embedding = get_embedding(chunk)
-            embeddings.append(embedding)
-            if (i + 1) % 10 == 0:
-                log_structured("info", "embeddings_progress", trace_id, processed=i + 1, total=len(chunks))
+        with span("ingest", trace_id=trace_id, bucket=bucket, key=key) as ingest_span:
+            # Download from S3
+            with stats.stage("s3_download") as download_span:
+                response = get_s3_client().get_object(Bucket=bucket, Key=key)
+                raw = response["Body"].read()
+                text = raw.decode("utf-8")
+                stats.size_bytes = len(raw)
+                download_span.set_attribute("size_bytes", stats.size_bytes)
+            
+            log_structured("info", "document_downloaded", trace_id, size_bytes=stats.size_bytes)
+            
+            # Chunk text
+            with stats.stage("chunking") as chunking_span:
+                chunks = chunk_text(text)
+                stats.chunk_count = len(chunks)
+                chunking_span.set_attribute("chunk_count", len(chunks))
+            log_structured("info", "text_chunked", trace_id, chunk_count=len(chunks))
+            
+            # Insert (or resume) the document record; its chunks share the timestamp (and partition)
+            with stats.stage("insert_document"):
+                target = _open_document(bucket, key, trace_id, response.get("ETag"), len(chunks))
+            doc_id = target.doc_id
+            stats.resumed_from_chunk = target.start_index
+            log_structured("info", "document_inserted", trace_id, doc_id=doc_id, resumed_from_chunk=target.start_index)
+            if target.completed:
+                log_structured("info", "ingest_skipped", trace_id, doc_id=doc_id, reason="already_completed")
+                return {"doc_id": doc_id, "skipped": True, **stats.summary()}
+            
+            checkpoints = checkpoints_enabled()
+            
+            # Skip near-duplicates of stored chunks and of earlier chunks of this document
+            duplicates: dict[int, dict] = {}
+            fingerprints: dict[int, dict] = {}
+            if dedup_enabled():
+                with stats.stage("dedup") as dedup_span:
+                    min_similarity = get_dedup_min_similarity()
+                    rows = fingerprint_chunks(chunks, target.start_index)
+                    plan = plan_dedup(
+                        doc_id, chunks, rows,
+                        find_chunk_near_duplicates(rows, min_similarity, doc_id),
+                        get_chunk_fingerprints(doc_id, target.start_index) if target.start_index else [],
+                        min_similarity,
+                    )
+                    duplicates, fingerprints = plan.duplicates, plan.fingerprints
+                    if checkpoints:
+                        insert_chunk_duplicates(list(duplicates.values()))
+                    vector_bytes = 4 * (get_embedding_dimensions() + get_coarse_dimensions())
+                    stats.duplicate_chunks = len(duplicates)
+                    stats.dedup_saved_bytes = sum(row["content_bytes"] + vector_bytes for row in duplicates.values())
+                    dedup_span.set_attribute("duplicate_chunks", len(duplicates))
+                log_structured(
+                    "info", "chunks_deduplicated", trace_id,
+                    duplicate_chunks=stats.duplicate_chunks, saved_bytes=stats.dedup_saved_bytes,
+                )
+            
+            # Embed in batches (one provider request per batch) while earlier
+            # batches are inserted, committing commit_size chunks at a time;
+            # without checkpoints nothing records a partial insert, so commit once
+            batch_size = get_embedding_batch_size()
+            commit_size = get_checkpoint_chunks() if checkpoints else max(1, len(chunks))
+            kept = [index for index in range(target.start_index, len(chunks)) if index not in duplicates]
+            pending: list[tuple[list[int], list[list[float]]]] = []
+            
+            def embed(indices: list[int]) -> tuple[list[int], list[list[float]]]:
+                batch = [chunks[index] for index in indices]
+                with stats.stage("embedding", "embedding_batch", batch_index=indices[0] // batch_size, batch_size=len(batch)):
+                    embeddings = get_embeddings(batch, stats=stats.embedding)
+                log_structured(
+                    "info", "embeddings_progress", trace_id,
+                    processed=indices[-1] + 1, total=len(chunks),
+                )
+                return indices, embeddings
+            
+            def insert(item: tuple[list[int], list[list[float]]]) -> None:
+                pending.append(item)
+                last = item[0][-1] == kept[-1]
+                if sum(len(indices) for indices, _ in pending) < commit_size and not last:
+                    return
+                commit_indices = [index for indices, _ in pending for index in indices]
+                commit_embeddings = [vector for _, vectors in pending for vector in vectors]
+                commit_end = len(chunks) if last else commit_indices[-1] + 1
+                pending.clear()
+                with stats.stage("db_insert", chunk_count=len(commit_indices)):
+                    stats.db_payload_bytes += insert_chunks(
+                        doc_id, target.trace_id, [chunks[index] for index in commit_indices], commit_embeddings,
+                        created_at=target.created_at, ignore_duplicates=checkpoints, chunk_indices=commit_indices,
+                    )
+                    if fingerprints:
+                        insert_chunk_fingerprints([fingerprints[index] for index in commit_indices if index in fingerprints])
+                    if checkpoints:
+                        update_ingest_job(bucket, key, next_chunk_index=commit_end)
+                log_structured(
+                    "info", "chunks_inserted", trace_id,
+                    count=commit_end, total=len(chunks), payload_bytes=stats.db_payload_bytes,
+                )
+            
+            batches = (kept[start:start + batch_size] for start in range(0, len(kept), batch_size))
+            stats.queues = run_pipeline(batches, [("embed", embed)], ("insert", insert), depth=get_pipeline_depth())
+            if duplicates and not checkpoints:
+                # Only after the chunks: linked chunks make the object count as ingested
+                with stats.stage("dedup"):
+                    insert_chunk_duplicates(list(duplicates.values()))
+            
+            if centroids_enabled():
+                with stats.stage("centroid"):
+                    refresh_document_centroid(doc_id, target.created_at)
+            if checkpoints:
+                update_ingest_job(bucket, key, status="completed")
+            log_structured("info", "embeddings_generated", trace_id, count=len(kept))
+            
+            ingest_span.set_attribute("doc_id", doc_id)
+            ingest_span.set_attribute("chunk_count", len(chunks))
         
-        log_structured("info", "embeddings_generated", trace_id, count=len(embeddings))
+        summary = stats.summary()
+        log_structured("info", "ingest_completed", trace_id, doc_id=doc_id, **summary)
         
-        # Insert chunks with embeddings
-        insert_chunks(doc_id, trace_id, chunks, embeddings)
-        log_structured("info", "chunks_inserted", trace_id, count=len(chunks))
-        
-        log_structured("info", "ingest_completed", trace_id)
+        slow_ingest_ms = get_slow_ingest_ms()
+        if slow_ingest_ms and summary["total_ms"] > slow_ingest_ms:
+            slowest_stage = max(summary["stage_ms"], key=summary["stage_ms"].get)
+            log_structured(
+                "warning",
+                "ingest_slow",
+                trace_id,
+                doc_id=doc_id,
+                threshold_ms=slow_ingest_ms,
+                slowest_stage=slowest_stage,
+                **summary,
+            )
         
+        return {"doc_id": doc_id, **summary}
+    
     except Exception as e:
-        log_structured("error", "ingest_failed", trace_id, error=str(e))
+        log_structured("error", "ingest_failed", trace_id, error=str(e), **stats.summary())
+        if target is not None and not checkpoints_enabled():
+            # Without checkpoints a retry starts over; do not leave its document behind
+            try:
+                delete_document(target.doc_id)
+            except Exception as cleanup_error:
+                log_structured("warning", "ingest_cleanup_failed", trace_id, doc_id=target.doc_id, error=str(cleanup_error))
         raise
 
+
+def ingest_message(body: str) -> list[dict]:
+    """
+    Ingest every S3 object in an SQS message body (an S3 event notification).
+    
+    Shared by lambda_handler and worker.consumer. Returns each object's
+    ingest summary; the first failure raises, so the message is retried.
+    """
+    return [ingest_document(bucket, key) for bucket, key in s3_objects_from_message(body)]
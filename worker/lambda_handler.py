@@ -4,16 +4,25 @@ import json
 import logging
 import os
 
-from .ingest import ingest_document
-from .utils import log_structured
+from .ingest import get_s3_client, ingest_message
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
-)
+# Configure logging. The Lambda runtime already installs a root handler (which
+# makes basicConfig a no-op there), so only the level needs setting in Lambda.
+if logging.getLogger().handlers:
+    logging.getLogger().setLevel(logging.INFO)
+else:
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
 logger = logging.getLogger(__name__)
 
+# Create the S3 client during the init phase, so the boto3 import and client
+# setup happen once per container rather than on the first invocation.
+# Skipped outside Lambda (tests, local tools) to keep imports side-effect free.
+if os.getenv("AWS_LAMBDA_FUNCTION_NAME"):
+    get_s3_client()
+
 
 def lambda_handler(event, context):
     """
@@ -31,30 +40,9 @@ def lambda_handler(event, context):
     # Process each SQS record
     for record in event.get("Records", []):
         try:
-            # Parse SQS message body (which contains S3 event)
-            body = json.loads(record["body"])
-            
-            # Extract S3 event records
-            s3_records = body.get("Records", [])
+            # SQS message body holds the S3 event notification
+            ingest_message(record["body"])
             
-            for s3_record in s3_records:
-                # Extract bucket and key from S3 event
-                s3_data = s3_record.get("s3", {})
-                bucket = s3_data.get("bucket", {}).get("name")
-                key = s3_data.get("object", {}).get("key")
-                
-                # URL decode the key
-                if key:
-                    import urllib.parse
-                    key = urllib.parse.unquote_plus(key)
-                
-                if not bucket or not key:
-                    logger.warning(f"Missing bucket or key in S3 event: {s3_record}")
-                    continue
-                
-                # Ingest the document
-                ingest_document(bucket, key)
-                
         except json.JSONDecodeError as e:
             logger.error(f"Failed to parse SQS message body: {e}")
             raise
@@ -0,0 +1,156 @@
+"""Bounded producer/consumer pipeline for ingest stages.
+
+Each stage runs in its own thread and hands results to the next through a
+bounded queue, so a slow stage blocks the one before it (backpressure)
+instead of letting work pile up in memory. The last stage (the sink) runs in
+the caller's thread. Items keep their order, the first error anywhere stops
+every stage and is re-raised to the caller, and stage threads run in a copy
+of the caller's context, so their spans nest under the caller's span. Stage
+threads last one run; keep-alive connections (worker.connections) are shared
+across threads, so they outlive them.
+
+Each queue reports how deep it got and how long its producer was blocked
+(downstream is the bottleneck) or its consumer was idle (upstream is).
+"""
+
+import contextvars
+import queue
+import threading
+import time
+from collections.abc import Callable, Iterable
+from typing import Any
+
+# Poll interval for blocked puts and gets, so a failure elsewhere is noticed
+_POLL_S = 0.05
+
+_DONE = object()
+
+
+class _CancelledError(Exception):
+    """Another stage failed; stop quietly."""
+
+
+class StageQueue:
+    """Bounded queue in front of a stage, recording depth and wait times."""
+
+    def __init__(self, name: str, maxsize: int, cancel: threading.Event):
+        self.name = name
+        self._queue: queue.Queue = queue.Queue(maxsize)
+        self._cancel = cancel
+        self.max_depth = 0
+        self._depth_total = 0
+        self._puts = 0
+        self.producer_blocked_s = 0.0
+        self.consumer_idle_s = 0.0
+
+    def put(self, item: Any) -> None:
+        start = time.perf_counter()
+        while True:
+            if self._cancel.is_set():
+                raise _CancelledError
+            try:
+                self._queue.put(item, timeout=_POLL_S)
+                break
+            except queue.Full:
+                continue
+        self.producer_blocked_s += time.perf_counter() - start
+        if item is not _DONE:
+            depth = self._queue.qsize()
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_total += depth
+            self._puts += 1
+
+    def get(self) -> Any:
+        start = time.perf_counter()
+        while True:
+            if self._cancel.is_set():
+                raise _CancelledError
+            try:
+                item = self._queue.get(timeout=_POLL_S)
+                break
+            except queue.Empty:
+                continue
+        self.consumer_idle_s += time.perf_counter() - start
+        return item
+
+    def stats(self) -> dict:
+        return {
+            "max_depth": self.max_depth,
+            "mean_depth": round(self._depth_total / self._puts, 2) if self._puts else 0.0,
+            "producer_blocked_ms": round(self.producer_blocked_s * 1000, 1),
+            "consumer_idle_ms": round(self.consumer_idle_s * 1000, 1),
+        }
+
+
+def run_pipeline(
+    source: Iterable,
+    stages: list[tuple[str, Callable[[Any], Any]]],
+    sink: tuple[str, Callable[[Any], None]],
+    depth: int = 2,
+) -> dict[str, dict]:
+    """
+    Feed source items through stages into sink, each stage in its own thread.
+
+    `stages` and `sink` are (name, fn) pairs; the queue in front of each is
+    named after it and holds at most `depth` items. With depth 0 everything
+    runs inline in the caller's thread, one item at a time (no overlap).
+
+    Returns each queue's stats (see StageQueue.stats).
+    """
+    sink_name, sink_fn = sink
+    if depth <= 0:
+        for item in source:
+            for _, fn in stages:
+                item = fn(item)
+            sink_fn(item)
+        return {}
+
+    cancel = threading.Event()
+    errors: list[BaseException] = []
+    queues = [StageQueue(name, depth, cancel) for name, _ in stages] + [StageQueue(sink_name, depth, cancel)]
+
+    def guarded(target: Callable, *args) -> None:
+        try:
+            target(*args)
+        except _CancelledError:
+            pass
+        except BaseException as e:
+            errors.append(e)
+            cancel.set()
+
+    def feed() -> None:
+        for item in source:
+            queues[0].put(item)
+        queues[0].put(_DONE)
+
+    def work(fn: Callable, inbox: StageQueue, outbox: StageQueue) -> None:
+        while (item := inbox.get()) is not _DONE:
+            outbox.put(fn(item))
+        outbox.put(_DONE)
+
+    def drain() -> None:
+        while (item := queues[-1].get()) is not _DONE:
+            sink_fn(item)
+
+    targets = [(feed,)] + [(work, fn, queues[i], queues[i + 1]) for i, (_, fn) in enumerate(stages)]
+    threads = [
+        threading.Thread(
+            target=contextvars.copy_context().run,
+            args=(guarded, *target),
+            name=f"ingest-{name}",
+            daemon=True,
+        )
+        for target, name in zip(targets, ["source"] + [name for name, _ in stages])
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        guarded(drain)
+    finally:
+        if errors:
+            cancel.set()
+        for thread in threads:
+            thread.join()
+    if errors:
+        raise errors[0]
+    return {q.name: q.stats() for q in queues}
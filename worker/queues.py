@@ -0,0 +1,160 @@
+"""Message queues the worker consumes outside Lambda: SQS and a local stand-in."""
+
+import json
+import os
+import threading
+import time
+from collections.abc import Iterator
+from dataclasses import dataclass
+
+
+@dataclass
+class Message:
+    """One queued S3-event message; receipt_handle identifies the current receive."""
+
+    body: str
+    receipt_handle: str | None = None
+
+
+def read_jsonl_messages(path: str) -> Iterator[Message]:
+    """
+    Messages from a JSONL file.
+
+    Each line is either an SQS message (as printed by `aws sqs receive-message`,
+    with a "Body" string) or an S3 event notification.
+    """
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                data = json.loads(line)
+            except json.JSONDecodeError:
+                yield Message(line)
+                continue
+            body = data.get("Body", data.get("body")) if isinstance(data, dict) else None
+            yield Message(body if isinstance(body, str) else line)
+
+
+class SQSQueue:
+    """An SQS queue behind the receive/delete/change_visibility interface."""
+
+    def __init__(self, queue_url: str, client=None):
+        if client is None:
+            import boto3
+
+            client = boto3.client("sqs", region_name=os.getenv("AWS_REGION", "us-east-1"))
+        self.queue_url = queue_url
+        self.client = client
+
+    def receive(self, max_messages: int = 10, wait_s: int = 20, visibility_timeout: int | None = None) -> list[Message]:
+        """Long-poll for up to max_messages (at most 10) messages."""
+        params = {
+            "QueueUrl": self.queue_url,
+            "MaxNumberOfMessages": max(1, min(max_messages, 10)),
+            "WaitTimeSeconds": wait_s,
+        }
+        if visibility_timeout is not None:
+            params["VisibilityTimeout"] = visibility_timeout
+        response = self.client.receive_message(**params)
+        return [Message(m["Body"], m["ReceiptHandle"]) for m in response.get("Messages", [])]
+
+    def delete(self, message: Message) -> None:
+        self.client.delete_message(QueueUrl=self.queue_url, ReceiptHandle=message.receipt_handle)
+
+    def change_visibility(self, message: Message, timeout_s: int) -> None:
+        """Hide the message for timeout_s more seconds from now (0 makes it visible)."""
+        self.client.change_message_visibility(
+            QueueUrl=self.queue_url, ReceiptHandle=message.receipt_handle, VisibilityTimeout=timeout_s
+        )
+
+
+class LocalQueue:
+    """
+    In-memory queue with SQS semantics, for local runs and tests.
+
+    Received messages are hidden for the visibility timeout and reappear
+    unless deleted; after max_receives receives a message moves to `dead`
+    instead (like the DLQ redrive policy). Receipt handles change on every
+    receive, so a stale handle cannot delete a redelivered message.
+    """
+
+    def __init__(self, bodies: list[str] | None = None, visibility_timeout: int = 30, max_receives: int = 3):
+        self.visibility_timeout = visibility_timeout
+        self.max_receives = max_receives
+        self.dead: list[str] = []
+        self._cond = threading.Condition()
+        self._messages: dict[int, dict] = {}
+        self._handles: dict[str, int] = {}
+        self._next_id = 0
+        for body in bodies or []:
+            self.send(body)
+
+    @classmethod
+    def from_jsonl(cls, path: str, **kwargs) -> "LocalQueue":
+        return cls([m.body for m in read_jsonl_messages(path)], **kwargs)
+
+    def send(self, body: str) -> None:
+        with self._cond:
+            self._messages[self._next_id] = {"body": body, "visible_at": 0.0, "receives": 0, "handle": None}
+            self._next_id += 1
+            self._cond.notify_all()
+
+    def _take(self, max_messages: int, visibility_timeout: int) -> tuple[list[Message], float | None]:
+        now = time.monotonic()
+        taken, next_visible = [], None
+        for message_id, entry in list(self._messages.items()):
+            if entry["visible_at"] > now:
+                next_visible = min(next_visible or entry["visible_at"], entry["visible_at"])
+                continue
+            if entry["receives"] >= self.max_receives:
+                self.dead.append(entry["body"])
+                del self._messages[message_id]
+                continue
+            if len(taken) == max_messages:
+                break
+            entry["receives"] += 1
+            entry["visible_at"] = now + visibility_timeout
+            handle = f"{message_id}-{entry['receives']}"
+            if entry["handle"] is not None:
+                self._handles.pop(entry["handle"], None)
+            entry["handle"] = handle
+            self._handles[handle] = message_id
+            taken.append(Message(entry["body"], handle))
+        return taken, next_visible
+
+    def receive(self, max_messages: int = 10, wait_s: int = 20, visibility_timeout: int | None = None) -> list[Message]:
+        """Wait up to wait_s for visible messages and return up to max_messages of them."""
+        timeout = self.visibility_timeout if visibility_timeout is None else visibility_timeout
+        deadline = time.monotonic() + wait_s
+        with self._cond:
+            while True:
+                taken, next_visible = self._take(max(1, min(max_messages, 10)), timeout)
+                remaining = deadline - time.monotonic()
+                if taken or remaining <= 0:
+                    return taken
+                if next_visible is not None:
+                    remaining = min(remaining, max(0.0, next_visible - time.monotonic()))
+                self._cond.wait(remaining)
+
+    def _entry(self, message: Message) -> dict | None:
+        message_id = self._handles.get(message.receipt_handle)
+        return self._messages.get(message_id) if message_id is not None else None
+
+    def delete(self, message: Message) -> None:
+        with self._cond:
+            message_id = self._handles.pop(message.receipt_handle, None)
+            if message_id is not None:
+                self._messages.pop(message_id, None)
+
+    def change_visibility(self, message: Message, timeout_s: int) -> None:
+        with self._cond:
+            entry = self._entry(message)
+            if entry is not None:
+                entry["visible_at"] = time.monotonic() + timeout_s
+                self._cond.notify_all()
+
+    def __len__(self) -> int:
+        with self._cond:
+            return len(self._messages)
@@ -0,0 +1,51 @@
+"""Client-side rate limiting for embedding provider requests."""
+
+import threading
+import time
+
+
+class RateLimiter:
+    """
+    Thread-safe limiter for requests per minute and tokens per minute.
+
+    Each acquire reserves the earliest time both budgets allow (virtual
+    scheduling, as in GCRA) and sleeps until then, so callers are spaced
+    evenly instead of bursting into the provider's 429s. Up to `burst_s`
+    seconds of unused budget can be spent at once. A limit of 0 is unlimited.
+    """
+
+    def __init__(self, requests_per_minute: float = 0, tokens_per_minute: float = 0, burst_s: float = 1.0):
+        self.requests_per_s = requests_per_minute / 60
+        self.tokens_per_s = tokens_per_minute / 60
+        self.burst_s = burst_s
+        self._lock = threading.Lock()
+        self._next_request = 0.0
+        self._next_token = 0.0
+
+    def acquire(self, tokens: int = 0, timeout: float | None = None) -> bool:
+        """
+        Wait until one request of `tokens` tokens may be sent.
+
+        Returns False without reserving anything if that would take longer
+        than `timeout` seconds.
+        """
+        with self._lock:
+            now = time.monotonic()
+            floor = now - self.burst_s
+            start = now
+            next_request, next_token = self._next_request, self._next_token
+            if self.requests_per_s:
+                slot = max(next_request, floor)
+                start = max(start, slot)
+                next_request = slot + 1 / self.requests_per_s
+            if self.tokens_per_s and tokens:
+                slot = max(next_token, floor)
+                start = max(start, slot)
+                next_token = slot + tokens / self.tokens_per_s
+            wait = start - now
+            if timeout is not None and wait > timeout:
+                return False
+            self._next_request, self._next_token = next_request, next_token
+        if wait > 0:
+            time.sleep(wait)
+        return True
@@ -0,0 +1,285 @@
+"""Replay failed ingests from the dead-letter queue.
+
+Reads S3-event messages from an SQS queue (the DLQ) or from a JSONL file and
+re-runs ingest_document for each object on a thread pool:
+
+- objects that already have a document with chunks are skipped
+  (find_ingested_document; run db/migrations/008_documents_source_index.sql),
+  as are repeats of an object earlier in the same run
+- OpenAI requests from all threads share one rate limiter
+  (--requests-per-minute / --tokens-per-minute, see worker.ratelimit)
+- an SQS message is deleted once all its objects are ingested or skipped;
+  failed and unparseable messages stay on the queue and reappear after the
+  visibility timeout. --failed-out writes their bodies to a JSONL file that
+  can be replayed with --jsonl
+
+Each JSONL line is either an SQS message (as printed by
+`aws sqs receive-message`, with a "Body" string) or an S3 event notification
+(see worker.queues.read_jsonl_messages).
+Ends with a summary of outcomes and throughput; exits 1 if anything failed.
+
+Usage:
+    python -m worker.replay --queue-url https://sqs.us-east-1.amazonaws.com/123456789012/rag-ingest-dlq
+    python -m worker.replay --jsonl dlq.jsonl --concurrency 8 --requests-per-minute 3000 --failed-out failed.jsonl
+"""
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+
+from .ingest import ingest_document
+from .queues import Message, SQSQueue, read_jsonl_messages
+from .supabase_db import find_ingested_document
+from .utils import s3_objects_from_message
+
+logger = logging.getLogger(__name__)
+
+# Per-object outcomes, in report order
+OUTCOMES = ("ingested", "skipped", "duplicate", "failed")
+
+# Failures listed in the text report
+MAX_REPORTED_FAILURES = 20
+
+
+@dataclass
+class ReplayStats:
+    """Outcome counts and ingest totals for one replay run (thread-safe)."""
+
+    messages: int = 0
+    invalid: int = 0
+    deleted: int = 0
+    outcomes: dict[str, int] = field(default_factory=lambda: dict.fromkeys(OUTCOMES, 0))
+    chunk_count: int = 0
+    size_bytes: int = 0
+    embedding_requests: int = 0
+    embedding_retries: int = 0
+    failures: list[dict] = field(default_factory=list)
+    started_at: float = field(default_factory=time.perf_counter)
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False)
+
+    def record(self, outcome: str, ingest_summary: dict | None = None, **failure) -> None:
+        with self._lock:
+            self.outcomes[outcome] += 1
+            if ingest_summary:
+                self.chunk_count += ingest_summary.get("chunk_count", 0)
+                self.size_bytes += ingest_summary.get("size_bytes", 0)
+                self.embedding_requests += ingest_summary.get("embedding_requests", 0)
+                self.embedding_retries += ingest_summary.get("embedding_retries", 0)
+            if failure:
+                self.failures.append(failure)
+
+    def count(self, name: str) -> None:
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def summary(self) -> dict:
+        elapsed_s = time.perf_counter() - self.started_at
+        return {
+            "messages": self.messages,
+            "invalid": self.invalid,
+            "deleted": self.deleted,
+            **self.outcomes,
+            "elapsed_s": round(elapsed_s, 2),
+            "documents_per_s": round(self.outcomes["ingested"] / elapsed_s, 2) if elapsed_s else 0.0,
+            "chunks_per_s": round(self.chunk_count / elapsed_s, 1) if elapsed_s else 0.0,
+            "chunk_count": self.chunk_count,
+            "size_bytes": self.size_bytes,
+            "embedding_requests": self.embedding_requests,
+            "embedding_retries": self.embedding_retries,
+            "failures": self.failures,
+        }
+
+
+def receive_sqs_messages(queue: SQSQueue, wait_s: int = 2, visibility_timeout: int = 900) -> Iterator[Message]:
+    """Messages received from an SQS queue until a receive comes back empty."""
+    while True:
+        messages = queue.receive(10, wait_s, visibility_timeout)
+        if not messages:
+            return
+        yield from messages
+
+
+class Replayer:
+    """Re-runs ingest_document for queued messages with bounded concurrency."""
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        skip_ingested: bool = True,
+        on_success: Callable[[Message], None] | None = None,
+        on_failure: Callable[[Message], None] | None = None,
+    ):
+        self.concurrency = max(1, concurrency)
+        self.skip_ingested = skip_ingested
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self.stats = ReplayStats()
+        self._claimed: set[tuple[str, str]] = set()
+        self._lock = threading.Lock()
+
+    def replay_object(self, bucket: str, key: str) -> str:
+        """Ingest one object unless it is done or already claimed; returns the outcome."""
+        with self._lock:
+            if (bucket, key) in self._claimed:
+                self.stats.record("duplicate")
+                return "duplicate"
+            self._claimed.add((bucket, key))
+
+        try:
+            if self.skip_ingested and find_ingested_document(bucket, key):
+                self.stats.record("skipped")
+                return "skipped"
+            summary = ingest_document(bucket, key)
+        except Exception as e:
+            logger.warning(f"Replay of s3://{bucket}/{key} failed: {e}")
+            self.stats.record("failed", bucket=bucket, key=key, error=str(e))
+            return "failed"
+        if summary.get("skipped"):
+            self.stats.record("skipped")
+            return "skipped"
+        self.stats.record("ingested", summary)
+        return "ingested"
+
+    def replay_message(self, message: Message) -> bool:
+        """Replay every object in a message; True if none failed."""
+        try:
+            objects = s3_objects_from_message(message.body)
+        except (ValueError, AttributeError) as e:
+            logger.warning(f"Skipping message that is not an S3 event: {e}")
+            self.stats.count("invalid")
+            ok = False
+        else:
+            ok = all([self.replay_object(bucket, key) != "failed" for bucket, key in objects])
+
+        callback = self.on_success if ok else self.on_failure
+        if callback is not None:
+            try:
+                callback(message)
+            except Exception as e:
+                logger.warning(f"Replay callback failed: {e}")
+        return ok
+
+    def run(self, messages: Iterable[Message], max_messages: int = 0) -> dict:
+        """
+        Replay messages (at most max_messages, 0 = all) and return the summary.
+
+        At most 2x concurrency messages are taken from the source ahead of the
+        threads, so SQS messages are not held invisible while they wait.
+        """
+        slots = threading.BoundedSemaphore(self.concurrency * 2)
+
+        def task(message: Message) -> None:
+            try:
+                self.replay_message(message)
+            finally:
+                slots.release()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="replay") as pool:
+            for message in messages:
+                slots.acquire()
+                self.stats.count("messages")
+                pool.submit(task, message)
+                if max_messages and self.stats.messages >= max_messages:
+                    break
+        return self.stats.summary()
+
+
+def print_summary(summary: dict) -> None:
+    print(f"messages {summary['messages']}  invalid {summary['invalid']}  deleted {summary['deleted']}")
+    print("objects  " + "  ".join(f"{name} {summary[name]}" for name in OUTCOMES))
+    print(
+        f"elapsed {summary['elapsed_s']:.1f}s  {summary['documents_per_s']:.2f} docs/s  "
+        f"{summary['chunks_per_s']:.1f} chunks/s  {summary['size_bytes']} bytes  "
+        f"embedding requests {summary['embedding_requests']} (retries {summary['embedding_retries']})"
+    )
+    failures = summary["failures"]
+    if failures:
+        print("failures:")
+        for failure in failures[:MAX_REPORTED_FAILURES]:
+            print(f"  s3://{failure['bucket']}/{failure['key']}: {failure['error']}")
+        if len(failures) > MAX_REPORTED_FAILURES:
+            print(f"  ... {len(failures) - MAX_REPORTED_FAILURES} more")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay failed ingests from the dead-letter queue")
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--queue-url", help="SQS queue to drain (usually the DLQ)")
+    source.add_argument("--jsonl", help="File with one SQS message or S3 event per line")
+    parser.add_argument("--concurrency", type=int, default=4, help="Documents ingested at once")
+    parser.add_argument(
+        "--requests-per-minute",
+        type=float,
+        default=float(os.getenv("EMBEDDING_REQUESTS_PER_MINUTE", "0")),
+        help="OpenAI embedding requests per minute across all threads (0 = unlimited)",
+    )
+    parser.add_argument(
+        "--tokens-per-minute",
+        type=float,
+        default=float(os.getenv("EMBEDDING_TOKENS_PER_MINUTE", "0")),
+        help="OpenAI embedding tokens per minute across all threads (0 = unlimited)",
+    )
+    parser.add_argument("--max-messages", type=int, default=0, help="Stop after this many messages (0 = all)")
+    parser.add_argument("--no-skip", action="store_true", help="Re-ingest objects that are already ingested")
+    parser.add_argument("--failed-out", help="Append bodies of failed messages to this JSONL file")
+    parser.add_argument("--wait-seconds", type=int, default=2, help="SQS long-poll wait per receive")
+    parser.add_argument("--visibility-timeout", type=int, default=900, help="Seconds a received message stays hidden")
+    parser.add_argument("--json", action="store_true", help="Print the summary as JSON")
+    parser.add_argument("--verbose", action="store_true", help="Show ingest progress logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING,
+        format="%(asctime)s - %(name)s - %(levelname)s - %(message)s",
+    )
+    # Read by get_embedding_rate_limiter on the first OpenAI request
+    os.environ["EMBEDDING_REQUESTS_PER_MINUTE"] = str(args.requests_per_minute)
+    os.environ["EMBEDDING_TOKENS_PER_MINUTE"] = str(args.tokens_per_minute)
+
+    failed_out = open(args.failed_out, "a", encoding="utf-8") if args.failed_out else None
+    failed_lock = threading.Lock()
+
+    def write_failed(message: Message) -> None:
+        with failed_lock:
+            failed_out.write(json.dumps({"Body": message.body}) + "\n")
+            failed_out.flush()
+
+    on_success = None
+    if args.queue_url:
+        queue = SQSQueue(args.queue_url)
+        messages = receive_sqs_messages(queue, args.wait_seconds, args.visibility_timeout)
+
+        def on_success(message: Message) -> None:
+            queue.delete(message)
+            replayer.stats.count("deleted")
+    else:
+        messages = read_jsonl_messages(args.jsonl)
+
+    replayer = Replayer(
+        concurrency=args.concurrency,
+        skip_ingested=not args.no_skip,
+        on_success=on_success,
+        on_failure=write_failed if failed_out else None,
+    )
+    try:
+        summary = replayer.run(messages, max_messages=args.max_messages)
+    finally:
+        if failed_out:
+            failed_out.close()
+
+    if args.json:
+        print(json.dumps(summary, indent=2))
+    else:
+        print_summary(summary)
+    sys.exit(1 if summary["failed"] or summary["invalid"] else 0)
+
+
+if __name__ == "__main__":
+    main()
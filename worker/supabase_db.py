@@ -3,10 +3,20 @@
 import json
 import os
 import urllib.error
+import urllib.parse
 import urllib.request
 import uuid
+from collections.abc import Sequence
+from datetime import UTC, date, datetime
 from typing import List
 
+from .connections import urlopen
+from .dedup import dedup_enabled
+from .embeddings import get_coarse_dimensions, shorten_embedding
+
+# Fingerprints sent per find_chunk_near_duplicates request
+DEDUP_LOOKUP_BATCH = 256
+
 
 def _get_supabase_base_url() -> str:
     """Get Supabase REST API base URL from SUPABASE_URL env var."""
@@ -44,18 +54,30 @@ def _get_headers() -> dict:
     }
 
 
-def _make_request(method: str, url: str, data: dict | list | None = None) -> dict | list:
-    """Make HTTP request to Supabase REST API."""
+def _make_request(
+    method: str,
+    url: str,
+    data: dict | list | None = None,
+    body: bytes | None = None,
+    prefer: str | None = None,
+) -> dict | list:
+    """
+    Make HTTP request to Supabase REST API (`body` is an already-encoded JSON payload).
+    
+    `prefer` replaces the default Prefer header (return=representation).
+    """
     headers = _get_headers()
+    if prefer is not None:
+        headers["Prefer"] = prefer
     
-    req_data = None
+    req_data = body
     if data:
         req_data = json.dumps(data).encode("utf-8")
     
     request = urllib.request.Request(url, data=req_data, headers=headers, method=method)
     
     try:
-        with urllib.request.urlopen(request) as response:
+        with urlopen(request) as response:
             response_data = response.read().decode("utf-8")
             if response_data:
                 return json.loads(response_data)
@@ -65,15 +87,40 @@ def _make_request(method: str, url: str, data: dict | list | None = None) -> dic
         raise ValueError(f"Supabase API error ({e.code}): {error_body}") from e
 
 
+def _chunks_partitioned() -> bool:
+    """Whether the chunks table uses the monthly partitioned layout (006_partition_chunks.sql)."""
+    return os.getenv("CHUNKS_PARTITIONED", "false").lower() == "true"
+
+
+# Months whose chunks partition is known to exist (per Lambda container)
+_ensured_partitions: set[date] = set()
+
+
+def ensure_chunks_partition(created_at: datetime) -> None:
+    """Create the monthly chunks partition for created_at if it does not exist yet."""
+    month = created_at.date().replace(day=1)
+    if month in _ensured_partitions:
+        return
+    
+    base_url = _get_supabase_base_url()
+    _make_request("POST", f"{base_url}/rpc/ensure_chunks_partition", {"p_month": month.isoformat()})
+    _ensured_partitions.add(month)
+
+
 def insert_document(
     trace_id: str,
     source_bucket: str,
     source_key: str,
     filename: str,
+    created_at: datetime | None = None,
 ) -> str:
     """
     Insert a document record and return document ID.
     
+    Args:
+        created_at: Ingest timestamp; pass the same value to insert_chunks so the
+            document's chunks land in the same partition. Defaults to NOW() in the DB.
+    
     Returns:
         document_id (UUID string)
     """
@@ -88,6 +135,8 @@ def insert_document(
         "source_key": source_key,
         "filename": filename,
     }
+    if created_at is not None:
+        data["created_at"] = created_at.isoformat()
     
     response = _make_request("POST", url, data)
     
@@ -101,43 +150,235 @@ def insert_document(
         return doc_id
 
 
+def _source_filter(source_bucket: str, source_key: str) -> str:
+    bucket = urllib.parse.quote(source_bucket, safe="")
+    key = urllib.parse.quote(source_key, safe="")
+    return f"source_bucket=eq.{bucket}&source_key=eq.{key}"
+
+
+def checkpoints_enabled() -> bool:
+    """Whether ingest progress is checkpointed in ingest_jobs (009_ingest_jobs.sql)."""
+    return os.getenv("INGEST_CHECKPOINTS", "false").lower() == "true"
+
+
+def find_ingested_document(source_bucket: str, source_key: str) -> str | None:
+    """
+    ID of a document for this S3 object that has chunks, or None.
+    
+    A document row without chunks is an ingest that failed after
+    insert_document, so it does not count (with INGEST_DEDUP=true, chunks
+    linked as duplicates count too). With INGEST_CHECKPOINTS=true, an object
+    with an ingest job counts only once the job is completed (a running job
+    has some chunks but is resumed, not skipped).
+    """
+    if checkpoints_enabled():
+        job = get_ingest_job(source_bucket, source_key)
+        if job is not None:
+            return str(job["document_id"]) if job["status"] == "completed" else None
+    
+    base_url = _get_supabase_base_url()
+    source = _source_filter(source_bucket, source_key)
+    documents = _make_request("GET", f"{base_url}/documents?select=id&{source}")
+    if not documents:
+        return None
+    
+    ids = ",".join(str(doc["id"]) for doc in documents)
+    chunks = _make_request("GET", f"{base_url}/chunks?select=document_id&document_id=in.({ids})&limit=1")
+    if not chunks and dedup_enabled():
+        chunks = _make_request("GET", f"{base_url}/chunk_duplicates?select=document_id&document_id=in.({ids})&limit=1")
+    return str(chunks[0]["document_id"]) if chunks else None
+
+
+def centroids_enabled() -> bool:
+    """Whether ingest maintains documents.centroid (DOCUMENT_CENTROIDS, needs 011_document_centroids.sql)."""
+    return os.getenv("DOCUMENT_CENTROIDS", "false").lower() == "true"
+
+
+def refresh_document_centroid(document_id: str, created_at: datetime | None = None) -> None:
+    """Recompute a document's centroid from its stored chunks (refresh_document_centroid RPC)."""
+    base_url = _get_supabase_base_url()
+    _make_request(
+        "POST",
+        f"{base_url}/rpc/refresh_document_centroid",
+        {
+            "p_document_id": document_id,
+            "p_created_at": created_at.isoformat() if created_at is not None else None,
+        },
+        prefer="return=minimal",
+    )
+
+
+def get_ingest_job(source_bucket: str, source_key: str) -> dict | None:
+    """The ingest_jobs row for an S3 object, or None."""
+    base_url = _get_supabase_base_url()
+    rows = _make_request("GET", f"{base_url}/ingest_jobs?select=*&{_source_filter(source_bucket, source_key)}")
+    return rows[0] if rows else None
+
+
+def save_ingest_job(job: dict) -> None:
+    """Insert an ingest_jobs row, replacing any previous job for the same object."""
+    base_url = _get_supabase_base_url()
+    _make_request(
+        "POST",
+        f"{base_url}/ingest_jobs?on_conflict=source_bucket,source_key",
+        job,
+        prefer="return=minimal,resolution=merge-duplicates",
+    )
+
+
+def update_ingest_job(source_bucket: str, source_key: str, **fields) -> None:
+    """Update fields of an object's ingest job (e.g. next_chunk_index, status)."""
+    base_url = _get_supabase_base_url()
+    fields["updated_at"] = datetime.now(UTC).isoformat()
+    _make_request(
+        "PATCH",
+        f"{base_url}/ingest_jobs?{_source_filter(source_bucket, source_key)}",
+        fields,
+        prefer="return=minimal",
+    )
+
+
+def delete_document(document_id: str) -> None:
+    """
+    Delete a document; its chunks and ingest job go with it (ON DELETE CASCADE).
+    
+    With 010_chunk_dedup.sql, chunks other documents link to as duplicates are
+    first handed to one of those documents (promote_chunk_duplicates trigger).
+    """
+    base_url = _get_supabase_base_url()
+    _make_request("DELETE", f"{base_url}/documents?id=eq.{document_id}", prefer="return=minimal")
+
+
+def find_chunk_near_duplicates(rows: list[dict], min_similarity: float, exclude_document_id: str | None = None) -> list[dict]:
+    """
+    Best stored near-duplicate for each fingerprint row (see worker.dedup), via
+    the find_chunk_near_duplicates function (010_chunk_dedup.sql).
+    
+    Returns rows with chunk_index, canonical_document_id,
+    canonical_chunk_index and similarity; fingerprints without a match are
+    left out.
+    """
+    base_url = _get_supabase_base_url()
+    matches: list[dict] = []
+    for start in range(0, len(rows), DEDUP_LOOKUP_BATCH):
+        matches.extend(_make_request(
+            "POST",
+            f"{base_url}/rpc/find_chunk_near_duplicates",
+            {
+                "p_chunks": rows[start:start + DEDUP_LOOKUP_BATCH],
+                "p_min_similarity": min_similarity,
+                "p_exclude_document_id": exclude_document_id,
+            },
+        ))
+    return matches
+
+
+def get_chunk_fingerprints(document_id: str, before_index: int) -> list[dict]:
+    """A document's stored fingerprints with chunk_index below before_index."""
+    base_url = _get_supabase_base_url()
+    rows = _make_request(
+        "GET",
+        f"{base_url}/chunk_fingerprints?select=chunk_index,bands,signature"
+        f"&document_id=eq.{document_id}&chunk_index=lt.{before_index}",
+    )
+    return rows if isinstance(rows, list) else []
+
+
+def _insert_ignoring_duplicates(table: str, conflict: str, rows: list[dict]) -> None:
+    if not rows:
+        return
+    base_url = _get_supabase_base_url()
+    _make_request(
+        "POST",
+        f"{base_url}/{table}?on_conflict={conflict}",
+        rows,
+        prefer="return=minimal,resolution=ignore-duplicates",
+    )
+
+
+def insert_chunk_fingerprints(rows: list[dict]) -> None:
+    """Store fingerprints of inserted chunks (already stored ones are kept)."""
+    _insert_ignoring_duplicates("chunk_fingerprints", "document_id,chunk_index", rows)
+
+
+def insert_chunk_duplicates(rows: list[dict]) -> None:
+    """Link skipped chunks to their canonical chunks (already linked ones are kept)."""
+    _insert_ignoring_duplicates("chunk_duplicates", "document_id,chunk_index", rows)
+
+
 def insert_chunks(
     document_id: str,
     trace_id: str,
     chunks: List[str],
     embeddings: List[List[float]],
-) -> None:
+    created_at: datetime | None = None,
+    start_index: int = 0,
+    ignore_duplicates: bool = False,
+    chunk_indices: Sequence[int] | None = None,
+) -> int:
     """
     Insert chunks with embeddings via bulk insert.
     
+    The response body is not requested back (it would echo every embedding).
+    
     Args:
         document_id: Parent document ID
         trace_id: Trace ID for the job
         chunks: List of chunk text
         embeddings: List of embedding vectors (same length as chunks)
+        created_at: Parent document's ingest timestamp. Postgres routes rows to
+            the monthly partition for this timestamp when CHUNKS_PARTITIONED=true.
+        start_index: chunk_index of the first chunk (for batches of a document)
+        chunk_indices: chunk_index of each chunk, instead of consecutive ones
+            from start_index (when near-duplicates were skipped)
+        ignore_duplicates: Skip chunks whose (document_id, chunk_index,
+            created_at) already exists, so a re-sent batch is a no-op
+            (needs 009_ingest_jobs.sql)
+    
+    Returns:
+        Size in bytes of the JSON payload sent to Supabase
     """
     if len(chunks) != len(embeddings):
         raise ValueError("chunks and embeddings must have same length")
     
     base_url = _get_supabase_base_url()
     url = f"{base_url}/chunks"
+    prefer = "return=minimal"
+    if ignore_duplicates:
+        url += "?on_conflict=document_id,chunk_index,created_at"
+        prefer += ",resolution=ignore-duplicates"
+    coarse_dimensions = get_coarse_dimensions()
+    created_at_value = created_at.isoformat() if created_at is not None else None
+    
+    if created_at is not None and _chunks_partitioned():
+        ensure_chunks_partition(created_at)
     
     # Prepare bulk insert data
     # For pgvector, PostgREST accepts JSON array format directly
     bulk_data = []
-    for idx, (chunk_text, embedding) in enumerate(zip(chunks, embeddings)):
+    if chunk_indices is None:
+        chunk_indices = range(start_index, start_index + len(chunks))
+    for idx, chunk_text, embedding in zip(chunk_indices, chunks, embeddings):
         chunk_id = str(uuid.uuid4())
         # Send embedding as JSON array - PostgREST will convert to vector type
         # Format: [0.1, 0.2, 0.3, ...] as a JSON array
-        bulk_data.append({
+        row = {
             "id": chunk_id,
             "document_id": document_id,
             "trace_id": trace_id,
             "chunk_index": idx,
             "content": chunk_text,
             "embedding": embedding,  # Send as JSON array, PostgREST handles conversion
-        })
+        }
+        if created_at_value:
+            row["created_at"] = created_at_value
+        if coarse_dimensions:
+            # Short vector for the coarse ANN stage (see 003_coarse_embedding.sql)
+            row["embedding_coarse"] = shorten_embedding(embedding, coarse_dimensions)
+        bulk_data.append(row)
     
     # Bulk insert all chunks at once
-    _make_request("POST", url, bulk_data)
+    body = json.dumps(bulk_data).encode("utf-8")
+    _make_request("POST", url, body=body, prefer=prefer)
+    return len(body)
 
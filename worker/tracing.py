@@ -0,0 +1,280 @@
+"""Lightweight timing spans linked by trace_id.
+
+Spans use the OpenTelemetry data model and are exported as OTLP/JSON
+(one ExportTraceServiceRequest per line), so files can be loaded by an OTel
+collector's otlpjsonfile receiver or inspected with `python -m worker.tracing`.
+The pipeline trace_id (a UUID) maps directly to the 128-bit OTel trace ID, so
+the spans of /presign, the worker ingest and later queries line up per upload.
+
+Configuration:
+- TRACE_EXPORTER: 'none' (default), 'console' (log lines) or 'file'
+- TRACE_FILE: path for the file exporter (default spans.jsonl)
+- TRACE_SERVICE_NAME: service.name resource attribute (default proof-layer)
+
+Stdlib only, so it can ship in the Lambda package.
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import secrets
+import threading
+import time
+import uuid
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+# OTLP status codes
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_current_span: ContextVar["Span | None"] = ContextVar("current_span", default=None)
+_file_lock = threading.Lock()
+
+
+def otel_trace_id(trace_id: str) -> str:
+    """Map a pipeline trace_id to a 32-hex-char OTel trace ID."""
+    try:
+        return uuid.UUID(trace_id).hex
+    except (ValueError, AttributeError, TypeError):
+        return hashlib.sha256(str(trace_id).encode()).hexdigest()[:32]
+
+
+def _any_value(value: Any) -> dict:
+    """Encode a Python value as an OTLP AnyValue."""
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+class Span:
+    """A timed operation within a trace."""
+
+    __slots__ = ("name", "trace_id", "span_id", "parent_span_id", "start_ns", "end_ns", "attributes", "status")
+
+    def __init__(self, name: str, trace_id: str, parent_span_id: str = "", attributes: dict | None = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = secrets.token_hex(8)
+        self.parent_span_id = parent_span_id
+        self.start_ns = time.time_ns()
+        self.end_ns = 0
+        self.attributes = dict(attributes or {})
+        self.status = STATUS_OK
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    @property
+    def duration_ms(self) -> float:
+        end_ns = self.end_ns or time.time_ns()
+        return (end_ns - self.start_ns) / 1e6
+
+    def to_otlp(self) -> dict:
+        """Return the span as an OTLP/JSON span object."""
+        span = {
+            "traceId": otel_trace_id(self.trace_id),
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [
+                {"key": "trace_id", "value": {"stringValue": self.trace_id}},
+                *({"key": k, "value": _any_value(v)} for k, v in self.attributes.items()),
+            ],
+            "status": {"code": self.status},
+        }
+        if self.parent_span_id:
+            span["parentSpanId"] = self.parent_span_id
+        return span
+
+
+class _NoopSpan:
+    """Returned when tracing is disabled; accepts and drops attributes."""
+
+    trace_id = ""
+    duration_ms = 0.0
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        pass
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+def _exporter() -> str:
+    return os.getenv("TRACE_EXPORTER", "none").lower()
+
+
+def _export(span: Span, exporter: str) -> None:
+    """Write a finished span as one OTLP/JSON ExportTraceServiceRequest."""
+    payload = {
+        "resourceSpans": [{
+            "resource": {"attributes": [{
+                "key": "service.name",
+                "value": {"stringValue": os.getenv("TRACE_SERVICE_NAME", "proof-layer")},
+            }]},
+            "scopeSpans": [{"scope": {"name": "proof-layer"}, "spans": [span.to_otlp()]}],
+        }]
+    }
+    line = json.dumps(payload, separators=(",", ":"))
+    if exporter == "file":
+        path = os.getenv("TRACE_FILE", "spans.jsonl")
+        with _file_lock, open(path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+    else:
+        logger.info(line)
+
+
+@contextmanager
+def span(name: str, trace_id: str | None = None, **attributes: Any) -> Iterator[Span | _NoopSpan]:
+    """
+    Time a block as a span.
+
+    Nested spans become children of the enclosing span and inherit its
+    trace_id; pass trace_id to start a new root span for a pipeline trace.
+    Exceptions mark the span as errored and are re-raised.
+    """
+    exporter = _exporter()
+    parent = _current_span.get()
+    if exporter == "none" or (trace_id is None and parent is None):
+        yield _NOOP_SPAN
+        return
+
+    current = Span(
+        name,
+        trace_id or parent.trace_id,
+        parent_span_id=parent.span_id if parent and (trace_id is None or trace_id == parent.trace_id) else "",
+        attributes=attributes,
+    )
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.status = STATUS_ERROR
+        current.set_attribute("error", type(e).__name__)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end_ns = time.time_ns()
+        try:
+            _export(current, exporter)
+        except Exception as e:
+            logger.warning(f"Failed to export span {name}: {e}")
+
+
+def read_spans(path: str) -> list[dict]:
+    """Read spans from an OTLP/JSON lines file, flattened to dicts with ms offsets."""
+    spans = []
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line.startswith("{"):
+                # Console exporter output may be prefixed by log formatting
+                if "{" not in line:
+                    continue
+                line = line[line.index("{"):]
+            try:
+                payload = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            for resource_spans in payload.get("resourceSpans", []):
+                service = next(
+                    (a["value"].get("stringValue") for a in resource_spans.get("resource", {}).get("attributes", [])
+                     if a["key"] == "service.name"),
+                    "",
+                )
+                for scope_spans in resource_spans.get("scopeSpans", []):
+                    for s in scope_spans.get("spans", []):
+                        attributes = {a["key"]: next(iter(a["value"].values())) for a in s.get("attributes", [])}
+                        spans.append({
+                            "trace_id": attributes.get("trace_id", s["traceId"]),
+                            "span_id": s["spanId"],
+                            "parent_span_id": s.get("parentSpanId", ""),
+                            "name": s["name"],
+                            "service": service,
+                            "start_ns": int(s["startTimeUnixNano"]),
+                            "end_ns": int(s["endTimeUnixNano"]),
+                            "error": s.get("status", {}).get("code") == STATUS_ERROR,
+                            "attributes": attributes,
+                        })
+    return spans
+
+
+def summarize_trace(spans: list[dict], trace_id: str) -> dict:
+    """Summarize one trace: end-to-end duration and per-span offsets/durations."""
+    selected = sorted((s for s in spans if s["trace_id"] == trace_id), key=lambda s: s["start_ns"])
+    if not selected:
+        return {"trace_id": trace_id, "spans": [], "end_to_end_ms": 0.0}
+
+    start = selected[0]["start_ns"]
+    end = max(s["end_ns"] for s in selected)
+    return {
+        "trace_id": trace_id,
+        "end_to_end_ms": (end - start) / 1e6,
+        "spans": [
+            {
+                "name": s["name"],
+                "service": s["service"],
+                "offset_ms": (s["start_ns"] - start) / 1e6,
+                "duration_ms": (s["end_ns"] - s["start_ns"]) / 1e6,
+                "error": s["error"],
+                "depth": _depth(s, selected),
+            }
+            for s in selected
+        ],
+    }
+
+
+def _depth(span_data: dict, spans: list[dict]) -> int:
+    by_id = {s["span_id"]: s for s in spans}
+    depth = 0
+    parent = by_id.get(span_data["parent_span_id"])
+    while parent is not None and depth < 32:
+        depth += 1
+        parent = by_id.get(parent["parent_span_id"])
+    return depth
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show span timelines from a TRACE_FILE")
+    parser.add_argument("path", help="OTLP/JSON lines file written by the file exporter")
+    parser.add_argument("--trace-id", help="Trace to show (default: list traces)")
+    parser.add_argument("--json", action="store_true", help="Print JSON instead of a table")
+    args = parser.parse_args()
+
+    spans = read_spans(args.path)
+    if not args.trace_id:
+        trace_ids = sorted({s["trace_id"] for s in spans})
+        summaries = [summarize_trace(spans, t) for t in trace_ids]
+        if args.json:
+            print(json.dumps(summaries, indent=2))
+            return
+        for summary in summaries:
+            names = ",".join(dict.fromkeys(s["name"] for s in summary["spans"] if s["depth"] == 0))
+            print(f"{summary['trace_id']}  {summary['end_to_end_ms']:>10.1f} ms  {names}")
+        return
+
+    summary = summarize_trace(spans, args.trace_id)
+    if args.json:
+        print(json.dumps(summary, indent=2))
+        return
+    print(f"trace_id={summary['trace_id']} end_to_end_ms={summary['end_to_end_ms']:.1f}")
+    for s in summary["spans"]:
+        label = "  " * s["depth"] + s["name"] + (" [error]" if s["error"] else "")
+        print(f"{s['offset_ms']:>12.1f} ms  {s['duration_ms']:>10.1f} ms  {label}")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,13 +2,15 @@
 
 import json
 import logging
-import os
 import re
+import urllib.parse
 import uuid
-from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+# Pattern: uploads/YYYY/MM/DD/{uuid}/filename (compiled once per container)
+_TRACE_ID_IN_KEY = re.compile(r"uploads/\d{4}/\d{2}/\d{2}/([a-f0-9-]{36})/")
+
 
 def generate_trace_id() -> str:
     """Generate a short UUID trace_id."""
@@ -20,14 +22,34 @@ def extract_trace_id_from_key(s3_key: str) -> str | None:
     
     Expected format: uploads/YYYY/MM/DD/{trace_id}/filename
     """
-    # Pattern: uploads/YYYY/MM/DD/{uuid}/filename
-    pattern = r"uploads/\d{4}/\d{2}/\d{2}/([a-f0-9-]{36})/"
-    match = re.search(pattern, s3_key)
+    match = _TRACE_ID_IN_KEY.search(s3_key)
     if match:
         return match.group(1)
     return None
 
 
+def s3_objects_from_message(body: str) -> list[tuple[str, str]]:
+    """
+    (bucket, key) pairs of the S3 event notification in an SQS message body.
+    
+    Keys are URL-decoded. Records without a bucket or key are logged and
+    skipped; an S3 test event has no records. Raises json.JSONDecodeError if
+    the body is not JSON.
+    """
+    objects = []
+    for s3_record in json.loads(body).get("Records", []):
+        s3_data = s3_record.get("s3", {})
+        bucket = s3_data.get("bucket", {}).get("name")
+        key = s3_data.get("object", {}).get("key")
+        if key:
+            key = urllib.parse.unquote_plus(key)
+        if not bucket or not key:
+            logger.warning(f"Missing bucket or key in S3 event: {s3_record}")
+            continue
+        objects.append((bucket, key))
+    return objects
+
+
 def log_structured(level: str, event: str, trace_id: str, **kwargs):
     """Log structured JSON."""
     log_data = {